@@ -3,6 +3,7 @@ from django.contrib import admin
 from api.models import (
     Factory,
     Image,
+    LandInfoCache,
     ReportRecord,
 )
 from api.models.factory import RecycledFactory
@@ -11,6 +12,7 @@ from api.models.image import RecycledImage
 from api.models.report_record import RecycledReportRecord
 from .factory import FactoryAdmin, RecycledFactoryAdmin
 from .image import ImageAdmin, RecycledImageAdmin
+from .land_info_cache import LandInfoCacheAdmin
 from .report_record import ReportRecordAdmin, RecycledReportRecordAdmin
 from api.admin.document import (
     DocumentAdmin,
@@ -36,3 +38,5 @@ admin.register(CETNext)(CETNextAdmin)
 admin.register(CETReportStatus)(CETReportStatusAdmin)
 admin.register(GovResponseStatus)(GovResponseStatusAdmin)
 admin.register(FollowUp)(FollowUpAdmin)
+
+admin.register(LandInfoCache)(LandInfoCacheAdmin)
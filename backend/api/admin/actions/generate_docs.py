@@ -1,9 +1,22 @@
 import datetime
-from django.db.models import Max
+from django.contrib import messages
+from django.db import transaction
 
-from api.models import Document, Factory
+from api.cache import invalidate_factory_tiles
+from api.models import (
+    Document,
+    DocumentCodeOverflow,
+    Factory,
+    refresh_factory_stats_rollups_of_factories,
+    refresh_factory_summaries,
+    reserve_document_codes,
+)
 from api.utils import set_function_attributes, normalize_townname
 
+# documents and factories are written in batches, so selections of thousands
+# of factories don't build one huge INSERT or UPDATE statement
+GENERATE_DOCS_BATCH_SIZE = 1000
+
 
 def choose_cet_staff(townname):
     normalized_townname = normalize_townname(townname)
@@ -23,29 +36,31 @@ class GenerateDocsMixin:
     def generate_docs(self, request, queryset):
         user = request.user
         taiwan_year = datetime.date.today().year - 1911
+        factories = list(queryset.values_list("id", "townname", "lat", "lng"))
+        factory_ids = [factory_id for factory_id, *_ in factories]
 
-        # NOTE: code format YYYXXXX
-        # YYY is taiwan year, XXXX is serial number
-        previous_code = Document.objects.aggregate(Max("code"))["code__max"]
-
-        if not previous_code or previous_code < taiwan_year * (10 ** 4):
-            previous_code = taiwan_year * (10 ** 4)
-
-        docs = []
-        factories = []
+        with transaction.atomic():
+            try:
+                first_code = reserve_document_codes(taiwan_year, len(factories))
+            except DocumentCodeOverflow as e:
+                self.message_user(request, f"無法產生公文：{e}", level=messages.ERROR)
+                return
 
-        for code, factory in enumerate(queryset, start=previous_code + 1):
-            docs.append(
-                Document(
-                    factory_id=factory.id,
-                    creator_id=user.id,
-                    code=code,
-                    cet_staff=choose_cet_staff(factory.townname),
+            for start in range(0, len(factories), GENERATE_DOCS_BATCH_SIZE):
+                batch = factories[start:start + GENERATE_DOCS_BATCH_SIZE]
+                batch_ids = factory_ids[start:start + GENERATE_DOCS_BATCH_SIZE]
+                Document.objects.bulk_create(
+                    Document(
+                        factory_id=factory_id,
+                        creator_id=user.id,
+                        code=code,
+                        cet_staff=choose_cet_staff(townname),
+                    )
+                    for code, (factory_id, townname, _, _) in enumerate(batch, start=first_code + start)
                 )
-            )
+                Factory.objects.filter(id__in=batch_ids).update(cet_review_status="X")
+                refresh_factory_summaries(batch_ids)
 
-            factory.cet_review_status = "X"
-            factories.append(factory)
+            refresh_factory_stats_rollups_of_factories(factory_ids)
 
-        Document.objects.bulk_create(docs)
-        Factory.objects.bulk_update(factories, ["cet_review_status"])
+        invalidate_factory_tiles(*[(lat, lng) for _, _, lat, lng in factories])
@@ -1,7 +1,11 @@
+from api.cache import invalidate_factory_tiles
+from api.models import Factory
 from api.utils import set_function_attributes
 
 
 class RestoreMixin:
     @set_function_attributes(short_description="復原")
     def restore(self, request, queryset):
+        positions = list(queryset.values_list("lat", "lng")) if issubclass(queryset.model, Factory) else []
         queryset.undelete()
+        invalidate_factory_tiles(*positions)
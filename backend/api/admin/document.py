@@ -6,6 +6,7 @@ from import_export import resources
 from import_export.admin import ImportExportModelAdmin
 
 from api.admin.actions import ExportDocMixin, ExportCsvMixin
+from api.cache import invalidate_factory_tiles
 from api.models import (
     Document,
     DocumentDisplayStatusEnum,
@@ -204,6 +205,8 @@ class DocumentAdmin(ImportExportModelAdmin, ExportDocMixin, ExportCsvMixin):
             )
 
         super().save_model(request, obj, form, change)
+        if obj.factory is not None:
+            invalidate_factory_tiles((obj.factory.lat, obj.factory.lng))
 
 
 class CETReportStatusAdmin(ImportExportModelAdmin):
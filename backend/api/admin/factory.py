@@ -6,9 +6,12 @@ from django.db.models import Max
 
 from django.contrib import admin
 from django.contrib.admin import SimpleListFilter
+from django.db import transaction
+from django_q.tasks import async_task
 from django.utils.html import format_html
 
-from api.models import ReportRecord, Image
+from api.cache import invalidate_factory_tiles
+from api.models import Factory, ReportRecord, Image
 from api.admin.actions import (
     ExportCsvMixin,
     RestoreMixin,
@@ -20,7 +23,6 @@ from rangefilter.filter import DateRangeFilter
 from import_export.admin import ImportExportModelAdmin
 from django.urls import reverse
 from django.utils.safestring import mark_safe
-import easymap
 
 
 class FactoryWithReportRecords(DateRangeFilter):
@@ -75,9 +77,7 @@ class FactoryFilteredByCounty(SimpleListFilter):
     def queryset(self, request, queryset):
         if self.value():
             county_dict = dict(self.county_mappings)
-            county = county_dict[self.value()]
-            standardized_county = county.replace("臺", "(台|臺)")
-            return queryset.filter(townname__iregex=standardized_county)
+            return queryset.filter(city=county_dict[self.value()])
         else:
             return queryset
 
@@ -277,17 +277,28 @@ class FactoryAdmin(
         return format_html(html_template)
 
     def save_model(self, request, obj, form, change):
-        landinfo = easymap.get_land_number(obj.lng, obj.lat)
-        landcode = landinfo.get('landno')
-
-        obj.landcode = landcode
-        obj.sectno = landinfo.get('sectno')
-        obj.sectname = landinfo.get('sectName')
-        obj.towncode = landinfo.get('towncode')
-        obj.townname = landinfo.get('townname')
+        moved = True
+        if change:
+            old_obj = Factory.raw_objects.only("lat", "lng").get(pk=obj.pk)
+            moved = (old_obj.lat, old_obj.lng) != (obj.lat, obj.lng)
+            invalidate_factory_tiles((old_obj.lat, old_obj.lng))
+        invalidate_factory_tiles((obj.lat, obj.lng))
 
         super().save_model(request, obj, form, change)
 
+        if moved:
+            # resolved in the background like reported factories, shown on the next page load
+            transaction.on_commit(lambda: async_task("api.tasks.update_landcode", obj.pk))
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        invalidate_factory_tiles((obj.lat, obj.lng))
+
+    def delete_queryset(self, request, queryset):
+        positions = list(queryset.values_list("lat", "lng"))
+        super().delete_queryset(request, queryset)
+        invalidate_factory_tiles(*positions)
+
 
 class RecycledFactoryAdmin(admin.ModelAdmin, RestoreMixin):
     list_display = (
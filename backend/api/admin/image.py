@@ -1,5 +1,6 @@
 from django.contrib import admin
 from api.admin.actions import ExportCsvMixin, RestoreMixin
+from api.cache import invalidate_factory_tiles
 
 
 class ImageAdmin(admin.ModelAdmin, ExportCsvMixin):
@@ -15,6 +16,11 @@ class ImageAdmin(admin.ModelAdmin, ExportCsvMixin):
     ordering = ["orig_time", "-created_at"]
     actions = ["export_as_csv"]
 
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if obj.factory is not None:
+            invalidate_factory_tiles((obj.factory.lat, obj.factory.lng))
+
 
 class RecycledImageAdmin(admin.ModelAdmin, RestoreMixin):
     list_display = (
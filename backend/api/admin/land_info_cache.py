@@ -0,0 +1,32 @@
+from django.contrib import admin
+
+from api.models import get_land_info_cache_stats
+
+
+class LandInfoCacheAdmin(admin.ModelAdmin):
+    list_display = (
+        "lng",
+        "lat",
+        "precision",
+        "landno",
+        "sectName",
+        "towncode",
+        "hits",
+        "misses",
+        "fetched_at",
+    )
+    ordering = ["-hits"]
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def changelist_view(self, request, extra_context=None):
+        stats = get_land_info_cache_stats()
+        extra_context = {
+            "title": f"Land info cache: {stats['entries']} entries, {stats['hits']} hits, {stats['misses']} misses",
+            **(extra_context or {}),
+        }
+        return super().changelist_view(request, extra_context=extra_context)
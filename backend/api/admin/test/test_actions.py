@@ -1,7 +1,8 @@
 from api.models.factory import Factory
-from api.models.document import Document
+from api.models.document import Document, DocumentCodeCounter
 from api.models.image import Image
 import datetime
+from unittest.mock import patch
 
 from django.contrib.admin.options import ModelAdmin
 from django.contrib.admin.sites import AdminSite
@@ -92,6 +93,45 @@ class ModelAdminTests(TestCase):
         ma = ModelAdmin(Factory, self.site)
         self.assertEqual(str(ma), "api.ModelAdmin")
 
+    def test_generate_docs_action(self):
+        taiwan_year = datetime.date.today().year - 1911
+        DocumentCodeCounter.objects.create(year=taiwan_year, last_serial=41)
+        generate_docs_request = {
+            "action": "generate_docs",
+            "select_across": 0,
+            "index": 0,
+            "_selected_action": [str(factory.id) for factory in self.factories],
+        }
+
+        with patch("api.admin.actions.generate_docs.GENERATE_DOCS_BATCH_SIZE", 1):
+            response = self.client.post("/admin/api/factory/", generate_docs_request)
+            self.assertEqual(response.status_code, 302)
+            response = self.client.post("/admin/api/factory/", generate_docs_request)
+            self.assertEqual(response.status_code, 302)
+
+        codes = sorted(Document.objects.values_list("code", flat=True))
+        self.assertEqual(codes, [taiwan_year * 10 ** 4 + serial for serial in range(42, 46)])
+        for factory in self.factories:
+            factory.refresh_from_db()
+            self.assertEqual(factory.cet_review_status, "X")
+            self.assertEqual(factory.documents.count(), 2)
+
+    def test_generate_docs_action_refused_if_serials_used_up(self):
+        taiwan_year = datetime.date.today().year - 1911
+        DocumentCodeCounter.objects.create(year=taiwan_year, last_serial=9999)
+        generate_docs_request = {
+            "action": "generate_docs",
+            "select_across": 0,
+            "index": 0,
+            "_selected_action": [str(factory.id) for factory in self.factories],
+        }
+
+        response = self.client.post("/admin/api/factory/", generate_docs_request, follow=True)
+
+        self.assertIn("無法產生公文", [str(message)[:6] for message in response.context["messages"]])
+        self.assertFalse(Document.objects.filter(factory__in=self.factories).exists())
+        self.assertEqual(DocumentCodeCounter.objects.get(year=taiwan_year).last_serial, 9999)
+
     def test_export_doc_action(self):
         # Remove all document models
         Document.objects.all().delete()
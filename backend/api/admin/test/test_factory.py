@@ -0,0 +1,61 @@
+from unittest.mock import patch
+
+from django.contrib.admin.sites import AdminSite
+from django.test import TestCase
+
+from api.admin.factory import FactoryAdmin, RecycledFactoryAdmin
+from api.models import Factory
+from api.models.factory import RecycledFactory
+
+
+class MockRequest:
+    pass
+
+
+@patch("api.admin.factory.transaction.on_commit", side_effect=lambda func: func())
+@patch("api.admin.factory.async_task")
+class FactoryAdminSaveModelTests(TestCase):
+    def setUp(self):
+        self.admin = FactoryAdmin(Factory, AdminSite())
+        self.factory = Factory.objects.create(lat=24.93, lng=121.37, display_number=60001)
+
+    def test_save_new_factory_enqueue_update_landcode(self, mock_async_task, _):
+        factory = Factory(lat=24.93, lng=121.37)
+        self.admin.save_model(MockRequest(), factory, None, False)
+
+        mock_async_task.assert_called_once_with("api.tasks.update_landcode", factory.pk)
+
+    def test_save_moved_factory_enqueue_update_landcode(self, mock_async_task, _):
+        self.factory.lat = 24.94
+        self.admin.save_model(MockRequest(), self.factory, None, True)
+
+        mock_async_task.assert_called_once_with("api.tasks.update_landcode", self.factory.pk)
+
+    def test_save_unmoved_factory_skip_update_landcode(self, mock_async_task, _):
+        self.factory.name = "renamed"
+        self.admin.save_model(MockRequest(), self.factory, None, True)
+
+        mock_async_task.assert_not_called()
+        self.assertEqual(Factory.objects.get(pk=self.factory.pk).name, "renamed")
+
+
+@patch("api.admin.actions.restore.invalidate_factory_tiles")
+@patch("api.admin.factory.invalidate_factory_tiles")
+class FactoryAdminDeleteTests(TestCase):
+    def setUp(self):
+        self.factory = Factory.objects.create(lat=24.93, lng=121.37, display_number=60001)
+
+    def test_delete_selected_invalidate_tiles(self, mock_invalidate, _):
+        FactoryAdmin(Factory, AdminSite()).delete_queryset(MockRequest(), Factory.objects.filter(pk=self.factory.pk))
+
+        self.assertFalse(Factory.objects.filter(pk=self.factory.pk).exists())
+        mock_invalidate.assert_called_once_with((24.93, 121.37))
+
+    def test_restore_invalidate_tiles(self, _, mock_invalidate):
+        Factory.objects.filter(pk=self.factory.pk).delete()
+
+        admin = RecycledFactoryAdmin(RecycledFactory, AdminSite())
+        admin.restore(MockRequest(), RecycledFactory.objects.filter(pk=self.factory.pk))
+
+        self.assertTrue(Factory.objects.filter(pk=self.factory.pk).exists())
+        mock_invalidate.assert_called_once_with((24.93, 121.37))
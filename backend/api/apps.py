@@ -3,3 +3,8 @@ from django.apps import AppConfig
 
 class ApiConfig(AppConfig):
     name = "api"
+
+    def ready(self):
+        from .signals import connect_factory_summary_signals
+
+        connect_factory_summary_signals()
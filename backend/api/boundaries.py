@@ -0,0 +1,48 @@
+"""Town and land section of coordinates from the boundary files, without calling easymap.
+
+The GeoJSON files are configured with `TOWN_BOUNDARY_PATH` and
+`SECTION_BOUNDARY_PATH`, and loaded once per worker on first use. Feature
+properties follow the NLSC datasets: TOWNCODE / COUNTYNAME / TOWNNAME for
+towns and SECTNO / SECTNAME for sections.
+"""
+import threading
+
+from django.conf import settings
+
+import towninfo
+from towninfo.boundaries import load_geojson
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def _get_boundary_index(path):
+    with _indexes_lock:
+        if path not in _indexes:
+            _indexes[path] = load_geojson(path)
+        return _indexes[path]
+
+
+def get_local_land_info(lng, lat):
+    """Return the towncode, townname, sectno and sectName the boundary files know of, or {}.
+
+    `landno` is never included, parcels are only known by easymap.
+    """
+    land_info = {}
+
+    if settings.TOWN_BOUNDARY_PATH:
+        town = _get_boundary_index(settings.TOWN_BOUNDARY_PATH).lookup(lng, lat)
+        if town is not None:
+            towncode = town.get("TOWNCODE")
+            land_info["towncode"] = towncode
+            land_info["townname"] = (
+                towninfo.code2name.get(towncode) or f"{town.get('COUNTYNAME', '')}{town.get('TOWNNAME', '')}"
+            )
+
+    if settings.SECTION_BOUNDARY_PATH:
+        section = _get_boundary_index(settings.SECTION_BOUNDARY_PATH).lookup(lng, lat)
+        if section is not None:
+            land_info["sectno"] = section.get("SECTNO")
+            land_info["sectName"] = section.get("SECTNAME")
+
+    return land_info
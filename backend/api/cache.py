@@ -0,0 +1,187 @@
+"""Caches of serialized API payloads.
+
+Nearby factory positions are cached per slippy map tile. Each tile has a
+generation token that is replaced whenever a factory inside it changes, so
+payloads cached under the old token are never read again and simply expire.
+The factories picked among them are serialized once and cached per factory.
+
+Generation tokens live in the cache of each process when it is a local
+memory cache, so keys read by conditional GETs also carry the factories
+watermark the ETag is derived from: a write made in another process moves
+the watermark, and the payloads cached before it are missed.
+
+Statistics payloads share a single generation token, replaced whenever the
+statistics rollups are refreshed, and carry the watermark as well.
+"""
+import hashlib
+import uuid
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+from .geo import MAX_ZOOM, lnglat_to_tile
+
+FACTORY_TILE_GENERATION_KEY = "factory-tile-generation:{zoom}:{x}:{y}"
+FACTORY_TILE_POSITIONS_KEY = "factory-tile-positions:{zoom}:{x}:{y}:{watermark}:{generation}"
+FACTORY_TILE_CLUSTERS_KEY = "factory-tile-clusters:{zoom}:{x}:{y}:{watermark}:{generation}"
+FACTORY_TILE_MARKERS_KEY = "factory-tile-markers:{zoom}:{x}:{y}:{watermark}:{generation}"
+FACTORY_PAYLOAD_KEY = "factory:{id}:{watermark}"
+
+STATISTICS_GENERATION_KEY = "statistics-generation"
+STATISTICS_PAYLOAD_KEY = "statistics:{name}:{params}:{watermark}:{generation}"
+
+
+def _get_cache():
+    return caches[settings.FACTORY_TILE_CACHE_ALIAS]
+
+
+def _new_generation():
+    return uuid.uuid4().hex
+
+
+def _watermark_key(watermark):
+    return round(watermark.timestamp() * 10 ** 6) if watermark is not None else None
+
+
+def get_factory_tile_payloads(zoom, tiles, load_payloads, payload_key, watermark=None):
+    """Return {(x, y): payload} of the tiles, calling `load_payloads(zoom, missing_tiles)` on miss.
+
+    Every kind of payload shares the generation of its tile, so a single
+    invalidation covers them all; `payload_key` keeps the kinds apart.
+    """
+    cache = _get_cache()
+
+    generation_keys = {
+        tile: FACTORY_TILE_GENERATION_KEY.format(zoom=zoom, x=tile[0], y=tile[1]) for tile in tiles
+    }
+    cached_generations = cache.get_many(generation_keys.values())
+    generations = {}
+    new_generations = {}
+    for tile, key in generation_keys.items():
+        if key in cached_generations:
+            generations[tile] = cached_generations[key]
+        else:
+            generations[tile] = new_generations[key] = _new_generation()
+    if new_generations:
+        cache.set_many(new_generations, timeout=None)
+
+    payload_keys = {
+        tile: payload_key.format(
+            zoom=zoom,
+            x=tile[0],
+            y=tile[1],
+            watermark=_watermark_key(watermark),
+            generation=generations[tile],
+        )
+        for tile in tiles
+    }
+    cached_payloads = cache.get_many(payload_keys.values())
+    payloads = {
+        tile: cached_payloads[key] for tile, key in payload_keys.items() if key in cached_payloads
+    }
+
+    missing_tiles = [tile for tile in tiles if tile not in payloads]
+    if missing_tiles:
+        loaded_payloads = load_payloads(zoom, missing_tiles)
+        cache.set_many(
+            {payload_keys[tile]: payload for tile, payload in loaded_payloads.items()},
+            timeout=settings.FACTORY_TILE_CACHE_TIMEOUT,
+        )
+        payloads.update(loaded_payloads)
+
+    return payloads
+
+
+def get_factory_payloads(ids, load_payloads, watermark):
+    """Return {id: payload} of the factories as of the watermark, calling `load_payloads(missing_ids)` on miss."""
+    if watermark is None:
+        return load_payloads(ids)
+
+    cache = _get_cache()
+    payload_keys = {
+        factory_id: FACTORY_PAYLOAD_KEY.format(id=factory_id, watermark=_watermark_key(watermark))
+        for factory_id in ids
+    }
+    cached_payloads = cache.get_many(payload_keys.values())
+    payloads = {
+        factory_id: cached_payloads[key]
+        for factory_id, key in payload_keys.items()
+        if key in cached_payloads
+    }
+
+    missing_ids = [factory_id for factory_id in ids if factory_id not in payloads]
+    if missing_ids:
+        loaded_payloads = load_payloads(missing_ids)
+        cache.set_many(
+            {payload_keys[factory_id]: payload for factory_id, payload in loaded_payloads.items()},
+            timeout=settings.FACTORY_TILE_CACHE_TIMEOUT,
+        )
+        payloads.update(loaded_payloads)
+
+    return payloads
+
+
+def invalidate_factory_tiles(*positions):
+    """Drop cached payloads of the tiles containing the (lat, lng) positions, once committed."""
+    positions = [
+        (float(lat), float(lng)) for lat, lng in positions if lat is not None and lng is not None
+    ]
+
+    def invalidate():
+        generations = {}
+        for lat, lng in positions:
+            for zoom in range(MAX_ZOOM + 1):
+                x, y = lnglat_to_tile(lng, lat, zoom)
+                key = FACTORY_TILE_GENERATION_KEY.format(zoom=zoom, x=x, y=y)
+                generations[key] = _new_generation()
+        _get_cache().set_many(generations, timeout=None)
+
+    transaction.on_commit(invalidate)
+
+
+def _get_statistics_cache():
+    return caches[settings.STATISTICS_CACHE_ALIAS]
+
+
+def get_statistics_payload(name, params, watermark):
+    """Return (key, payload) of the statistics query as of the watermark, payload is None on miss.
+
+    Pass the key to `set_statistics_payload` after loading a missing payload.
+    The key is None when the cache is disabled.
+    """
+    if settings.STATISTICS_CACHE_TIMEOUT <= 0:
+        return None, None
+
+    cache = _get_statistics_cache()
+    generation = cache.get(STATISTICS_GENERATION_KEY)
+    if generation is None:
+        cache.add(STATISTICS_GENERATION_KEY, _new_generation(), timeout=None)
+        generation = cache.get(STATISTICS_GENERATION_KEY)
+
+    # hashed to keep non-ASCII townnames out of the cache keys
+    params = hashlib.md5(urlencode(sorted(params.items())).encode()).hexdigest()
+    key = STATISTICS_PAYLOAD_KEY.format(
+        name=name, params=params, watermark=_watermark_key(watermark), generation=generation
+    )
+    return key, cache.get(key)
+
+
+def set_statistics_payload(key, payload):
+    if key is not None:
+        _get_statistics_cache().set(key, payload, timeout=settings.STATISTICS_CACHE_TIMEOUT)
+
+
+def invalidate_statistics():
+    """Drop every cached statistics payload, now and again once committed.
+
+    The second invalidation drops payloads that concurrent requests loaded
+    before this transaction was committed.
+    """
+
+    def invalidate():
+        _get_statistics_cache().set(STATISTICS_GENERATION_KEY, _new_generation(), timeout=None)
+
+    invalidate()
+    transaction.on_commit(invalidate)
@@ -0,0 +1,76 @@
+"""Geometry helpers shared by the nearby factory queries and caches."""
+import math
+
+EARTH_RADIUS_KM = 6371
+EARTH_CIRCUMFERENCE_KM = 40075.016686
+
+# slippy map tiles, ref: https://wiki.openstreetmap.org/wiki/Slippy_map_tilenames
+MAX_ZOOM = 18
+
+
+def great_circle_distance(lat1, lng1, lat2, lng2):
+    """Return the distance in km, the same formula as the SQL in `_get_nearby_factories`."""
+    lat1, lng1, lat2, lng2 = map(math.radians, (lat1, lng1, lat2, lng2))
+    cos_angle = math.cos(lat1) * math.cos(lat2) * math.cos(lng2 - lng1) + math.sin(
+        lat1
+    ) * math.sin(lat2)
+    return EARTH_RADIUS_KM * math.acos(min(1.0, max(-1.0, cos_angle)))
+
+
+def get_bounding_box(latitude, longitude, radius):
+    """Return (min_lat, max_lat, min_lng, max_lng) enclosing the circle of `radius` km.
+
+    ref: http://janmatuschek.de/LatitudeLongitudeBoundingCoordinates
+    """
+    angular_radius = radius / EARTH_RADIUS_KM
+    lat_delta = math.degrees(angular_radius)
+
+    # the meridians touching the circle are at asin(sin(r) / cos(lat)) from the center
+    sin_ratio = math.sin(angular_radius) / math.cos(math.radians(latitude))
+    if sin_ratio >= 1:
+        lng_delta = 180
+    else:
+        lng_delta = math.degrees(math.asin(sin_ratio))
+
+    return (
+        latitude - lat_delta,
+        latitude + lat_delta,
+        longitude - lng_delta,
+        longitude + lng_delta,
+    )
+
+
+def lnglat_to_tile(lng, lat, zoom):
+    """Return the (x, y) of the tile containing the position at `zoom`."""
+    n = 2 ** zoom
+    lat_rad = math.radians(lat)
+    x = int((lng + 180.0) / 360.0 * n)
+    y = int((1.0 - math.asinh(math.tan(lat_rad)) / math.pi) / 2.0 * n)
+    return (min(max(x, 0), n - 1), min(max(y, 0), n - 1))
+
+
+def tile_bounds(zoom, x, y):
+    """Return (min_lat, max_lat, min_lng, max_lng) of the tile."""
+    n = 2 ** zoom
+    min_lng = x / n * 360.0 - 180.0
+    max_lng = (x + 1) / n * 360.0 - 180.0
+    max_lat = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y / n))))
+    min_lat = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * (y + 1) / n))))
+    return (min_lat, max_lat, min_lng, max_lng)
+
+
+def zoom_for_radius(lat, radius):
+    """Return the largest zoom whose tiles are at least `radius` km wide at `lat`.
+
+    A circle of `radius` km is then covered by at most 3x3 tiles of that zoom.
+    """
+    tile_width_at_zoom_0 = EARTH_CIRCUMFERENCE_KM * math.cos(math.radians(lat))
+    zoom = math.floor(math.log2(tile_width_at_zoom_0 / radius))
+    return min(max(zoom, 0), MAX_ZOOM)
+
+
+def tiles_in_bounding_box(zoom, min_lat, max_lat, min_lng, max_lng):
+    """Return every (x, y) at `zoom` intersecting the bounding box."""
+    min_x, min_y = lnglat_to_tile(min_lng, max_lat, zoom)
+    max_x, max_y = lnglat_to_tile(max_lng, min_lat, zoom)
+    return [(x, y) for x in range(min_x, max_x + 1) for y in range(min_y, max_y + 1)]
@@ -0,0 +1,209 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.functions import Now
+
+import easymap
+from api.boundaries import get_local_land_info
+from api.cache import invalidate_factory_tiles
+from api.models import (
+    Factory,
+    cache_land_info,
+    get_cached_land_infos,
+    land_info_cache_key,
+    refresh_factory_stats_rollups_of_factories,
+)
+from api.tasks import LANDINFO_FIELDS, factory_fields_of_landinfo
+
+# consecutive batches skipped while easymap is unavailable before giving up
+MAX_BACKOFFS = 5
+
+
+class RateLimiter:
+    """Space calls at least 1 / `rate` seconds apart across threads."""
+
+    def __init__(self, rate):
+        self.interval = 1 / rate if rate > 0 else 0
+        self._next_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            wait_until = max(self._next_at, now)
+            self._next_at = wait_until + self.interval
+        time.sleep(max(0, wait_until - now))
+
+
+class Command(BaseCommand):
+    help = "look up land numbers of the factories whose landcode or townname is missing"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--missing", choices=["any", "landcode", "townname"], default="any")
+        parser.add_argument("--city", help="only backfill factories in this city, e.g. 臺中市")
+        parser.add_argument("--source", help="only backfill factories of this source, e.g. G")
+        parser.add_argument("--limit", type=int, help="stop after this many factories")
+        parser.add_argument("--concurrency", type=int, default=4, help="easymap lookups in flight")
+        parser.add_argument("--rate", type=float, default=5, help="easymap lookups per second, 0 for no limit")
+        parser.add_argument("--batch-size", type=int, default=100)
+        parser.add_argument("--checkpoint", help="JSON file recording progress, resumed from if it exists")
+        parser.add_argument("--backoff", type=float, default=60, help="seconds to wait while easymap is unavailable")
+
+    def handle(self, *args, **options):
+        if options["concurrency"] < 1 or options["batch_size"] < 1:
+            raise CommandError("--concurrency and --batch-size should be positive")
+
+        queryset = self._filter_factories(options).order_by("id").only(
+            "id", "lat", "lng", "city", "town", *(field for field, _ in LANDINFO_FIELDS)
+        )
+        checkpoint = options["checkpoint"]
+        last_id = self._load_checkpoint(checkpoint)
+        if last_id is not None:
+            queryset = queryset.filter(id__gt=last_id)
+            self.stdout.write(f"Resuming after factory {last_id}")
+
+        total = queryset.count()
+        if options["limit"] is not None:
+            total = min(total, options["limit"])
+
+        client = easymap.get_default_client()
+        limiter = RateLimiter(options["rate"])
+        done = updated = failed = backoffs = 0
+
+        with ThreadPoolExecutor(max_workers=options["concurrency"]) as executor:
+            while done < total:
+                remaining = queryset.filter(id__gt=last_id) if last_id is not None else queryset
+                batch = list(remaining[:min(options["batch_size"], total - done)])
+                if not batch:
+                    break
+
+                results = self._lookup_batch(batch, client, limiter, executor)
+                # progress only up to the first skipped lookup, the factories after it are looked up again
+                skipped = [idx for idx, (_, _, succeeded) in enumerate(results) if succeeded is None]
+                if skipped:
+                    results = results[:skipped[0]]
+
+                if results:
+                    updated += self._save_batch(results)
+                    failed += sum(1 for _, _, succeeded in results if not succeeded)
+                    done += len(results)
+
+                    last_id = results[-1][0].id
+                    self._save_checkpoint(checkpoint, last_id)
+                    self.stdout.write(f"{done}/{total} factories, {updated} updated, {failed} failed")
+                    backoffs = 0
+
+                if skipped:
+                    backoffs += 1
+                    if backoffs > MAX_BACKOFFS:
+                        raise CommandError(
+                            f"Easymap is still unavailable, stopped after {done} factories, {updated} updated"
+                        )
+                    self.stderr.write(f"Easymap is unavailable, waiting {options['backoff']} seconds")
+                    time.sleep(options["backoff"])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Backfilled {updated} of {done} factories, {failed} lookups failed"
+        ))
+
+    def _lookup_batch(self, batch, client, limiter, executor):
+        """Return (factory, landinfo, succeeded) of the factories, succeeded is None if the lookup was skipped.
+
+        Factories sharing cached coordinates are answered from `LandInfoCache`,
+        and easymap is asked once per missing coordinates, filling the cache.
+        """
+        keys = {factory.id: land_info_cache_key(factory.lng, factory.lat) for factory in batch}
+        land_infos = get_cached_land_infos(keys.values())
+        missing = {}
+        for factory in batch:
+            if keys[factory.id] not in land_infos:
+                missing.setdefault(keys[factory.id], factory)
+
+        def lookup(key):
+            factory = missing[key]
+            limiter.wait()
+            try:
+                return key, client.get_land_number(factory.lng, factory.lat)
+            except easymap.EasymapUnavailable:
+                return key, None
+            except Exception as e:
+                self.stderr.write(f"Factory {factory.id} failed retrieving land number: {e}")
+                return key, e
+
+        # the cache is read and written here, the lookup threads only talk to easymap
+        for key, land_info in executor.map(lookup, list(missing)):
+            if isinstance(land_info, dict):
+                cache_land_info(key, land_info)
+            land_infos[key] = land_info
+
+        results = []
+        for factory in batch:
+            landinfo = get_local_land_info(factory.lng, factory.lat)
+            land_info = land_infos[keys[factory.id]]
+            if land_info is None:
+                results.append((factory, landinfo, None))
+            elif isinstance(land_info, Exception):
+                results.append((factory, landinfo, False))
+            else:
+                landinfo.update(land_info)
+                for _, key in LANDINFO_FIELDS:
+                    landinfo.setdefault(key, None)
+                results.append((factory, landinfo, True))
+        return results
+
+    def _filter_factories(self, options):
+        missing = {
+            "landcode": Q(landcode__isnull=True) | Q(landcode=""),
+            "townname": Q(townname__isnull=True) | Q(townname=""),
+        }
+        if options["missing"] == "any":
+            queryset = Factory.objects.filter(missing["landcode"] | missing["townname"])
+        else:
+            queryset = Factory.objects.filter(missing[options["missing"]])
+
+        if options["city"]:
+            queryset = queryset.filter(city=options["city"])
+        if options["source"]:
+            queryset = queryset.filter(source=options["source"])
+        return queryset
+
+    def _load_checkpoint(self, checkpoint):
+        if not checkpoint or not os.path.exists(checkpoint):
+            return None
+        with open(checkpoint, "r") as f:
+            return json.load(f)["last_id"]
+
+    def _save_checkpoint(self, checkpoint, last_id):
+        if not checkpoint:
+            return
+        # write then rename, so an interrupted run never leaves a broken checkpoint
+        with open(f"{checkpoint}.tmp", "w") as f:
+            json.dump({"last_id": str(last_id)}, f)
+        os.replace(f"{checkpoint}.tmp", checkpoint)
+
+    def _save_batch(self, results):
+        factories = []
+        for factory, landinfo, _ in results:
+            fields = factory_fields_of_landinfo(landinfo)
+            if not fields:
+                continue
+
+            for field, value in fields.items():
+                setattr(factory, field, value)
+            factory.updated_at = Now()
+            factories.append(factory)
+
+        with transaction.atomic():
+            Factory.objects.bulk_update(
+                factories,
+                [field for field, _ in LANDINFO_FIELDS] + ["city", "town", "updated_at"],
+            )
+            refresh_factory_stats_rollups_of_factories([factory.id for factory in factories])
+        invalidate_factory_tiles(*[(factory.lat, factory.lng) for factory in factories])
+        return len(factories)
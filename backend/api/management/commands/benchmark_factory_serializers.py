@@ -0,0 +1,92 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.http import JsonResponse
+
+from api.models import Factory, Image, ReportRecord, refresh_factory_summaries
+from api.models.factory import next_display_numbers
+from api.serializers import FactorySerializer, serialize_factories
+from api.views.utils import _prefetch_factory_relations
+
+
+class Command(BaseCommand):
+    help = (
+        "benchmark FactorySerializer against serialize_factories on synthetic factories, "
+        "all changes are rolled back afterwards"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", type=int, nargs="+", default=[50, 500, 5000])
+        parser.add_argument("--images-per-factory", type=int, default=2)
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def handle(self, *args, **options):
+        sizes = sorted(options["sizes"])
+
+        with transaction.atomic():
+            factory_ids = self._create_synthetic_factories(
+                sizes[-1], options["images_per_factory"]
+            )
+
+            results = []
+            for size in sizes:
+                queryset = Factory.objects.filter(id__in=factory_ids[:size])
+                serializer, serializer_body = self._measure(
+                    lambda: FactorySerializer(_prefetch_factory_relations(queryset), many=True).data,
+                    options["repeat"],
+                )
+                fast_path, fast_path_body = self._measure(
+                    lambda: serialize_factories(queryset),
+                    options["repeat"],
+                )
+                if serializer_body != fast_path_body:
+                    raise CommandError(f"Responses of {size} factories are different")
+                results.append((size, serializer, fast_path))
+
+            transaction.set_rollback(True)
+
+        for size, serializer, fast_path in results:
+            self.stdout.write(
+                f"{size:>6} factories: FactorySerializer {serializer * 1000:8.2f} ms, "
+                f"serialize_factories {fast_path * 1000:8.2f} ms, "
+                f"speedup {serializer / fast_path:.1f}x"
+            )
+        self.stdout.write(self.style.SUCCESS("Responses are byte identical"))
+
+    def _create_synthetic_factories(self, n_factories, images_per_factory):
+        factories = Factory.objects.bulk_create(
+            Factory(
+                lat=23.5 + idx * 1e-5,
+                lng=121.0,
+                name=f"benchmark factory {idx}",
+                factory_type="2-1",
+                display_number=display_number,
+            )
+            for idx, display_number in enumerate(next_display_numbers(n_factories))
+        )
+        report_records = ReportRecord.objects.bulk_create(
+            ReportRecord(factory=factory, action_type="POST", action_body={})
+            for factory in factories
+        )
+        Image.objects.bulk_create(
+            Image(
+                factory=report_record.factory,
+                report_record=report_record,
+                image_path=f"https://i.imgur.com/{report_record.factory.display_number}-{idx}.png",
+            )
+            for report_record in report_records
+            for idx in range(images_per_factory)
+        )
+        factory_ids = [factory.id for factory in factories]
+        refresh_factory_summaries(factory_ids)
+        return factory_ids
+
+    def _measure(self, serialize, repeat):
+        elapsed = 0
+        for _ in range(repeat):
+            start = time.perf_counter()
+            body = JsonResponse(serialize(), safe=False).content
+            elapsed += time.perf_counter() - start
+
+        return elapsed / repeat, body
@@ -0,0 +1,93 @@
+import random
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models.functions.math import Radians, Cos, ACos, Sin
+
+from api.models import Factory
+from api.models.factory import next_display_numbers
+from api.geo import EARTH_RADIUS_KM, get_bounding_box
+
+
+class Command(BaseCommand):
+    help = (
+        "benchmark the nearby factory query with and without the bounding box prefilter "
+        "on a synthetic factory table, all changes are rolled back afterwards"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--factories", type=int, default=500000)
+        parser.add_argument("--queries", type=int, default=20)
+        parser.add_argument("--radius", type=float, default=2.0)
+        parser.add_argument("--batch-size", type=int, default=10000)
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+
+        with transaction.atomic():
+            self._create_synthetic_factories(rng, options["factories"], options["batch_size"])
+            with connection.cursor() as cursor:
+                cursor.execute("ANALYZE api_factory")
+
+            points = [self._random_point(rng) for _ in range(options["queries"])]
+            radius = options["radius"]
+
+            full_scan = self._measure(points, radius, use_bounding_box=False)
+            prefiltered = self._measure(points, radius, use_bounding_box=True)
+
+            transaction.set_rollback(True)
+
+        self.stdout.write(f"factories: {options['factories']}, radius: {radius} km")
+        self.stdout.write(f"full scan:          {full_scan * 1000:.2f} ms/query")
+        self.stdout.write(f"bounding box index: {prefiltered * 1000:.2f} ms/query")
+        self.stdout.write(self.style.SUCCESS(f"speedup: {full_scan / prefiltered:.1f}x"))
+
+    def _random_point(self, rng):
+        return (
+            rng.uniform(settings.TAIWAN_MIN_LATITUDE, settings.TAIWAN_MAX_LATITUDE),
+            rng.uniform(settings.TAIWAN_MIN_LONGITUDE, settings.TAIWAN_MAX_LONGITUDE),
+        )
+
+    def _create_synthetic_factories(self, rng, n_factories, batch_size):
+        for offset in range(0, n_factories, batch_size):
+            batch = []
+            indices = range(offset, min(offset + batch_size, n_factories))
+            for idx, display_number in zip(indices, next_display_numbers(len(indices))):
+                lat, lng = self._random_point(rng)
+                batch.append(
+                    Factory(
+                        lat=lat,
+                        lng=lng,
+                        name=f"benchmark factory {idx}",
+                        display_number=display_number,
+                    )
+                )
+            Factory.objects.bulk_create(batch)
+            self.stdout.write(f"created {offset + len(batch)}/{n_factories} factories")
+
+    def _measure(self, points, radius, use_bounding_box):
+        elapsed = 0
+        for latitude, longitude in points:
+            distance = EARTH_RADIUS_KM * ACos(
+                Cos(Radians(latitude))
+                * Cos(Radians("lat"))
+                * Cos(Radians("lng") - Radians(longitude))
+                + Sin(Radians(latitude)) * Sin(Radians("lat"))
+            )
+            queryset = Factory.objects.only("id")
+            if use_bounding_box:
+                min_lat, max_lat, min_lng, max_lng = get_bounding_box(latitude, longitude, radius)
+                queryset = queryset.filter(
+                    lat__range=(min_lat, max_lat),
+                    lng__range=(min_lng, max_lng),
+                )
+            queryset = queryset.annotate(distance=distance).filter(distance__lt=radius)
+
+            start = time.perf_counter()
+            list(queryset.values_list("id", flat=True))
+            elapsed += time.perf_counter() - start
+
+        return elapsed / len(points)
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api.models import Factory, refresh_factory_stats_rollups, refresh_factory_summaries
+
+
+class Command(BaseCommand):
+    help = "recompute reported_at, data_complete and document_display_status of every factory"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        factory_ids = list(Factory.raw_objects.order_by("id").values_list("id", flat=True))
+        batch_size = options["batch_size"]
+
+        for start in range(0, len(factory_ids), batch_size):
+            with transaction.atomic():
+                refresh_factory_summaries(factory_ids[start:start + batch_size])
+            self.stdout.write(f"{min(start + batch_size, len(factory_ids))}/{len(factory_ids)}")
+
+        # the rollups are grouped by `document_display_status`
+        refresh_factory_stats_rollups()
+        self.stdout.write(self.style.SUCCESS(f"Refreshed summaries of {len(factory_ids)} factories"))
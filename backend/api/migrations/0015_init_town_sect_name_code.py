@@ -5,12 +5,25 @@ import csv
 from django.db import migrations
 from django.conf import settings
 
-from api.tasks import update_landcode_with_custom_factory_model
+import easymap
 
 
 SEED_DATA_PATH = os.path.join(settings.BASE_DIR, "fixtures/full-info.csv")
 
 
+def update_landcode(factory_id, Factory):
+    # inlined rather than calling api.tasks, whose code targets the current models
+    factory = Factory.objects.get(pk=factory_id)
+    landinfo = easymap.get_land_number(factory.lng, factory.lat)
+    Factory.objects.filter(pk=factory_id).update(
+        landcode=landinfo.get("landno"),
+        sectcode=landinfo.get("sectno"),
+        sectname=landinfo.get("sectName"),
+        towncode=landinfo.get("towncode"),
+        townname=landinfo.get("townname"),
+    )
+
+
 def forward_func(apps, schema_editor):
     Factory = apps.get_model("api", "Factory")
 
@@ -43,7 +56,7 @@ def forward_func(apps, schema_editor):
     print(f'{after_release_count} factories will be updated')
     for idx, factory in enumerate(Factory.objects.filter(before_release=False).all()):
         print(f'{idx}/{after_release_count}: get landcode of {factory.id} {factory.name}')
-        update_landcode_with_custom_factory_model(factory.id, Factory)
+        update_landcode(factory.id, Factory)
 
 
 def backward_func(apps, schema_editor):
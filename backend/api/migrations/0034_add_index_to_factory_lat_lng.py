@@ -0,0 +1,17 @@
+# Generated by Django 2.2.13 on 2026-10-17 02:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0033_remove_factory_point'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='factory',
+            index=models.Index(fields=['lat', 'lng'], name='api_factory_lat_459faa_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 2.2.13 on 2026-10-17 02:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0034_add_index_to_factory_lat_lng'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='factory',
+            name='data_complete',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.AddField(
+            model_name='factory',
+            name='document_display_status',
+            field=models.IntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='factory',
+            name='reported_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.13 on 2026-10-17 02:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0035_add_summary_fields_to_factory'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='factory',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+    ]
@@ -0,0 +1,40 @@
+from django.db import migrations, models
+
+from api.utils import split_townname
+
+
+def forward_func(apps, schema_editor):
+    Factory = apps.get_model("api", "Factory")
+
+    townnames = Factory.objects.exclude(townname=None).values_list("townname", flat=True).distinct()
+    for townname in townnames:
+        city, town = split_townname(townname)
+        Factory.objects.filter(townname=townname).update(city=city, town=town)
+
+
+def backward_func(apps, schema_editor):
+    pass
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0036_add_index_to_factory_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='factory',
+            name='city',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=50, null=True),
+        ),
+        migrations.AddField(
+            model_name='factory',
+            name='town',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=50, null=True),
+        ),
+        migrations.RunPython(
+            code=forward_func,
+            reverse_code=backward_func,
+        ),
+    ]
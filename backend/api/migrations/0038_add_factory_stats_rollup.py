@@ -0,0 +1,122 @@
+# Generated by Django 2.2.13 on 2026-10-17 02:59
+
+from collections import defaultdict
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+RECONCILE_SCHEDULE_NAME = "reconcile factory stats rollups"
+ROLLUP_KEY_FIELDS = ("city", "town", "source", "document_display_status")
+
+
+def rollup_key(city, town, source, display_status):
+    return (city or "", town or "", source, display_status)
+
+
+def fill_rollups(apps, schema_editor):
+    rollups = defaultdict(lambda: {
+        "factories": 0,
+        "reported_factories": 0,
+        "documents": 0,
+        "report_records": 0,
+        "images": 0,
+    })
+
+    factories = (
+        apps.get_model("api", "Factory").objects
+        .filter(deleted_at=None)
+        .values(*ROLLUP_KEY_FIELDS)
+        .annotate(
+            factories=Count("id"),
+            reported_factories=Count("id", filter=Q(reported_at__isnull=False)),
+        )
+        .order_by()
+    )
+    for row in factories:
+        rollup = rollups[rollup_key(*(row[field] for field in ROLLUP_KEY_FIELDS))]
+        rollup["factories"] += row["factories"]
+        rollup["reported_factories"] += row["reported_factories"]
+
+    for model_name, counter in (("Document", "documents"), ("ReportRecord", "report_records"), ("Image", "images")):
+        key_fields = [f"factory__{field}" for field in ROLLUP_KEY_FIELDS]
+        rows = (
+            apps.get_model("api", model_name).objects
+            .filter(deleted_at=None, factory__isnull=False, factory__deleted_at=None)
+            .values(*key_fields)
+            .annotate(count=Count("id"))
+            .order_by()
+        )
+        for row in rows:
+            rollups[rollup_key(*(row[field] for field in key_fields))][counter] += row["count"]
+
+    FactoryStatsRollup = apps.get_model("api", "FactoryStatsRollup")
+    FactoryStatsRollup.objects.bulk_create(
+        FactoryStatsRollup(
+            city=city,
+            town=town,
+            source=source,
+            display_status=display_status,
+            **counts,
+        )
+        for (city, town, source, display_status), counts in rollups.items()
+    )
+
+
+def create_reconcile_schedule(apps, schema_editor):
+    Schedule = apps.get_model("django_q", "Schedule")
+    Schedule.objects.update_or_create(
+        name=RECONCILE_SCHEDULE_NAME,
+        defaults={
+            "func": "api.tasks.reconcile_factory_stats_rollups",
+            "schedule_type": "H",  # Schedule.HOURLY
+            "repeats": -1,
+        },
+    )
+
+
+def delete_reconcile_schedule(apps, schema_editor):
+    Schedule = apps.get_model("django_q", "Schedule")
+    Schedule.objects.filter(name=RECONCILE_SCHEDULE_NAME).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0037_add_city_and_town_to_factory'),
+        ('django_q', '0009_auto_20171009_0915'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FactoryStatsRollup',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('city', models.CharField(blank=True, default='', max_length=50)),
+                ('town', models.CharField(blank=True, default='', max_length=50)),
+                ('source', models.CharField(max_length=1)),
+                ('display_status', models.IntegerField(blank=True, null=True)),
+                ('factories', models.PositiveIntegerField(default=0)),
+                ('reported_factories', models.PositiveIntegerField(default=0)),
+                ('documents', models.PositiveIntegerField(default=0)),
+                ('report_records', models.PositiveIntegerField(default=0)),
+                ('images', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='factorystatsrollup',
+            constraint=models.UniqueConstraint(condition=models.Q(display_status__isnull=False), fields=('city', 'town', 'source', 'display_status'), name='unique_factory_stats_rollup'),
+        ),
+        migrations.AddConstraint(
+            model_name='factorystatsrollup',
+            constraint=models.UniqueConstraint(condition=models.Q(display_status__isnull=True), fields=('city', 'town', 'source'), name='unique_factory_stats_rollup_without_document'),
+        ),
+        migrations.RunPython(
+            code=fill_rollups,
+            reverse_code=migrations.RunPython.noop,
+        ),
+        migrations.RunPython(
+            code=create_reconcile_schedule,
+            reverse_code=delete_reconcile_schedule,
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 2.2.13 on 2026-10-17 03:03
+
+import api.models.factory
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0038_add_factory_stats_rollup'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql=[
+                "CREATE SEQUENCE api_factory_display_number_seq OWNED BY api_factory.display_number",
+                # continue after every existing factory, soft deleted ones included
+                "SELECT setval('api_factory_display_number_seq', "
+                "COALESCE((SELECT MAX(display_number) FROM api_factory), 0) + 1, false)",
+            ],
+            reverse_sql="DROP SEQUENCE api_factory_display_number_seq",
+        ),
+        migrations.AlterField(
+            model_name='factory',
+            name='display_number',
+            field=models.IntegerField(default=api.models.factory.next_display_number, unique=True),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 2.2.13 on 2026-10-17 03:06
+
+from django.db import migrations, models
+
+
+def seed_counters(apps, schema_editor):
+    # continue after the largest code of each year, soft deleted documents included
+    Document = apps.get_model("api", "Document")
+    DocumentCodeCounter = apps.get_model("api", "DocumentCodeCounter")
+    last_serials = {}
+    for code in Document.objects.values_list("code", flat=True).distinct():
+        year, serial = divmod(code, 10 ** 4)
+        last_serials[year] = max(serial, last_serials.get(year, 0))
+    DocumentCodeCounter.objects.bulk_create(
+        DocumentCodeCounter(year=year, last_serial=last_serial)
+        for year, last_serial in last_serials.items()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0039_add_factory_display_number_sequence'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentCodeCounter',
+            fields=[
+                ('year', models.PositiveIntegerField(primary_key=True, serialize=False)),
+                ('last_serial', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(
+            code=seed_counters,
+            reverse_code=migrations.RunPython.noop,
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 2.2.13 on 2026-10-17 03:09
+
+from django.db import migrations, models
+
+PURGE_SCHEDULE_NAME = "purge idempotency keys"
+
+
+def create_purge_schedule(apps, schema_editor):
+    Schedule = apps.get_model("django_q", "Schedule")
+    Schedule.objects.update_or_create(
+        name=PURGE_SCHEDULE_NAME,
+        defaults={
+            "func": "api.tasks.purge_idempotency_keys",
+            "schedule_type": "H",  # Schedule.HOURLY
+            "repeats": -1,
+        },
+    )
+
+
+def delete_purge_schedule(apps, schema_editor):
+    Schedule = apps.get_model("django_q", "Schedule")
+    Schedule.objects.filter(name=PURGE_SCHEDULE_NAME).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0040_add_document_code_counter'),
+        ('django_q', '0009_auto_20171009_0915'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IdempotencyKey',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=255)),
+                ('path', models.CharField(max_length=255)),
+                ('request_hash', models.CharField(max_length=32)),
+                ('status_code', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('content_type', models.CharField(blank=True, default='', max_length=100)),
+                ('content', models.BinaryField(blank=True, default=b'')),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='idempotencykey',
+            constraint=models.UniqueConstraint(fields=('key', 'path'), name='unique_idempotency_key'),
+        ),
+        migrations.RunPython(
+            code=create_purge_schedule,
+            reverse_code=delete_purge_schedule,
+        ),
+    ]
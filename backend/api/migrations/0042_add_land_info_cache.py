@@ -0,0 +1,34 @@
+# Generated by Django 2.2.13 on 2026-10-17 03:12
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0041_add_idempotency_key'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LandInfoCache',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('precision', models.PositiveSmallIntegerField()),
+                ('lng', models.BigIntegerField()),
+                ('lat', models.BigIntegerField()),
+                ('landno', models.CharField(blank=True, max_length=50, null=True)),
+                ('sectno', models.CharField(blank=True, max_length=50, null=True)),
+                ('sectName', models.CharField(blank=True, max_length=50, null=True)),
+                ('towncode', models.CharField(blank=True, max_length=50, null=True)),
+                ('hits', models.PositiveIntegerField(default=0)),
+                ('misses', models.PositiveIntegerField(default=0)),
+                ('fetched_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='landinfocache',
+            constraint=models.UniqueConstraint(fields=('precision', 'lng', 'lat'), name='unique_land_info_cache'),
+        ),
+    ]
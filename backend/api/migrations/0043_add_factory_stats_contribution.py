@@ -0,0 +1,84 @@
+# Generated by Django 2.2.13 on 2026-10-17 03:33
+
+from collections import defaultdict
+
+from django.db import migrations, models
+from django.db.models import Count
+
+ROLLUP_COUNTERS = ("factories", "reported_factories", "documents", "report_records", "images")
+
+
+def fill_contributions(apps, schema_editor):
+    """Record the contribution of every factory, and rebuild the rollups as their sums."""
+    FactoryStatsContribution = apps.get_model("api", "FactoryStatsContribution")
+    FactoryStatsRollup = apps.get_model("api", "FactoryStatsRollup")
+
+    contributions = {}
+    factories = (
+        apps.get_model("api", "Factory").objects
+        .filter(deleted_at=None)
+        .values_list("id", "city", "town", "source", "document_display_status", "reported_at")
+    )
+    for factory_id, city, town, source, display_status, reported_at in factories:
+        contributions[factory_id] = FactoryStatsContribution(
+            factory_id=factory_id,
+            city=city or "",
+            town=town or "",
+            source=source,
+            display_status=display_status,
+            reported_factories=int(reported_at is not None),
+        )
+
+    for model_name, counter in (("Document", "documents"), ("ReportRecord", "report_records"), ("Image", "images")):
+        rows = (
+            apps.get_model("api", model_name).objects
+            .filter(deleted_at=None, factory__isnull=False, factory__deleted_at=None)
+            .values_list("factory_id")
+            .annotate(count=Count("id"))
+            .order_by()
+        )
+        for factory_id, count in rows:
+            if factory_id in contributions:
+                setattr(contributions[factory_id], counter, count)
+
+    rollups = defaultdict(lambda: dict.fromkeys(ROLLUP_COUNTERS, 0))
+    for contribution in contributions.values():
+        rollup = rollups[(contribution.city, contribution.town, contribution.source, contribution.display_status)]
+        rollup["factories"] += 1
+        for counter in ROLLUP_COUNTERS[1:]:
+            rollup[counter] += getattr(contribution, counter)
+
+    FactoryStatsContribution.objects.bulk_create(contributions.values(), batch_size=1000)
+    FactoryStatsRollup.objects.all().delete()
+    FactoryStatsRollup.objects.bulk_create(
+        FactoryStatsRollup(city=city, town=town, source=source, display_status=display_status, **counts)
+        for (city, town, source, display_status), counts in rollups.items()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0042_add_land_info_cache'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FactoryStatsContribution',
+            fields=[
+                ('factory_id', models.UUIDField(primary_key=True, serialize=False)),
+                ('city', models.CharField(blank=True, default='', max_length=50)),
+                ('town', models.CharField(blank=True, default='', max_length=50)),
+                ('source', models.CharField(max_length=1)),
+                ('display_status', models.IntegerField(blank=True, null=True)),
+                ('reported_factories', models.PositiveSmallIntegerField(default=0)),
+                ('documents', models.PositiveIntegerField(default=0)),
+                ('report_records', models.PositiveIntegerField(default=0)),
+                ('images', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(
+            code=fill_contributions,
+            reverse_code=migrations.RunPython.noop,
+        ),
+    ]
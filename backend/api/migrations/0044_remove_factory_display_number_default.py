@@ -0,0 +1,18 @@
+# Generated by Django 2.2.13 on 2026-10-17 03:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0043_add_factory_stats_contribution'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='factory',
+            name='display_number',
+            field=models.IntegerField(blank=True, unique=True),
+        ),
+    ]
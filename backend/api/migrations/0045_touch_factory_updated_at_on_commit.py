@@ -0,0 +1,47 @@
+# Generated by Django 2.2.13 on 2026-10-17 03:53
+
+from django.db import migrations
+
+# `updated_at` is the watermark of the ETags and the cached payloads, set it with the database
+# clock once the transaction commits, so a transaction committed last never has an older
+# timestamp than one committed before it. Every row of a transaction gets the same timestamp.
+CREATE_TRIGGER = """
+CREATE FUNCTION api_factory_touch_updated_at() RETURNS trigger AS $$
+DECLARE
+    committed_at timestamptz;
+BEGIN
+    committed_at := NULLIF(current_setting('api_factory.committed_at', true), '')::timestamptz;
+    IF committed_at IS NULL THEN
+        committed_at := clock_timestamp();
+        PERFORM set_config('api_factory.committed_at', committed_at::text, true);
+    END IF;
+    UPDATE api_factory SET updated_at = committed_at
+    WHERE id = NEW.id AND updated_at IS DISTINCT FROM committed_at;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE CONSTRAINT TRIGGER api_factory_touch_updated_at
+AFTER INSERT OR UPDATE ON api_factory
+DEFERRABLE INITIALLY DEFERRED
+FOR EACH ROW
+-- skip the UPDATE made by the trigger itself
+WHEN (pg_trigger_depth() = 0)
+EXECUTE PROCEDURE api_factory_touch_updated_at();
+"""
+
+DROP_TRIGGER = """
+DROP TRIGGER api_factory_touch_updated_at ON api_factory;
+DROP FUNCTION api_factory_touch_updated_at();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0044_remove_factory_display_number_default'),
+    ]
+
+    operations = [
+        migrations.RunSQL(sql=CREATE_TRIGGER, reverse_sql=DROP_TRIGGER),
+    ]
@@ -1,6 +1,29 @@
 from .factory import Factory
 from .report_record import ReportRecord
 from .image import Image
-from .document import Document, DocumentDisplayStatusEnum, FollowUp
+from .document import (
+    Document,
+    DocumentCodeCounter,
+    DocumentCodeOverflow,
+    DocumentDisplayStatusEnum,
+    FollowUp,
+    reserve_document_codes,
+)
 from .review import Review
 from .gov_agency import GovAgency
+from .factory_summary import refresh_factory_summaries
+from .factory_stats_rollup import (
+    FactoryStatsContribution,
+    FactoryStatsRollup,
+    refresh_factory_stats_rollups,
+    refresh_factory_stats_rollups_of_factories,
+)
+from .idempotency_key import IdempotencyKey, delete_expired_idempotency_keys
+from .land_info_cache import (
+    LandInfoCache,
+    cache_land_info,
+    get_cached_land_infos,
+    get_land_info,
+    get_land_info_cache_stats,
+    land_info_cache_key,
+)
@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import connection, models, transaction
 
 from .mixins import SoftDeleteMixin
 from .factory import Factory
@@ -88,6 +88,68 @@ class Document(SoftDeleteMixin):
     cet_next_tags = models.ManyToManyField(CETNext, blank=True)
     gov_response_status_tags = models.ManyToManyField(GovResponseStatus, blank=True)
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # codes entered in the admin or imported are never reserved again
+        update_document_code_counter(self.code)
+
+
+class DocumentCodeCounter(models.Model):
+    """The last serial number of the document codes of a ROC year."""
+
+    year = models.PositiveIntegerField(primary_key=True)  # 民國年
+    last_serial = models.PositiveIntegerField(default=0)
+
+
+class DocumentCodeOverflow(ValueError):
+    """The serial numbers of the document codes of a year are used up."""
+
+
+# the serial number takes the last 4 digits of a document code
+MAX_DOCUMENT_SERIAL = 10 ** 4 - 1
+
+
+def reserve_document_codes(year, count):
+    """Reserve `count` consecutive document codes of the ROC `year`, return the first one.
+
+    Codes are formatted as YYYXXXX, YYY is the ROC year and XXXX is the serial
+    number. The counter row stays locked until the end of the transaction, so
+    concurrent reservations of the same year never overlap. Raise
+    `DocumentCodeOverflow`, reserving nothing, if the serial would exceed 9999.
+    """
+    table = DocumentCodeCounter._meta.db_table
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {table} (year, last_serial) VALUES (%s, %s) "
+            f"ON CONFLICT (year) DO UPDATE SET last_serial = {table}.last_serial + EXCLUDED.last_serial "
+            "RETURNING last_serial",
+            [year, count],
+        )
+        last_serial = cursor.fetchone()[0]
+        if last_serial > MAX_DOCUMENT_SERIAL:
+            # rolls the counter back
+            raise DocumentCodeOverflow(
+                f"Only {max(MAX_DOCUMENT_SERIAL - (last_serial - count), 0)} document codes left in year {year}"
+            )
+    return year * (10 ** 4) + last_serial - count + 1
+
+
+def update_document_code_counter(code):
+    """Move the counter of the year of `code` past its serial number, if it is behind."""
+    if code is None:
+        return
+    # not cleaned yet when assigned directly, e.g. "1090001"
+    year, serial = divmod(int(code), 10 ** 4)
+    if year <= 0 or serial <= 0:
+        return
+    table = DocumentCodeCounter._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {table} (year, last_serial) VALUES (%s, %s) "
+            f"ON CONFLICT (year) DO UPDATE SET last_serial = GREATEST({table}.last_serial, EXCLUDED.last_serial)",
+            [year, serial],
+        )
+
 
 class FollowUp(SoftDeleteMixin):
     document = models.ForeignKey(
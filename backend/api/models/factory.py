@@ -1,12 +1,38 @@
 import uuid
 
-from django.db import models
+from django.db import connection, models
 from django.contrib.auth import get_user_model
 
 from .mixins import SoftDeleteMixin
+from ..utils import split_townname
 
 CustomUser = get_user_model()
 
+DISPLAY_NUMBER_SEQUENCE = "api_factory_display_number_seq"
+
+
+def next_display_number():
+    """Allocate a display number from the Postgres sequence, gaps are left by rolled back inserts."""
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT nextval(%s)", [DISPLAY_NUMBER_SEQUENCE])
+        return cursor.fetchone()[0]
+
+
+def advance_display_number_sequence(display_number):
+    """Move the sequence past a display number written without it, e.g. by an import."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT setval(%s, GREATEST(last_value, %s)) FROM {DISPLAY_NUMBER_SEQUENCE}",
+            [DISPLAY_NUMBER_SEQUENCE, display_number],
+        )
+
+
+def next_display_numbers(count):
+    """Allocate `count` display numbers from the Postgres sequence with one query."""
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT nextval(%s) FROM generate_series(1, %s)", [DISPLAY_NUMBER_SEQUENCE, count])
+        return [display_number for display_number, in cursor.fetchall()]
+
 
 class Factory(SoftDeleteMixin):
     """Factories that are potential to be illegal."""
@@ -53,13 +79,16 @@ class Factory(SoftDeleteMixin):
         editable=False,
         verbose_name="ID",
     )
-    display_number = models.IntegerField(unique=True)
+    # allocated on the first save, so unsaved instances don't burn sequence numbers
+    display_number = models.IntegerField(unique=True, blank=True)
 
     lat = models.FloatField()
     lng = models.FloatField()
     landcode = models.CharField(max_length=50, blank=True, null=True)
     towncode = models.CharField(max_length=50, blank=True, null=True)
     townname = models.CharField(max_length=50, blank=True, null=True, db_index=True)
+    city = models.CharField(max_length=50, blank=True, null=True, db_index=True, editable=False)  # 縣市，由 townname 而來
+    town = models.CharField(max_length=50, blank=True, null=True, db_index=True, editable=False)  # 鄉鎮市區，由 townname 而來
     sectcode = models.CharField(max_length=50, blank=True, null=True)
     sectname = models.CharField(max_length=50, blank=True, null=True)
 
@@ -98,7 +127,37 @@ class Factory(SoftDeleteMixin):
 
     status_time = models.DateTimeField(auto_now_add=True)
     created_at = models.DateTimeField(auto_now_add=True)
-    updated_at = models.DateTimeField(auto_now=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    # Summaries of the related report records, images and documents, which are
+    # only written by `refresh_factory_summaries`
+    reported_at = models.DateTimeField(blank=True, null=True, editable=False)  # 最新回報時間
+    data_complete = models.BooleanField(default=False, editable=False)  # 有照片且有回報紀錄
+    document_display_status = models.IntegerField(blank=True, null=True, editable=False)  # 最新公文狀態
+
+    SUMMARY_FIELDS = ("reported_at", "data_complete", "document_display_status")
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["lat", "lng"]),
+        ]
+
+    def save(self, *args, **kwargs):
+        self.city, self.town = split_townname(self.townname)
+        allocated = self.display_number is None
+        if allocated:
+            self.display_number = next_display_number()
+
+        # don't overwrite the summaries refreshed after this instance was loaded
+        if not (self._state.adding or kwargs.get("force_insert")) and kwargs.get("update_fields") is None:
+            kwargs["update_fields"] = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.SUMMARY_FIELDS
+            ]
+        super().save(*args, **kwargs)
+        if not allocated:
+            advance_display_number_sequence(self.display_number)
 
 
 class RecycledFactory(Factory):
@@ -0,0 +1,257 @@
+import logging
+import threading
+from collections import defaultdict
+
+from django.db import IntegrityError, connection, models, transaction
+from django.db.models import Count, F, Q
+from django.db.models.functions import Greatest, Now
+from django_q.tasks import async_task
+
+from ..cache import invalidate_statistics
+from .factory import Factory
+from .report_record import ReportRecord
+from .image import Image
+from .document import Document
+
+LOGGER = logging.getLogger("django")
+
+
+class FactoryStatsRollup(models.Model):
+    """Counts of the factories sharing a city, town, source and latest document status.
+
+    Every factory adds its `FactoryStatsContribution` to the rollup of its
+    key. Whenever a factory, or its report records, images or documents
+    change, `refresh_factory_stats_rollups_of_factories` applies the
+    difference with its previous contribution, so the statistics endpoints
+    only have to sum a few rows.
+    """
+
+    city = models.CharField(max_length=50, blank=True, default="")
+    town = models.CharField(max_length=50, blank=True, default="")
+    source = models.CharField(max_length=1)
+    display_status = models.IntegerField(blank=True, null=True)  # 最新公文狀態
+
+    factories = models.PositiveIntegerField(default=0)
+    reported_factories = models.PositiveIntegerField(default=0)  # 有回報紀錄的工廠數量
+    documents = models.PositiveIntegerField(default=0)
+    report_records = models.PositiveIntegerField(default=0)
+    images = models.PositiveIntegerField(default=0)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["city", "town", "source", "display_status"],
+                condition=Q(display_status__isnull=False),
+                name="unique_factory_stats_rollup",
+            ),
+            models.UniqueConstraint(
+                fields=["city", "town", "source"],
+                condition=Q(display_status__isnull=True),
+                name="unique_factory_stats_rollup_without_document",
+            ),
+        ]
+
+
+class FactoryStatsContribution(models.Model):
+    """The key and counts a factory was last added to the rollups with.
+
+    Deleted factories have none. The factory isn't a foreign key, so the
+    contribution of a hard deleted factory stays until it is subtracted.
+    """
+
+    factory_id = models.UUIDField(primary_key=True)
+
+    city = models.CharField(max_length=50, blank=True, default="")
+    town = models.CharField(max_length=50, blank=True, default="")
+    source = models.CharField(max_length=1)
+    display_status = models.IntegerField(blank=True, null=True)
+
+    reported_factories = models.PositiveSmallIntegerField(default=0)  # 1 if the factory has report records
+    documents = models.PositiveIntegerField(default=0)
+    report_records = models.PositiveIntegerField(default=0)
+    images = models.PositiveIntegerField(default=0)
+
+    @property
+    def rollup_key(self):
+        return (self.city, self.town, self.source, self.display_status)
+
+    @property
+    def counts(self):
+        return {
+            "factories": 1,
+            **{counter: getattr(self, counter) for counter in CONTRIBUTION_COUNTERS},
+        }
+
+
+ROLLUP_COUNTERS = ("factories", "reported_factories", "documents", "report_records", "images")
+CONTRIBUTION_COUNTERS = ROLLUP_COUNTERS[1:]
+# advisory lock taken exclusively by full rebuilds, and shared by the other refreshes
+ROLLUP_LOCK_ID = 20200411
+
+
+def _lock_rollups(exclusive):
+    with connection.cursor() as cursor:
+        if exclusive:
+            cursor.execute("SELECT pg_advisory_xact_lock(%s)", [ROLLUP_LOCK_ID])
+        else:
+            cursor.execute("SELECT pg_advisory_xact_lock_shared(%s)", [ROLLUP_LOCK_ID])
+
+
+def _compute_contributions(factory_ids=None):
+    """Return {factory id: unsaved `FactoryStatsContribution`} of the factories, or of every factory."""
+    factories = Factory.raw_objects.filter(deleted_at=None)
+    if factory_ids is not None:
+        factories = factories.filter(id__in=factory_ids)
+
+    contributions = {}
+    rows = factories.values_list("id", "city", "town", "source", "document_display_status", "reported_at")
+    for factory_id, city, town, source, display_status, reported_at in rows:
+        contributions[factory_id] = FactoryStatsContribution(
+            factory_id=factory_id,
+            city=city or "",
+            town=town or "",
+            source=source,
+            display_status=display_status,
+            reported_factories=int(reported_at is not None),
+        )
+
+    for model, counter in ((Document, "documents"), (ReportRecord, "report_records"), (Image, "images")):
+        rows = model.objects.filter(deleted_at=None, factory__isnull=False, factory__deleted_at=None)
+        if factory_ids is not None:
+            rows = rows.filter(factory_id__in=factory_ids)
+        for factory_id, count in rows.values_list("factory_id").annotate(count=Count("id")).order_by():
+            if factory_id in contributions:
+                setattr(contributions[factory_id], counter, count)
+
+    return contributions
+
+
+def _rollup_key_order(key):
+    city, town, source, display_status = key
+    return (city, town, source, display_status is not None, display_status or 0)
+
+
+def _apply_rollup_deltas(deltas):
+    """Add the {rollup key: {counter: delta}} to the rollups, locking them in key order."""
+    for key in sorted(deltas, key=_rollup_key_order):
+        delta = {counter: value for counter, value in deltas[key].items() if value}
+        if not delta:
+            continue
+
+        city, town, source, display_status = key
+        rollups = FactoryStatsRollup.objects.filter(
+            city=city, town=town, source=source, display_status=display_status
+        )
+        # clamped at 0, a drift is fixed by the next full rebuild
+        changes = {counter: Greatest(F(counter) + value, 0) for counter, value in delta.items()}
+        if rollups.update(**changes, updated_at=Now()):
+            continue
+        try:
+            with transaction.atomic():
+                FactoryStatsRollup.objects.create(
+                    city=city,
+                    town=town,
+                    source=source,
+                    display_status=display_status,
+                    **{counter: max(value, 0) for counter, value in delta.items()},
+                )
+        except IntegrityError:
+            # created by a concurrent refresh meanwhile
+            rollups.update(**changes, updated_at=Now())
+
+
+def _refresh_contributions(factory_ids):
+    with transaction.atomic():
+        _lock_rollups(exclusive=False)
+        # concurrent refreshes of the same factories apply their differences one after the other
+        list(Factory.raw_objects.filter(id__in=factory_ids).order_by("id").select_for_update().values_list("id"))
+
+        previous = list(FactoryStatsContribution.objects.filter(factory_id__in=factory_ids))
+        contributions = _compute_contributions(factory_ids)
+
+        deltas = defaultdict(lambda: dict.fromkeys(ROLLUP_COUNTERS, 0))
+        for contribution in previous:
+            for counter, value in contribution.counts.items():
+                deltas[contribution.rollup_key][counter] -= value
+        for contribution in contributions.values():
+            for counter, value in contribution.counts.items():
+                deltas[contribution.rollup_key][counter] += value
+
+        FactoryStatsContribution.objects.filter(factory_id__in=factory_ids).delete()
+        FactoryStatsContribution.objects.bulk_create(contributions.values())
+        _apply_rollup_deltas(deltas)
+    invalidate_statistics()
+
+
+# factories of the current thread whose rollups are refreshed once the transaction is committed
+_pending = threading.local()
+
+
+def _refresh_pending_factories():
+    factory_ids = getattr(_pending, "factory_ids", set())
+    _pending.factory_ids = set()
+    if not factory_ids:
+        # refreshed by an earlier callback of the same transaction
+        return
+
+    try:
+        _refresh_contributions(factory_ids)
+    except Exception:
+        # the transaction is committed already, don't fail the request
+        LOGGER.exception(f"Failed refreshing the stats rollups of {len(factory_ids)} factories, retrying in the background")
+        async_task("api.tasks.reconcile_factory_stats_rollups", sorted(factory_ids))
+
+
+def refresh_factory_stats_rollups_of_factories(factory_ids):
+    """Apply the changes of the factories to their rollups once the transaction is committed.
+
+    The factories collected during a transaction are refreshed together by
+    its first on commit callback, in a short transaction of its own, so the
+    rollups are never locked while the caller's transaction is running. A
+    failed refresh is logged and retried by a background task.
+    """
+    factory_ids = {str(factory_id) for factory_id in factory_ids}
+    if not factory_ids:
+        return
+
+    if not hasattr(_pending, "factory_ids"):
+        _pending.factory_ids = set()
+    # ids left by a rolled back transaction are refreshed along, which is harmless
+    _pending.factory_ids.update(factory_ids)
+    transaction.on_commit(_refresh_pending_factories)
+
+
+def refresh_factory_stats_rollups(factory_ids=None):
+    """Refresh the rollups of the factories right away, or rebuild every contribution and rollup.
+
+    A rebuild fixes drift from changes that skipped the signals.
+    """
+    if factory_ids is not None:
+        _refresh_contributions({str(factory_id) for factory_id in factory_ids})
+        return
+
+    with transaction.atomic():
+        _lock_rollups(exclusive=True)
+        contributions = _compute_contributions()
+
+        rollups = defaultdict(lambda: dict.fromkeys(ROLLUP_COUNTERS, 0))
+        for contribution in contributions.values():
+            for counter, value in contribution.counts.items():
+                rollups[contribution.rollup_key][counter] += value
+
+        FactoryStatsContribution.objects.all().delete()
+        FactoryStatsContribution.objects.bulk_create(contributions.values(), batch_size=1000)
+        FactoryStatsRollup.objects.all().delete()
+        FactoryStatsRollup.objects.bulk_create(
+            FactoryStatsRollup(
+                city=city,
+                town=town,
+                source=source,
+                display_status=display_status,
+                **counts,
+            )
+            for (city, town, source, display_status), counts in rollups.items()
+        )
+    invalidate_statistics()
@@ -0,0 +1,29 @@
+from django.db.models import BooleanField, Exists, Func, OuterRef, Subquery
+from django.db.models.functions import Now
+
+from .factory import Factory
+from .report_record import ReportRecord
+from .image import Image
+from .document import Document
+
+
+def refresh_factory_summaries(factory_ids):
+    """Recompute `Factory.SUMMARY_FIELDS` of the factories with a single UPDATE."""
+    report_records = ReportRecord.objects.filter(factory_id=OuterRef("pk"))
+    images = Image.objects.filter(factory_id=OuterRef("pk"))
+    documents = Document.objects.filter(factory_id=OuterRef("pk"))
+
+    Factory.raw_objects.filter(id__in=factory_ids).update(
+        reported_at=Subquery(report_records.order_by("-created_at").values("created_at")[:1]),
+        data_complete=Func(
+            Exists(images),
+            Exists(report_records),
+            template="(%(expressions)s)",
+            arg_joiner=" AND ",
+            output_field=BooleanField(),
+        ),
+        document_display_status=Subquery(
+            documents.order_by("-created_at").values("display_status")[:1]
+        ),
+        updated_at=Now(),
+    )
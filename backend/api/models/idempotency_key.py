@@ -0,0 +1,36 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import models
+from django.utils import timezone
+
+
+class IdempotencyKey(models.Model):
+    """The response of a POST sent with an `Idempotency-Key` header.
+
+    A retry with the same key and path gets the stored response back instead
+    of running the view again. `status_code` is null while the first request
+    is still running.
+    """
+
+    key = models.CharField(max_length=255)
+    path = models.CharField(max_length=255)
+    request_hash = models.CharField(max_length=32)  # md5 of the request body
+
+    status_code = models.PositiveSmallIntegerField(blank=True, null=True)
+    content_type = models.CharField(max_length=100, blank=True, default="")
+    content = models.BinaryField(blank=True, default=b"")
+
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["key", "path"], name="unique_idempotency_key"),
+        ]
+
+
+def delete_expired_idempotency_keys():
+    """Delete the keys older than `IDEMPOTENCY_KEY_TIMEOUT` seconds, return how many were deleted."""
+    expired_at = timezone.now() - timedelta(seconds=settings.IDEMPOTENCY_KEY_TIMEOUT)
+    deleted, _ = IdempotencyKey.objects.filter(created_at__lt=expired_at).delete()
+    return deleted
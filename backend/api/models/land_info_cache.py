@@ -0,0 +1,105 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import models
+from django.db.models import F, Q, Sum
+from django.utils import timezone
+
+import easymap
+import towninfo
+
+LAND_INFO_FIELDS = ("landno", "sectno", "sectName", "towncode")
+
+
+class LandInfoCache(models.Model):
+    """An easymap lookup of WGS84 coordinates rounded to `precision` decimal places.
+
+    `hits` counts the lookups answered from this row, `misses` the ones
+    which had to ask easymap for these coordinates.
+    """
+
+    precision = models.PositiveSmallIntegerField()
+    lng = models.BigIntegerField()  # round(lng * 10 ** precision)
+    lat = models.BigIntegerField()  # round(lat * 10 ** precision)
+
+    landno = models.CharField(max_length=50, blank=True, null=True)
+    sectno = models.CharField(max_length=50, blank=True, null=True)
+    sectName = models.CharField(max_length=50, blank=True, null=True)
+    towncode = models.CharField(max_length=50, blank=True, null=True)
+
+    hits = models.PositiveIntegerField(default=0)
+    misses = models.PositiveIntegerField(default=0)
+    fetched_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["precision", "lng", "lat"], name="unique_land_info_cache"),
+        ]
+
+    def to_land_info(self):
+        land_info = {field: getattr(self, field) for field in LAND_INFO_FIELDS}
+        land_info["townname"] = towninfo.code2name.get(self.towncode, "")
+        return land_info
+
+
+def land_info_cache_key(lng, lat):
+    """Return the (lng, lat) of `LandInfoCache` rows caching the WGS84 coordinates."""
+    precision = settings.LAND_INFO_CACHE_PRECISION
+    return round(float(lng) * 10 ** precision), round(float(lat) * 10 ** precision)
+
+
+def get_cached_land_infos(keys):
+    """Return {key: land info} of the keys looked up within `LAND_INFO_CACHE_TTL` seconds, with one query."""
+    keys = set(keys)
+    if not keys:
+        return {}
+
+    fresh_after = timezone.now() - timedelta(seconds=settings.LAND_INFO_CACHE_TTL)
+    positions = Q()
+    for lng, lat in keys:
+        positions |= Q(lng=lng, lat=lat)
+    entries = list(
+        LandInfoCache.objects.filter(
+            positions, precision=settings.LAND_INFO_CACHE_PRECISION, fetched_at__gte=fresh_after
+        )
+    )
+    if entries:
+        LandInfoCache.objects.filter(pk__in=[entry.pk for entry in entries]).update(hits=F("hits") + 1)
+    return {(entry.lng, entry.lat): entry.to_land_info() for entry in entries}
+
+
+def cache_land_info(key, land_info):
+    """Store the land info looked up from easymap for the key."""
+    lng, lat = key
+    entry, _ = LandInfoCache.objects.get_or_create(precision=settings.LAND_INFO_CACHE_PRECISION, lng=lng, lat=lat)
+    for field in LAND_INFO_FIELDS:
+        setattr(entry, field, land_info.get(field))
+    entry.misses = F("misses") + 1
+    entry.fetched_at = timezone.now()
+    entry.save()
+
+
+def get_land_info(lng, lat):
+    """Return the landno, sectno, sectName, towncode and townname of WGS84 coordinates.
+
+    Lookups of the same rounded coordinates within `LAND_INFO_CACHE_TTL`
+    seconds are answered from `LandInfoCache` without calling easymap.
+    """
+    key = land_info_cache_key(lng, lat)
+    cached = get_cached_land_infos([key])
+    if key in cached:
+        return cached[key]
+
+    land_info = easymap.get_land_number(lng, lat)
+    cache_land_info(key, land_info)
+    return land_info
+
+
+def get_land_info_cache_stats():
+    """Return the number of rows, hits and misses of `LandInfoCache`."""
+    stats = LandInfoCache.objects.aggregate(hits=Sum("hits"), misses=Sum("misses"))
+    return {
+        "entries": LandInfoCache.objects.count(),
+        "hits": stats["hits"] or 0,
+        "misses": stats["misses"] or 0,
+    }
@@ -1,16 +1,36 @@
 from django.db import models
 from django.db.models import query
+from django.db.models.functions import Now
+from django.dispatch import Signal
 from django.utils import timezone
 
+# Sent after `delete()` or `undelete()` of a queryset, with the primary keys of the updated rows
+deleted_at_updated = Signal(providing_args=["pks"])
+
+
+def _update_deleted_at(queryset, deleted_at):
+    values = {"deleted_at": deleted_at}
+    # keep `updated_at` as the watermark of every change, like `delete()` and `undelete()` do
+    if any(field.name == "updated_at" for field in queryset.model._meta.concrete_fields):
+        values["updated_at"] = Now()
+
+    if not deleted_at_updated.has_listeners(queryset.model):
+        queryset.update(**values)
+        return
+
+    pks = list(queryset.values_list("pk", flat=True))
+    queryset.model._base_manager.filter(pk__in=pks).update(**values)
+    deleted_at_updated.send(sender=queryset.model, pks=pks)
+
 
 class SoftDeleteQuerySet(query.QuerySet):
     def delete(self):
-        self.update(deleted_at=timezone.now())
+        _update_deleted_at(self, timezone.now())
 
 
 class RecycleBinQuerySet(query.QuerySet):
     def undelete(self):
-        self.update(deleted_at=None)
+        _update_deleted_at(self, None)
 
 
 class SoftDeleteManager(models.Manager):
@@ -0,0 +1,47 @@
+import tablib
+from django.test import TestCase
+
+from api.admin.document import DocumentResource
+
+from .. import Document, DocumentCodeCounter, DocumentCodeOverflow, reserve_document_codes
+
+
+class ReserveDocumentCodesTestCase(TestCase):
+    def test_reserve_codes_of_new_year(self):
+        self.assertEqual(reserve_document_codes(109, 3), 1090001)
+        self.assertEqual(DocumentCodeCounter.objects.get(year=109).last_serial, 3)
+
+    def test_reserved_blocks_never_overlap(self):
+        DocumentCodeCounter.objects.create(year=109, last_serial=41)
+
+        self.assertEqual(reserve_document_codes(109, 2), 1090042)
+        self.assertEqual(reserve_document_codes(109, 5), 1090044)
+        self.assertEqual(reserve_document_codes(110, 1), 1100001)
+        self.assertEqual(reserve_document_codes(109, 1), 1090049)
+
+    def test_raise_if_serials_used_up(self):
+        DocumentCodeCounter.objects.create(year=109, last_serial=9997)
+
+        with self.assertRaises(DocumentCodeOverflow):
+            reserve_document_codes(109, 3)
+        self.assertEqual(DocumentCodeCounter.objects.get(year=109).last_serial, 9997)
+        self.assertEqual(reserve_document_codes(109, 2), 1099998)
+        with self.assertRaises(DocumentCodeOverflow):
+            reserve_document_codes(109, 1)
+
+    def test_skip_codes_saved_by_hand(self):
+        DocumentCodeCounter.objects.create(year=109, last_serial=41)
+
+        Document.objects.create(code=1090100)
+        Document.objects.create(code=1090050)
+        Document.objects.create(code="1110007")
+
+        self.assertEqual(reserve_document_codes(109, 1), 1090101)
+        self.assertEqual(reserve_document_codes(111, 1), 1110008)
+
+    def test_skip_imported_codes(self):
+        dataset = tablib.Dataset(["", 1090200, 1], headers=["id", "code", "display_status"])
+        result = DocumentResource().import_data(dataset, raise_errors=True)
+
+        self.assertFalse(result.has_errors())
+        self.assertEqual(reserve_document_codes(109, 1), 1090201)
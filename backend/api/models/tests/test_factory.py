@@ -0,0 +1,55 @@
+import tablib
+from django.contrib.admin.sites import AdminSite
+from django.db import connection
+from django.test import TestCase
+
+from api.admin.factory import FactoryAdmin
+
+from .. import Factory
+from ..factory import DISPLAY_NUMBER_SEQUENCE
+
+
+def get_last_display_number():
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT last_value FROM {DISPLAY_NUMBER_SEQUENCE}")
+        return cursor.fetchone()[0]
+
+
+class FactoryDisplayNumberTestCase(TestCase):
+    def test_allocate_display_number_on_first_save(self):
+        last_display_number = get_last_display_number()
+
+        factory = Factory(lat=24.93, lng=121.37)
+        self.assertIsNone(factory.display_number)
+        self.assertEqual(get_last_display_number(), last_display_number)
+
+        factory.save()
+        factory.refresh_from_db()
+        self.assertGreater(factory.display_number, last_display_number)
+
+        display_number = factory.display_number
+        factory.name = "renamed"
+        factory.save()
+        self.assertEqual(Factory.objects.get(pk=factory.pk).display_number, display_number)
+
+    def test_advance_sequence_past_given_display_number(self):
+        last_display_number = get_last_display_number()
+
+        factory = Factory.objects.create(lat=24.93, lng=121.37, display_number=last_display_number + 100)
+        self.assertEqual(factory.display_number, last_display_number + 100)
+        self.assertEqual(Factory.objects.create(lat=24.93, lng=121.37).display_number, last_display_number + 101)
+
+        # a lower number never moves the sequence back
+        Factory.objects.create(lat=24.93, lng=121.37, display_number=last_display_number + 50)
+        self.assertEqual(get_last_display_number(), last_display_number + 101)
+
+    def test_advance_sequence_past_imported_display_number(self):
+        last_display_number = get_last_display_number()
+        dataset = tablib.Dataset(
+            ["", last_display_number + 10, 24.93, 121.37, "G"], headers=["id", "display_number", "lat", "lng", "source"]
+        )
+
+        result = FactoryAdmin(Factory, AdminSite()).get_import_resource_class()().import_data(dataset, raise_errors=True)
+
+        self.assertFalse(result.has_errors())
+        self.assertEqual(Factory.objects.create(lat=24.93, lng=121.37).display_number, last_display_number + 11)
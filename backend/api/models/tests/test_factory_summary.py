@@ -0,0 +1,76 @@
+from django.test import TestCase
+
+from .. import Factory, ReportRecord, Image, Document, DocumentDisplayStatusEnum
+from ..document import RecycledDocument
+
+
+class FactorySummaryTestCase(TestCase):
+    def setUp(self):
+        self.factory = Factory.objects.create(lat=24, lng=121, display_number=30001)
+
+    def create_report_record(self, factory):
+        return ReportRecord.objects.create(factory=factory, action_type="POST", action_body={})
+
+    def assertSummary(self, reported_at, data_complete, document_display_status):
+        self.factory.refresh_from_db()
+        self.assertEqual(self.factory.reported_at, reported_at)
+        self.assertEqual(self.factory.data_complete, data_complete)
+        self.assertEqual(self.factory.document_display_status, document_display_status)
+
+    def test_summary_follow_created_rows(self):
+        self.assertSummary(None, False, None)
+
+        self.create_report_record(self.factory)
+        latest_report_record = self.create_report_record(self.factory)
+        self.assertSummary(latest_report_record.created_at, False, None)
+
+        Image.objects.create(image_path="https://i.imgur.com/RxArJUc.png", factory=self.factory)
+        self.assertSummary(latest_report_record.created_at, True, None)
+
+        Document.objects.create(factory=self.factory, code=1090001)
+        Document.objects.create(
+            factory=self.factory,
+            code=1090002,
+            display_status=DocumentDisplayStatusEnum.INDICES["已勒令停工"],
+        )
+        self.assertSummary(
+            latest_report_record.created_at,
+            True,
+            DocumentDisplayStatusEnum.INDICES["已勒令停工"],
+        )
+
+    def test_summary_follow_soft_deleted_rows(self):
+        first_report_record = self.create_report_record(self.factory)
+        latest_report_record = self.create_report_record(self.factory)
+        image = Image.objects.create(image_path="https://i.imgur.com/RxArJUc.png", factory=self.factory)
+
+        latest_report_record.delete()
+        self.assertSummary(first_report_record.created_at, True, None)
+
+        Image.objects.filter(pk=image.pk).delete()
+        self.assertSummary(first_report_record.created_at, False, None)
+
+        Image.recycle_objects.filter(pk=image.pk).undelete()
+        self.assertSummary(first_report_record.created_at, True, None)
+
+    def test_summary_follow_reassigned_document(self):
+        another_factory = Factory.objects.create(lat=24, lng=121, display_number=30002)
+        document = Document.objects.create(factory=self.factory, code=1090001)
+        self.assertSummary(None, False, document.display_status)
+
+        document = RecycledDocument.raw_objects.get(pk=document.pk)
+        document.factory = another_factory
+        document.save()
+        self.assertSummary(None, False, None)
+        another_factory.refresh_from_db()
+        self.assertEqual(another_factory.document_display_status, document.display_status)
+
+    def test_saving_stale_factory_keep_summary(self):
+        stale_factory = Factory.objects.get(pk=self.factory.pk)
+        report_record = self.create_report_record(self.factory)
+
+        stale_factory.name = "renamed"
+        stale_factory.save()
+
+        self.assertSummary(report_record.created_at, False, None)
+        self.assertEqual(self.factory.name, "renamed")
@@ -0,0 +1,41 @@
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from .. import LandInfoCache, get_land_info, get_land_info_cache_stats
+
+LAND_INFO = {
+    "landno": "03750000",
+    "sectno": "0375",
+    "sectName": "中正段",
+    "towncode": "65000090",
+    "townname": "新北市三峽區",
+}
+
+
+@patch("api.models.land_info_cache.easymap.get_land_number", return_value=LAND_INFO)
+class GetLandInfoTestCase(TestCase):
+    def test_lookup_rounded_coordinates_from_cache(self, mock_get_land_number):
+        self.assertEqual(get_land_info(121.374201, 24.934102), LAND_INFO)
+        self.assertEqual(get_land_info(121.374204, 24.934098), LAND_INFO)
+
+        mock_get_land_number.assert_called_once_with(121.374201, 24.934102)
+        self.assertEqual(get_land_info_cache_stats(), {"entries": 1, "hits": 1, "misses": 1})
+
+    def test_lookup_again_after_ttl(self, mock_get_land_number):
+        get_land_info(121.3742, 24.9341)
+        LandInfoCache.objects.update(fetched_at=timezone.now() - timedelta(days=31))
+        get_land_info(121.3742, 24.9341)
+
+        self.assertEqual(mock_get_land_number.call_count, 2)
+        self.assertEqual(get_land_info_cache_stats(), {"entries": 1, "hits": 0, "misses": 2})
+
+    @override_settings(LAND_INFO_CACHE_PRECISION=6)
+    def test_lookup_with_precision(self, mock_get_land_number):
+        get_land_info(121.374201, 24.934102)
+        get_land_info(121.374204, 24.934098)
+
+        self.assertEqual(mock_get_land_number.call_count, 2)
+        self.assertEqual(LandInfoCache.objects.count(), 2)
@@ -0,0 +1,63 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+
+from .models import (
+    refresh_factory_stats_rollups_of_factories,
+    refresh_factory_summaries,
+)
+from .models.document import Document, RecycledDocument
+from .models.factory import Factory, RecycledFactory
+from .models.image import Image, RecycledImage
+from .models.mixins import deleted_at_updated
+from .models.report_record import ReportRecord, RecycledReportRecord
+
+# rows whose creation, soft deletion or reassignment changes the summaries of a factory
+FACTORY_SUMMARY_SOURCES = (
+    ReportRecord,
+    RecycledReportRecord,
+    Image,
+    RecycledImage,
+    Document,
+    RecycledDocument,
+)
+
+
+def remember_previous_factory(sender, instance, **kwargs):
+    if instance._state.adding:
+        instance._previous_factory_id = None
+    else:
+        instance._previous_factory_id = (
+            sender.raw_objects.filter(pk=instance.pk).values_list("factory_id", flat=True).first()
+        )
+
+
+def refresh_summaries_on_save(sender, instance, **kwargs):
+    factory_ids = {instance.factory_id, getattr(instance, "_previous_factory_id", None)} - {None}
+    if factory_ids:
+        refresh_factory_summaries(factory_ids)
+        refresh_factory_stats_rollups_of_factories(factory_ids)
+
+
+def refresh_summaries_on_deleted_at_updated(sender, pks, **kwargs):
+    factory_ids = sender.raw_objects.filter(pk__in=pks, factory_id__isnull=False).values("factory_id")
+    refresh_factory_summaries(factory_ids)
+    refresh_factory_stats_rollups_of_factories(factory_ids.values_list("factory_id", flat=True))
+
+
+def refresh_stats_rollups_on_factory_save(sender, instance, **kwargs):
+    refresh_factory_stats_rollups_of_factories([instance.pk])
+
+
+def refresh_stats_rollups_on_factory_deleted_at_updated(sender, pks, **kwargs):
+    refresh_factory_stats_rollups_of_factories(pks)
+
+
+def connect_factory_summary_signals():
+    for model in FACTORY_SUMMARY_SOURCES:
+        pre_save.connect(remember_previous_factory, sender=model)
+        post_save.connect(refresh_summaries_on_save, sender=model)
+        deleted_at_updated.connect(refresh_summaries_on_deleted_at_updated, sender=model)
+
+    for model in (Factory, RecycledFactory):
+        post_save.connect(refresh_stats_rollups_on_factory_save, sender=model)
+        post_delete.connect(refresh_stats_rollups_on_factory_save, sender=model)
+        deleted_at_updated.connect(refresh_stats_rollups_on_factory_deleted_at_updated, sender=model)
@@ -0,0 +1,211 @@
+"""In-process spatial index of factory positions.
+
+Each worker keeps the (id, lat, lng) of every factory in flat arrays bucketed
+by a fixed lat/lng grid, so radius queries can be answered without a database
+round trip. The index is refreshed from `updated_at` / `deleted_at` deltas and
+rebuilt from scratch every once in a while to catch changes that don't touch
+those columns (e.g. rows written with raw SQL).
+"""
+import logging
+import math
+import threading
+import time
+import uuid
+from array import array
+from collections import defaultdict
+
+from django.conf import settings
+from django.db.models import Max, Q
+
+from .geo import get_bounding_box, great_circle_distance
+from .models import Factory
+
+LOGGER = logging.getLogger("django")
+
+
+class FactorySpatialIndex:
+    """Grid bucketed, array backed index of factory coordinates."""
+
+    def __init__(self, cell_size=0.01):
+        self.cell_size = cell_size
+
+        # slot i holds the i-th factory, ids are stored as 16 raw bytes per slot
+        self._ids = bytearray()
+        self._lats = array("d")
+        self._lngs = array("d")
+        self._free_slots = []
+        self._slot_of_id = {}
+        self._cells = defaultdict(lambda: array("l"))
+
+        self._updated_watermark = None
+        self._deleted_watermark = None
+        self._refreshed_at = None
+        self._rebuilt_at = None
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._slot_of_id)
+
+    def _cell_of(self, lat, lng):
+        return (math.floor(lat / self.cell_size), math.floor(lng / self.cell_size))
+
+    def _clear(self):
+        self._ids = bytearray()
+        self._lats = array("d")
+        self._lngs = array("d")
+        self._free_slots = []
+        self._slot_of_id = {}
+        self._cells = defaultdict(lambda: array("l"))
+
+    def _remove(self, factory_id):
+        slot = self._slot_of_id.pop(factory_id.bytes, None)
+        if slot is None:
+            return
+
+        cell = self._cell_of(self._lats[slot], self._lngs[slot])
+        slots = self._cells[cell]
+        slots.remove(slot)
+        if not slots:
+            del self._cells[cell]
+
+        self._lats[slot] = math.nan
+        self._lngs[slot] = math.nan
+        self._free_slots.append(slot)
+
+    def _upsert(self, factory_id, lat, lng):
+        slot = self._slot_of_id.get(factory_id.bytes)
+        if slot is not None:
+            if self._lats[slot] == lat and self._lngs[slot] == lng:
+                return
+            self._remove(factory_id)
+
+        if self._free_slots:
+            slot = self._free_slots.pop()
+            self._ids[slot * 16:(slot + 1) * 16] = factory_id.bytes
+            self._lats[slot] = lat
+            self._lngs[slot] = lng
+        else:
+            slot = len(self._lats)
+            self._ids.extend(factory_id.bytes)
+            self._lats.append(lat)
+            self._lngs.append(lng)
+
+        self._slot_of_id[factory_id.bytes] = slot
+        self._cells[self._cell_of(lat, lng)].append(slot)
+
+    def rebuild(self):
+        """Reload every factory from the database."""
+        with self._lock:
+            watermarks = Factory.raw_objects.aggregate(
+                updated_at=Max("updated_at"),
+                deleted_at=Max("deleted_at"),
+            )
+            self._clear()
+            for factory_id, lat, lng in Factory.objects.values_list(
+                "id", "lat", "lng"
+            ).iterator():
+                self._upsert(factory_id, lat, lng)
+
+            self._updated_watermark = watermarks["updated_at"]
+            self._deleted_watermark = watermarks["deleted_at"]
+            self._refreshed_at = self._rebuilt_at = time.monotonic()
+            LOGGER.info(f"Factory spatial index rebuilt with {len(self)} factories")
+
+    def refresh(self):
+        """Apply factories created, updated or deleted since the last refresh."""
+        with self._lock:
+            if self._rebuilt_at is None:
+                self.rebuild()
+                return
+
+            delta = Q()
+            if self._updated_watermark is not None:
+                delta |= Q(updated_at__gte=self._updated_watermark)
+            if self._deleted_watermark is not None:
+                delta |= Q(deleted_at__gte=self._deleted_watermark)
+            else:
+                delta |= Q(deleted_at__isnull=False)
+
+            changed = Factory.raw_objects.filter(delta).values_list(
+                "id", "lat", "lng", "updated_at", "deleted_at"
+            )
+            for factory_id, lat, lng, updated_at, deleted_at in changed:
+                if deleted_at is None:
+                    self._upsert(factory_id, lat, lng)
+                else:
+                    self._remove(factory_id)
+
+                if self._updated_watermark is None or updated_at > self._updated_watermark:
+                    self._updated_watermark = updated_at
+                if deleted_at is not None and (
+                    self._deleted_watermark is None or deleted_at > self._deleted_watermark
+                ):
+                    self._deleted_watermark = deleted_at
+
+            self._refreshed_at = time.monotonic()
+
+    def refresh_if_stale(self, refresh_seconds, rebuild_seconds):
+        now = time.monotonic()
+        if self._rebuilt_at is None or now - self._rebuilt_at >= rebuild_seconds:
+            self.rebuild()
+        elif now - self._refreshed_at >= refresh_seconds:
+            self.refresh()
+
+    def query_bounding_box(self, min_lat, max_lat, min_lng, max_lng):
+        """Return (id, lat, lng) of factories inside the bounding box."""
+        min_cell = self._cell_of(min_lat, min_lng)
+        max_cell = self._cell_of(max_lat, max_lng)
+
+        with self._lock:
+            n_cells_in_box = (max_cell[0] - min_cell[0] + 1) * (max_cell[1] - min_cell[1] + 1)
+            if n_cells_in_box <= len(self._cells):
+                cells = (
+                    (x, y)
+                    for x in range(min_cell[0], max_cell[0] + 1)
+                    for y in range(min_cell[1], max_cell[1] + 1)
+                )
+            else:
+                cells = (
+                    cell
+                    for cell in self._cells
+                    if min_cell[0] <= cell[0] <= max_cell[0]
+                    and min_cell[1] <= cell[1] <= max_cell[1]
+                )
+
+            factories = []
+            for cell in cells:
+                for slot in self._cells.get(cell, ()):
+                    lat = self._lats[slot]
+                    lng = self._lngs[slot]
+                    if min_lat <= lat <= max_lat and min_lng <= lng <= max_lng:
+                        factory_id = uuid.UUID(bytes=bytes(self._ids[slot * 16:(slot + 1) * 16]))
+                        factories.append((factory_id, lat, lng))
+
+        return factories
+
+    def query_positions(self, latitude, longitude, radius):
+        """Return (id, lat, lng) of factories within `radius` km of the position."""
+        bounding_box = get_bounding_box(latitude, longitude, radius)
+        return [
+            (factory_id, lat, lng)
+            for factory_id, lat, lng in self.query_bounding_box(*bounding_box)
+            if great_circle_distance(latitude, longitude, lat, lng) < radius
+        ]
+
+    def query(self, latitude, longitude, radius):
+        """Return ids of factories within `radius` km of the position, ordered by id."""
+        return sorted(
+            factory_id for factory_id, _, _ in self.query_positions(latitude, longitude, radius)
+        )
+
+
+_factory_spatial_index = FactorySpatialIndex()
+
+
+def get_factory_spatial_index():
+    """Return the index of this process, refreshed according to the settings."""
+    _factory_spatial_index.refresh_if_stale(
+        refresh_seconds=settings.FACTORY_SPATIAL_INDEX_REFRESH_SECONDS,
+        rebuild_seconds=settings.FACTORY_SPATIAL_INDEX_REBUILD_SECONDS,
+    )
+    return _factory_spatial_index
@@ -1,13 +1,29 @@
 import os
 import logging
 from urllib.parse import urljoin
+from datetime import timedelta
 from uuid import uuid4
 
 from django.conf import settings
+from django.db.models.functions import Now
+from django.utils import timezone
+from django_q.models import Schedule
+from django_q.tasks import schedule
 import requests
 
 import easymap
-from .models import Factory, Image
+
+from .boundaries import get_local_land_info
+from .cache import invalidate_factory_tiles
+from .models import (
+    Factory,
+    Image,
+    delete_expired_idempotency_keys,
+    get_land_info,
+    refresh_factory_stats_rollups,
+    refresh_factory_stats_rollups_of_factories,
+)
+from .utils import split_townname
 
 LOGGER = logging.getLogger("django")
 
@@ -41,23 +57,117 @@ def _upload_image_to_imgur(image_buffer, client_id):
     return path
 
 
-def update_landcode(factory_id):
-    update_landcode_with_custom_factory_model(factory_id, Factory)
+# Factory fields filled from the keys of the land info
+LANDINFO_FIELDS = (
+    ("landcode", "landno"),
+    ("sectcode", "sectno"),
+    ("sectname", "sectName"),
+    ("towncode", "towncode"),
+    ("townname", "townname"),
+)
+
+
+def factory_fields_of_landinfo(landinfo):
+    """Map the keys of the land info to Factory fields, deriving city and town from townname."""
+    fields = {field: landinfo[key] for field, key in LANDINFO_FIELDS if key in landinfo}
+    if "townname" in fields:
+        fields["city"], fields["town"] = split_townname(fields["townname"])
+    return fields
+
+
+# seconds before looking up again the factories skipped while easymap is unavailable
+LANDCODE_RETRY_DELAYS = (60, 5 * 60, 30 * 60, 60 * 60, 6 * 60 * 60)
+
+
+def _retry_later(func, args, attempt, error):
+    # django-q stores the args as their repr and reads them back with literal_eval,
+    # so they must be plain literals, e.g. factory ids as str rather than UUID
+    if attempt >= len(LANDCODE_RETRY_DELAYS):
+        LOGGER.error(f"Giving up {func}{args} after {attempt} retries: {error}")
+        return
+    LOGGER.warning(f"Retrying {func}{args} in {LANDCODE_RETRY_DELAYS[attempt]}s: {error}")
+    schedule(
+        func,
+        *args,
+        attempt=attempt + 1,
+        schedule_type=Schedule.ONCE,
+        next_run=timezone.now() + timedelta(seconds=LANDCODE_RETRY_DELAYS[attempt]),
+    )
+
+
+def update_landcode(factory_id, attempt=0):
+    try:
+        update_landcode_with_custom_factory_model(factory_id, Factory)
+    except easymap.EasymapUnavailable as e:
+        _retry_later("api.tasks.update_landcode", (str(factory_id),), attempt, e)
+
+
+# factories looked up by one update_landcodes task, few enough to finish within the Q_CLUSTER timeout
+UPDATE_LANDCODES_CHUNK_SIZE = 5
+
+
+def update_landcodes(factory_ids, attempt=0):
+    for idx, factory_id in enumerate(factory_ids):
+        try:
+            update_landcode_with_custom_factory_model(factory_id, Factory)
+        except easymap.EasymapUnavailable as e:
+            # the rest would be skipped too, retry them together
+            _retry_later("api.tasks.update_landcodes", ([str(i) for i in factory_ids[idx:]],), attempt, e)
+            return
+        except Exception:
+            # e.g. no parcel at the position, the other factories are still looked up
+            LOGGER.exception(f"Factory {factory_id} failed retrieving land number")
 
 
 def update_landcode_with_custom_factory_model(factory_id, factory_model):
     factory = factory_model.objects.get(pk=factory_id)
-    landinfo = easymap.get_land_number(factory.lng, factory.lat)
-    landcode = landinfo.get("landno")
+    landinfo = get_local_land_info(factory.lng, factory.lat)
+    skipped = None
+    try:
+        landinfo.update(get_land_info(factory.lng, factory.lat))
+    except easymap.EasymapUnavailable as e:
+        if not landinfo:
+            raise
+        # save the fields resolved offline, then let the caller retry the lookup
+        skipped = e
+    except Exception:
+        if not landinfo:
+            raise
+        # keep the town and section resolved offline, the land number is looked up next time
+        LOGGER.exception(f"Factory {factory_id} failed retrieving land number, using offline boundaries")
+    else:
+        for _, key in LANDINFO_FIELDS:
+            landinfo.setdefault(key, None)
 
-    LOGGER.info(f"Factory {factory_id} retrieved land number {landcode}")
+    fields = factory_fields_of_landinfo(landinfo)
+
+    LOGGER.info(f"Factory {factory_id} retrieved land number {landinfo.get('landno')}")
     factory_model.objects.filter(pk=factory_id).update(
-        landcode=landcode,
-        sectcode=landinfo.get("sectno"),
-        sectname=landinfo.get("sectName"),
-        towncode=landinfo.get("towncode"),
-        townname=landinfo.get("townname"),
+        **fields,
+        updated_at=Now(),
     )
+    refresh_factory_stats_rollups_of_factories([factory_id])
+    invalidate_factory_tiles((factory.lat, factory.lng))
+    if skipped is not None:
+        raise skipped
+
+
+def reconcile_factory_stats_rollups(factory_ids=None):
+    """Rebuild every rollup, fixing drift from changes that skipped the model signals.
+
+    Only the rollups of `factory_ids` are refreshed when given, e.g. after a failed refresh.
+    """
+    refresh_factory_stats_rollups(factory_ids)
+    if factory_ids is None:
+        LOGGER.info("Factory stats rollups reconciled")
+    else:
+        LOGGER.info(f"Factory stats rollups of {len(factory_ids)} factories reconciled")
+
+
+def purge_idempotency_keys():
+    """Delete the stored responses of expired idempotency keys."""
+    deleted = delete_expired_idempotency_keys()
+    LOGGER.info(f"Deleted {deleted} expired idempotency keys")
 
 
 def upload_image(image_path, client_id, image_id):
@@ -69,6 +179,8 @@ def upload_image(image_path, client_id, image_id):
         path = _upload_image_to_imgur(image_buffer, client_id)
         try:
             Image.objects.filter(pk=image_id).update(image_path=path)
+            # the image path is part of the factory payload
+            Factory.raw_objects.filter(images__id=image_id).update(updated_at=Now())
         except Exception:
             LOGGER.error(
                 f"""
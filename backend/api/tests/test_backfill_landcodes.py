@@ -0,0 +1,118 @@
+import json
+import os
+from io import StringIO
+from tempfile import TemporaryDirectory
+from unittest.mock import patch
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+import easymap
+from ..models import Factory, FactoryStatsRollup, get_land_info_cache_stats
+
+LAND_INFO = {
+    "landno": "03750000",
+    "sectno": "0375",
+    "sectName": "中正段",
+    "towncode": "65000090",
+    "townname": "新北市三峽區",
+}
+
+
+class BackfillLandcodesTestCase(TestCase):
+    def setUp(self):
+        # the rollups are refreshed once committed, which never happens inside a TestCase
+        patcher = patch("api.models.factory_stats_rollup.transaction.on_commit", side_effect=lambda func: func())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.missing = [
+            Factory.objects.create(lat=24.93 + idx * 0.001, lng=121.37, display_number=50001 + idx) for idx in range(5)
+        ]
+        Factory.objects.filter(id__in=[factory.id for factory in self.missing]).update(landcode=None, townname=None)
+        self.complete = Factory.objects.create(
+            lat=24.93, lng=121.37, display_number=50010, landcode="1", townname="臺中市西屯區"
+        )
+        Factory.raw_objects.exclude(
+            id__in=[factory.id for factory in self.missing] + [self.complete.id]
+        ).update(landcode="1", townname="臺中市西屯區")
+
+    def backfill(self, *args):
+        call_command("backfill_landcodes", "--rate", "0", "--batch-size", "2", *args, stdout=StringIO(), stderr=StringIO())
+
+    @patch.object(easymap.EasymapClient, "get_land_number", return_value=LAND_INFO)
+    def test_backfill(self, mock_get_land_number):
+        self.backfill()
+
+        self.assertEqual(mock_get_land_number.call_count, 5)
+        for factory in Factory.objects.filter(id__in=[factory.id for factory in self.missing]):
+            self.assertEqual(factory.landcode, "03750000")
+            self.assertEqual((factory.city, factory.town), ("新北市", "三峽區"))
+        self.assertEqual(
+            FactoryStatsRollup.objects.filter(city="新北市", town="三峽區").values_list("factories", flat=True).get(),
+            5,
+        )
+
+    @patch.object(easymap.EasymapClient, "get_land_number", return_value=LAND_INFO)
+    def test_backfill_from_land_info_cache(self, mock_get_land_number):
+        # two factories share their coordinates with another one
+        Factory.objects.filter(id__in=[factory.id for factory in self.missing[3:]]).update(lat=24.93)
+
+        self.backfill("--batch-size", "5")
+        self.assertEqual(mock_get_land_number.call_count, 3)
+        self.assertEqual(get_land_info_cache_stats(), {"entries": 3, "hits": 0, "misses": 3})
+        self.assertFalse(Factory.objects.filter(landcode=None).exists())
+
+        Factory.objects.filter(id__in=[factory.id for factory in self.missing]).update(landcode=None)
+        self.backfill("--batch-size", "5")
+        self.assertEqual(mock_get_land_number.call_count, 3)
+        self.assertEqual(get_land_info_cache_stats(), {"entries": 3, "hits": 3, "misses": 3})
+        self.assertFalse(Factory.objects.filter(landcode=None).exists())
+
+    @patch.object(easymap.EasymapClient, "get_land_number", return_value=LAND_INFO)
+    def test_backfill_resume_from_checkpoint(self, mock_get_land_number):
+        with TemporaryDirectory() as directory:
+            checkpoint = os.path.join(directory, "checkpoint.json")
+            self.backfill("--limit", "3", "--checkpoint", checkpoint)
+            self.assertEqual(mock_get_land_number.call_count, 3)
+            with open(checkpoint) as f:
+                last_id = json.load(f)["last_id"]
+
+            self.backfill("--checkpoint", checkpoint)
+
+        self.assertEqual(mock_get_land_number.call_count, 5)
+        self.assertEqual(sorted(str(factory.id) for factory in self.missing)[2], last_id)
+        self.assertFalse(Factory.objects.filter(landcode=None).exists())
+
+    @patch.object(easymap.EasymapClient, "get_land_number", side_effect=easymap.WebRequestError("", 503, ""))
+    def test_backfill_keep_factories_if_lookup_failed(self, _):
+        self.backfill()
+
+        self.assertEqual(Factory.objects.filter(landcode=None).count(), 5)
+
+    def test_backfill_back_off_while_easymap_unavailable(self):
+        unavailable = easymap.EasymapUnavailable("easymap circuit is open")
+        side_effect = [LAND_INFO, unavailable, LAND_INFO, LAND_INFO, LAND_INFO, LAND_INFO]
+        with TemporaryDirectory() as directory, \
+                patch.object(easymap.EasymapClient, "get_land_number", side_effect=side_effect), \
+                patch("api.management.commands.backfill_landcodes.time.sleep") as mock_sleep:
+            checkpoint = os.path.join(directory, "checkpoint.json")
+            self.backfill("--concurrency", "1", "--checkpoint", checkpoint)
+
+        self.assertEqual([call for call in mock_sleep.call_args_list if call != ((0,),)], [((60,),)])
+        self.assertFalse(Factory.objects.filter(landcode=None).exists())
+
+    @patch("api.management.commands.backfill_landcodes.time.sleep")
+    @patch.object(easymap.EasymapClient, "get_land_number", side_effect=easymap.EasymapUnavailable(""))
+    def test_backfill_keep_checkpoint_while_easymap_unavailable(self, *_):
+        with TemporaryDirectory() as directory:
+            checkpoint = os.path.join(directory, "checkpoint.json")
+            with open(checkpoint, "w") as f:
+                json.dump({"last_id": "00000000-0000-0000-0000-000000000000"}, f)
+
+            with self.assertRaises(CommandError):
+                self.backfill("--checkpoint", checkpoint)
+
+            with open(checkpoint) as f:
+                self.assertEqual(json.load(f)["last_id"], "00000000-0000-0000-0000-000000000000")
+        self.assertEqual(Factory.objects.filter(landcode=None).count(), 5)
@@ -0,0 +1,194 @@
+import json
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+from urllib.parse import parse_qs
+
+from django.test import SimpleTestCase
+
+import easymap
+
+
+class FakeEasymapHandler(BaseHTTPRequestHandler):
+    """Answer the four easymap endpoints like the real site, for the token of the latest handshake."""
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, body, content_type="application/json", headers=()):
+        body = body.encode()
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for header in headers:
+            self.send_header(*header)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        server = self.server
+        server.hits[self.path] += 1
+        if self.path == "/P02/Index":
+            server.sessions += 1
+            return self._send(
+                200, "<html></html>", "text/html", [("Set-Cookie", f"JSESSIONID=s{server.sessions}; Path=/")]
+            )
+        self._send(404, "")
+
+    def do_POST(self):
+        server = self.server
+        server.hits[self.path] += 1
+        form = parse_qs(self.rfile.read(int(self.headers.get("Content-Length", 0))).decode())
+
+        if self.path == "/P02/Query_json_getPointCity":
+            return self._send(200, json.dumps({"cityCode": "F"}))
+        if self.path == "/P02/pages/setToken.jsp":
+            server.tokens += 1
+            return self._send(200, f'<input type="hidden" name="token" value="t{server.tokens}" />', "text/html")
+        if self.path == "/P02/Door_json_getDoorInfoByXY":
+            if server.failing:
+                return self._send(503, "")
+            if form.get("token") != [f"t{server.tokens}"]:
+                return self._send(403, "token expired")
+            if server.no_parcel:
+                return self._send(200, json.dumps({}))
+            return self._send(
+                200, json.dumps({"landno": "03750000", "sectno": "0375", "sectName": "中正段", "towncode": "65000090"})
+            )
+        self._send(404, "")
+
+
+class EasymapClientTestCase(SimpleTestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), FakeEasymapHandler)
+        self.server.hits = Counter()
+        self.server.sessions = 0
+        self.server.tokens = 0
+        self.server.no_parcel = False
+        self.server.failing = False
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+        self.client = easymap.EasymapClient(base_url=f"http://127.0.0.1:{self.server.server_port}/P02")
+
+    def tearDown(self):
+        self.client.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_reuse_session_and_token(self):
+        for _ in range(3):
+            land_number = self.client.get_land_number(121.3, 24.9)
+            self.assertEqual(land_number["landno"], "03750000")
+            self.assertEqual(land_number["townname"], "新北市三峽區")
+
+        self.assertEqual(self.server.hits["/P02/Index"], 1)
+        self.assertEqual(self.server.hits["/P02/pages/setToken.jsp"], 1)
+        self.assertEqual(self.server.hits["/P02/Door_json_getDoorInfoByXY"], 3)
+
+    def test_handshake_again_after_token_rejected(self):
+        self.client.get_land_number(121.3, 24.9)
+        self.server.tokens += 1  # the server forgets the token of the client
+
+        land_number = self.client.get_land_number(121.3, 24.9)
+
+        self.assertEqual(land_number["landno"], "03750000")
+        self.assertEqual(self.server.hits["/P02/Index"], 2)
+        self.assertEqual(self.server.hits["/P02/pages/setToken.jsp"], 2)
+
+    def test_handshake_again_after_token_expired(self):
+        self.client.token_ttl = 0
+        self.client.get_land_number(121.3, 24.9)
+        self.client.get_land_number(121.3, 24.9)
+
+        self.assertEqual(self.server.hits["/P02/Index"], 2)
+        self.assertEqual(self.server.hits["/P02/Door_json_getDoorInfoByXY"], 2)
+
+    def test_raise_if_lookup_keeps_failing(self):
+        self.server.failing = True
+
+        with self.assertRaises(easymap.WebRequestError):
+            self.client.get_land_number(121.3, 24.9)
+        self.assertEqual(self.server.hits["/P02/Door_json_getDoorInfoByXY"], 2)
+
+    def test_land_number_not_found_is_not_a_failure(self):
+        self.client.breaker = easymap.CircuitBreaker(failure_threshold=2, reset_timeout=60)
+        self.server.no_parcel = True
+
+        for _ in range(3):
+            with self.assertRaises(easymap.LandNumberNotFound):
+                self.client.get_land_number(121.3, 24.9)
+        self.assertFalse(self.client.breaker.is_open)
+        self.assertEqual(self.server.hits["/P02/pages/setToken.jsp"], 1)
+
+    def test_settle_half_open_trial_on_any_error(self):
+        self.client.breaker = easymap.CircuitBreaker(failure_threshold=1, reset_timeout=0)
+        self.server.failing = True
+        with self.assertRaises(easymap.WebRequestError):
+            self.client.get_land_number(121.3, 24.9)
+        self.assertTrue(self.client.breaker.is_open)
+
+        # the trial call fails with an unexpected error
+        self.server.failing = False
+        with patch("easymap.get_point_city", return_value={}):
+            with self.assertRaises(KeyError):
+                self.client.get_land_number(121.3, 24.9)
+
+        land_number = self.client.get_land_number(121.3, 24.9)
+        self.assertEqual(land_number["landno"], "03750000")
+        self.assertFalse(self.client.breaker.is_open)
+
+    def test_fail_fast_while_circuit_open(self):
+        self.client.breaker = easymap.CircuitBreaker(failure_threshold=2, reset_timeout=60)
+        self.server.failing = True
+        for _ in range(2):
+            with self.assertRaises(easymap.WebRequestError):
+                self.client.get_land_number(121.3, 24.9)
+        hits = sum(self.server.hits.values())
+
+        with self.assertRaises(easymap.EasymapUnavailable):
+            self.client.get_land_number(121.3, 24.9)
+        self.assertEqual(sum(self.server.hits.values()), hits)
+
+    def test_timeout(self):
+        self.client.timeout = 0.01
+        with patch.object(FakeEasymapHandler, "do_GET", lambda handler: time.sleep(0.2)):
+            with self.assertRaises(easymap.requests.Timeout):
+                self.client.get_land_number(121.3, 24.9)
+
+
+class CircuitBreakerTestCase(SimpleTestCase):
+    def test_half_open_after_reset_timeout(self):
+        breaker = easymap.CircuitBreaker(failure_threshold=1, reset_timeout=10)
+        with patch("easymap.time.monotonic", return_value=100):
+            breaker.before_call()
+            breaker.record_failure()
+            with self.assertRaises(easymap.EasymapUnavailable):
+                breaker.before_call()
+
+        with patch("easymap.time.monotonic", return_value=111):
+            breaker.before_call()  # the trial call
+            with self.assertRaises(easymap.EasymapUnavailable):
+                breaker.before_call()
+            breaker.record_success()
+            breaker.before_call()
+        self.assertFalse(breaker.is_open)
+
+
+class TokenBucketTestCase(SimpleTestCase):
+    def test_acquire_within_capacity(self):
+        bucket = easymap.TokenBucket(rate=1, capacity=2)
+        self.assertTrue(bucket.acquire())
+        self.assertTrue(bucket.acquire())
+        self.assertFalse(bucket.acquire())
+
+    def test_rate_adapts(self):
+        bucket = easymap.TokenBucket(rate=4, min_rate=1, max_rate=5, rate_step=0.5)
+        bucket.on_failure()
+        bucket.on_failure()
+        bucket.on_failure()
+        self.assertEqual(bucket.rate, 1)
+        for _ in range(20):
+            bucket.on_success()
+        self.assertEqual(bucket.rate, 5)
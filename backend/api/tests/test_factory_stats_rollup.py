@@ -0,0 +1,90 @@
+from unittest.mock import patch
+
+from django.db import transaction
+from django.test import TestCase, TransactionTestCase
+
+from ..models import (
+    Factory,
+    FactoryStatsRollup,
+    Image,
+    ReportRecord,
+    factory_stats_rollup,
+    refresh_factory_stats_rollups,
+    refresh_factory_stats_rollups_of_factories,
+)
+from ..tasks import reconcile_factory_stats_rollups
+
+
+def get_rollups():
+    return {
+        (rollup.city, rollup.town, rollup.source, rollup.display_status): (
+            rollup.factories,
+            rollup.reported_factories,
+            rollup.documents,
+            rollup.report_records,
+            rollup.images,
+        )
+        for rollup in FactoryStatsRollup.objects.exclude(factories=0)
+    }
+
+
+class FactoryStatsRollupTestCase(TestCase):
+    def setUp(self):
+        patcher = patch("api.models.factory_stats_rollup.transaction.on_commit", side_effect=lambda func: func())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_apply_changes_like_a_rebuild(self):
+        factory = Factory.objects.create(lat=23.1, lng=120.3, display_number=60001, townname="臺南市善化區")
+        ReportRecord.objects.create(factory=factory, action_type="POST", action_body={})
+        Image.objects.create(factory=factory, image_path="https://i.imgur.com/RxArJUc.png")
+        self.assertEqual(get_rollups()[("臺南市", "善化區", "U", None)], (1, 1, 0, 1, 1))
+
+        factory.townname = "臺南市新市區"
+        factory.save()
+        self.assertNotIn(("臺南市", "善化區", "U", None), get_rollups())
+        self.assertEqual(get_rollups()[("臺南市", "新市區", "U", None)], (1, 1, 0, 1, 1))
+
+        Factory.objects.filter(pk=factory.pk).delete()
+        self.assertNotIn(("臺南市", "新市區", "U", None), get_rollups())
+
+        Factory.recycle_objects.filter(pk=factory.pk).undelete()
+        self.assertIn(("臺南市", "新市區", "U", None), get_rollups())
+        # a hard delete
+        Factory.raw_objects.filter(pk=factory.pk).delete()
+        self.assertNotIn(("臺南市", "新市區", "U", None), get_rollups())
+
+        rollups = get_rollups()
+        refresh_factory_stats_rollups()
+        self.assertEqual(get_rollups(), rollups)
+
+
+class RefreshOnCommitTestCase(TransactionTestCase):
+    # restore the seed factories loaded by the migrations after flushing
+    serialized_rollback = True
+
+    def test_refresh_once_committed(self):
+        with patch(
+            "api.models.factory_stats_rollup._refresh_contributions",
+            wraps=factory_stats_rollup._refresh_contributions,
+        ) as mock_refresh:
+            with transaction.atomic():
+                factory = Factory.objects.create(lat=23.1, lng=120.3, display_number=60001, townname="臺南市善化區")
+                ReportRecord.objects.create(factory=factory, action_type="POST", action_body={})
+                refresh_factory_stats_rollups_of_factories([factory.id])
+                self.assertNotIn(("臺南市", "善化區", "U", None), get_rollups())
+
+        # the signals and the call above are merged into a single refresh
+        mock_refresh.assert_called_once_with({str(factory.id)})
+        self.assertEqual(get_rollups()[("臺南市", "善化區", "U", None)], (1, 1, 0, 1, 0))
+
+    @patch("api.models.factory_stats_rollup.async_task")
+    def test_retry_failed_refresh_in_the_background(self, mock_async_task):
+        with patch("api.models.factory_stats_rollup._refresh_contributions", side_effect=RuntimeError):
+            factory = Factory.objects.create(lat=23.1, lng=120.3, display_number=60001, townname="臺南市善化區")
+
+        mock_async_task.assert_called_once_with("api.tasks.reconcile_factory_stats_rollups", [str(factory.id)])
+        self.assertNotIn(("臺南市", "善化區", "U", None), get_rollups())
+
+        reconcile_factory_stats_rollups(*mock_async_task.call_args[0][1:])
+        self.assertEqual(get_rollups()[("臺南市", "善化區", "U", None)], (1, 0, 0, 0, 0))
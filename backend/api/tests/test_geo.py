@@ -0,0 +1,54 @@
+import math
+
+from django.test import TestCase
+
+from ..geo import (
+    EARTH_RADIUS_KM,
+    get_bounding_box,
+    great_circle_distance,
+    lnglat_to_tile,
+    tile_bounds,
+    tiles_in_bounding_box,
+    zoom_for_radius,
+)
+
+
+class GeoTestCase(TestCase):
+    def test_bounding_box_encloses_the_circle(self):
+        lat, lng, radius = 23.234, 120.1, 10
+
+        min_lat, max_lat, min_lng, max_lng = get_bounding_box(lat, lng, radius)
+
+        self.assertAlmostEqual(great_circle_distance(lat, lng, max_lat, lng), radius, places=6)
+        self.assertAlmostEqual(great_circle_distance(lat, lng, min_lat, lng), radius, places=6)
+        for bearing in range(0, 360, 5):
+            # walk along the circle and check every point is inside the box
+            theta = math.radians(bearing)
+            delta = radius / EARTH_RADIUS_KM
+            lat1, lng1 = math.radians(lat), math.radians(lng)
+            lat2 = math.asin(
+                math.sin(lat1) * math.cos(delta)
+                + math.cos(lat1) * math.sin(delta) * math.cos(theta)
+            )
+            lng2 = lng1 + math.atan2(
+                math.sin(theta) * math.sin(delta) * math.cos(lat1),
+                math.cos(delta) - math.sin(lat1) * math.sin(lat2),
+            )
+            self.assertTrue(min_lat - 1e-9 <= math.degrees(lat2) <= max_lat + 1e-9)
+            self.assertTrue(min_lng - 1e-9 <= math.degrees(lng2) <= max_lng + 1e-9)
+
+    def test_tile_contains_its_positions(self):
+        for zoom in (0, 7, 12, 18):
+            x, y = lnglat_to_tile(120.1, 23.234, zoom)
+            min_lat, max_lat, min_lng, max_lng = tile_bounds(zoom, x, y)
+            self.assertTrue(min_lat <= 23.234 <= max_lat)
+            self.assertTrue(min_lng <= 120.1 <= max_lng)
+
+        # ref: https://wiki.openstreetmap.org/wiki/Slippy_map_tilenames
+        self.assertEqual(lnglat_to_tile(121.5654, 25.0330, 12), (3431, 1753))
+
+    def test_circle_covered_by_at_most_3x3_tiles(self):
+        for radius in (0.01, 0.5, 1, 10, 100):
+            zoom = zoom_for_radius(23.234, radius)
+            tiles = tiles_in_bounding_box(zoom, *get_bounding_box(23.234, 120.1, radius))
+            self.assertLessEqual(len(tiles), 9)
@@ -1,5 +1,9 @@
-from django.test import TestCase
+from datetime import datetime, timezone
+
+from django.db import transaction
+from django.test import TestCase, TransactionTestCase
 from django.db.models.functions.math import Radians, Cos, ACos, Sin
+from django.utils import timezone as django_timezone
 
 
 from api.models import Factory
@@ -36,3 +40,39 @@ class ModelsTestCase(TestCase):
                 ]
             ),
         )
+
+    def test_city_and_town_follow_townname(self):
+        seed_factory = Factory.objects.filter(townname="臺南市善化區").first()
+        self.assertEqual((seed_factory.city, seed_factory.town), ("臺南市", "善化區"))
+
+        factory = Factory.objects.create(lat=24.8, lng=121.8, display_number=30001, townname="臺灣省宜蘭縣頭城鎮")
+        factory.refresh_from_db()
+        self.assertEqual((factory.city, factory.town), ("宜蘭縣", "頭城鎮"))
+
+        factory.townname = None
+        factory.save()
+        factory.refresh_from_db()
+        self.assertEqual((factory.city, factory.town), (None, None))
+
+
+class FactoryUpdatedAtTestCase(TransactionTestCase):
+    # restore the seed factories loaded by the migrations after flushing
+    serialized_rollback = True
+
+    def test_set_updated_at_on_commit(self):
+        factories = [
+            Factory.objects.create(lat=23.1, lng=120.3, display_number=60001),
+            Factory.objects.create(lat=23.2, lng=120.3, display_number=60002),
+        ]
+        long_ago = datetime(2000, 1, 1, tzinfo=timezone.utc)
+
+        with transaction.atomic():
+            # a timestamp taken long before the commit
+            Factory.objects.filter(pk__in=[factory.pk for factory in factories]).update(updated_at=long_ago)
+            committing_at = django_timezone.now()
+
+        updated_ats = set(
+            Factory.objects.filter(pk__in=[factory.pk for factory in factories]).values_list("updated_at", flat=True)
+        )
+        self.assertEqual(len(updated_ats), 1)
+        self.assertGreaterEqual(updated_ats.pop(), committing_at)
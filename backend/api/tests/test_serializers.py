@@ -1,10 +1,12 @@
 from datetime import datetime, timedelta
 
+from django.db.models import Prefetch
+from django.http import JsonResponse
 from django.test import TestCase
 from freezegun import freeze_time
 
-from ..serializers import FactorySerializer, ImageSerializer
-from ..models import Factory, ReportRecord, Image
+from ..serializers import FactorySerializer, ImageSerializer, serialize_factories
+from ..models import Factory, ReportRecord, Image, Document
 
 
 class FactorySerializersTestCase(TestCase):
@@ -134,6 +136,7 @@ class FactorySerializersTestCase(TestCase):
             factory=factory,
             report_record=report_record2,
         )
+        factory.refresh_from_db()
         serializer = FactorySerializer(factory)
         self.assertFalse(serializer.data["data_complete"])
 
@@ -158,6 +161,7 @@ class FactorySerializersTestCase(TestCase):
             others="HI",
             created_at=factory.created_at + timedelta(days=1),
         )
+        factory.refresh_from_db()
         serializer = FactorySerializer(factory)
         self.assertFalse(serializer.data["data_complete"])
 
@@ -187,6 +191,7 @@ class FactorySerializersTestCase(TestCase):
                 factory=factory,
                 report_record=report_record,
             )
+        factory.refresh_from_db()
         serializer = FactorySerializer(factory)
         self.assertFalse(serializer.data["data_complete"])
 
@@ -217,6 +222,7 @@ class FactorySerializersTestCase(TestCase):
                 factory=factory,
                 report_record=report_record,
             )
+        factory.refresh_from_db()
         serializer = FactorySerializer(factory)
         self.assertTrue(serializer.data["data_complete"])
 
@@ -247,6 +253,7 @@ class FactorySerializersTestCase(TestCase):
                 factory=factory,
                 report_record=report_record,
             )
+        factory.refresh_from_db()
         serializer = FactorySerializer(factory)
         self.assertTrue(serializer.data["data_complete"])
 
@@ -272,6 +279,7 @@ class FactorySerializersTestCase(TestCase):
                 contact="07-7533967",
                 others="昨天在這裡辦演唱會，但旁邊居然在蓋工廠。不錄了不錄了！",
             )
+        factory.refresh_from_db()
         serializer = FactorySerializer(factory)
         self.assertFalse(serializer.data["data_complete"])
 
@@ -302,6 +310,7 @@ class FactorySerializersTestCase(TestCase):
                 factory=factory,
                 report_record=report_record,
             )
+        factory.refresh_from_db()
         serializer = FactorySerializer(factory)
         self.assertFalse(serializer.data["data_complete"])
 
@@ -335,6 +344,45 @@ class FactorySerializersTestCase(TestCase):
         self.assertEqual(serializer.errors, {})
 
 
+class SerializeFactoriesTestCase(TestCase):
+    def test_same_response_as_factory_serializer(self):
+        complete = Factory.objects.create(
+            name="test factory",
+            lat=23,
+            lng=121,
+            landcode="000120324",
+            factory_type="2-1",
+            display_number=666,
+        )
+        report_record = ReportRecord.objects.create(
+            factory=complete,
+            action_type="post_image",
+            action_body={},
+        )
+        for image_path in ["https://i.imgur.com/RxArJUc.png", "https://imgur.dcard.tw/BB2L2LT.jpg"]:
+            Image.objects.create(image_path=image_path, factory=complete, report_record=report_record)
+        Document.objects.create(factory=complete, code=1090001)
+        Factory.objects.create(
+            name=None,
+            lat=23.5,
+            lng=121.5,
+            factory_type=None,
+            before_release=True,
+            display_number=667,
+        )
+
+        queryset = Factory.objects.filter(display_number__in=[666, 667]).order_by("display_number")
+        images = Image.objects.order_by("created_at", "id")
+
+        self.assertEqual(
+            JsonResponse(serialize_factories(queryset), safe=False).content,
+            JsonResponse(
+                FactorySerializer(queryset.prefetch_related(Prefetch("images", images)), many=True).data,
+                safe=False,
+            ).content,
+        )
+
+
 class ImageSerializersTestCase(TestCase):
     def test_image_serializer_coorect_url(self):
         img = Image(image_path="https://imgur.com/qwer")
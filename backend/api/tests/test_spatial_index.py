@@ -0,0 +1,54 @@
+from unittest.mock import patch
+
+from django.test import TestCase, override_settings
+
+from ..models import Factory
+from ..spatial_index import FactorySpatialIndex
+from ..views.utils import _get_nearby_factories
+
+
+class FactorySpatialIndexTestCase(TestCase):
+    def setUp(self):
+        self.index = FactorySpatialIndex()
+        self.index.rebuild()
+
+    def _nearby_ids_from_sql(self, lat, lng, radius):
+        with self.settings(FACTORY_SPATIAL_INDEX_ENABLED=False, MAX_FACTORY_PER_GET=10000):
+            return sorted(factory.id for factory in _get_nearby_factories(lat, lng, radius))
+
+    def test_query_same_as_sql(self):
+        # in sync with api/tests/test_models.py
+        for lat, lng, radius in [(23.234, 120.1, 1), (23.0, 120.3, 3), (23.1, 120.2, 50)]:
+            self.assertEqual(
+                self.index.query(lat, lng, radius),
+                self._nearby_ids_from_sql(lat, lng, radius),
+            )
+
+    def test_refresh_applies_created_updated_and_deleted_factories(self):
+        created = Factory.objects.create(lat=24.0, lng=121.0, display_number=10001)
+        moved = Factory.objects.create(lat=24.5, lng=121.5, display_number=10002)
+        self.index.refresh()
+        self.assertEqual(self.index.query(24.0, 121.0, 1), [created.id])
+        self.assertEqual(self.index.query(24.5, 121.5, 1), [moved.id])
+
+        moved.lat = 24.0
+        moved.lng = 121.001
+        moved.save()
+        created.delete()
+        self.index.refresh()
+        self.assertEqual(self.index.query(24.0, 121.0, 1), [moved.id])
+        self.assertEqual(self.index.query(24.5, 121.5, 1), [])
+
+        Factory.objects.filter(pk=moved.pk).delete()
+        self.index.refresh()
+        self.assertEqual(self.index.query(24.0, 121.0, 1), [])
+
+    @override_settings(FACTORY_SPATIAL_INDEX_ENABLED=True)
+    def test_nearby_factories_use_the_index(self):
+        with patch("api.views.utils.get_factory_spatial_index", return_value=self.index):
+            factories = _get_nearby_factories(23.234, 120.1, 1)
+
+        self.assertEqual(
+            sorted(factory.id for factory in factories),
+            self._nearby_ids_from_sql(23.234, 120.1, 1),
+        )
@@ -1,10 +1,15 @@
+import ast
+import json
+from datetime import datetime, timezone
 from unittest.mock import patch
 from tempfile import NamedTemporaryFile
 
-from django.test import TestCase
+from django.test import TestCase, override_settings
+from django_q.models import Schedule
 
-from ..models import Image
-from ..tasks import _upload_image_to_imgur, upload_image
+import easymap
+from ..models import Factory, Image
+from ..tasks import _upload_image_to_imgur, update_landcode, update_landcodes, upload_image
 
 
 FAKE_IMAGE_URI = "https://ingur.fake/12i34uhoi2"
@@ -46,3 +51,94 @@ class TasksTestCase(TestCase):
 
         new_img = Image.objects.get(pk=img.id)
         self.assertEqual(new_img.image_path, FAKE_IMAGE_URI)
+
+    @patch("api.tasks._upload_image_to_imgur", return_value=FAKE_IMAGE_URI)
+    def test_upload_image_move_factory_watermark(self, _):
+        factory = Factory.objects.create(lat=24.93, lng=121.37, display_number=40001)
+        img = Image.objects.create(image_path="", factory=factory)
+        long_ago = datetime(2000, 1, 1, tzinfo=timezone.utc)
+        Factory.objects.filter(pk=factory.pk).update(updated_at=long_ago)
+
+        with NamedTemporaryFile(delete=False) as f:
+            upload_image(f.name, "some_client_id", img.id)
+
+        factory.refresh_from_db()
+        self.assertGreater(factory.updated_at, long_ago)
+
+
+class UpdateLandcodeTestCase(TestCase):
+    def setUp(self):
+        self.factory = Factory.objects.create(lat=24.93, lng=121.37, display_number=40001)
+
+        self.town_boundaries = NamedTemporaryFile("w", suffix=".geojson")
+        json.dump({
+            "type": "FeatureCollection",
+            "features": [{
+                "type": "Feature",
+                "properties": {"TOWNCODE": "65000090", "COUNTYNAME": "新北市", "TOWNNAME": "三峽區"},
+                "geometry": {
+                    "type": "Polygon",
+                    "coordinates": [[[121.3, 24.9], [121.4, 24.9], [121.4, 25.0], [121.3, 25.0], [121.3, 24.9]]],
+                },
+            }],
+        }, self.town_boundaries)
+        self.town_boundaries.flush()
+
+    def tearDown(self):
+        self.town_boundaries.close()
+
+    @patch("api.tasks.get_land_info", return_value={
+        "landno": "03750000", "sectno": "0375", "sectName": "中正段", "towncode": "65000090", "townname": "新北市三峽區",
+    })
+    def test_update_landcode(self, _):
+        update_landcode(self.factory.id)
+
+        self.factory.refresh_from_db()
+        self.assertEqual(self.factory.landcode, "03750000")
+        self.assertEqual(self.factory.sectname, "中正段")
+        self.assertEqual((self.factory.city, self.factory.town), ("新北市", "三峽區"))
+
+    @patch("api.tasks.get_land_info", side_effect=easymap.WebRequestError("Failed getting session", 503, ""))
+    def test_update_landcode_from_boundaries_if_easymap_failed(self, _):
+        with override_settings(TOWN_BOUNDARY_PATH=self.town_boundaries.name):
+            update_landcode(self.factory.id)
+
+        self.factory.refresh_from_db()
+        self.assertIsNone(self.factory.landcode)
+        self.assertEqual(self.factory.towncode, "65000090")
+        self.assertEqual((self.factory.city, self.factory.town), ("新北市", "三峽區"))
+
+        with self.assertRaises(easymap.WebRequestError):
+            update_landcode(self.factory.id)
+
+    def test_update_landcodes_go_on_after_a_failed_lookup(self):
+        other = Factory.objects.create(lat=24.94, lng=121.38, display_number=40002)
+        landinfo = {
+            "landno": "03750000", "sectno": "0375", "sectName": "中正段", "towncode": "65000090", "townname": "新北市三峽區",
+        }
+        no_parcel = easymap.LandNumberNotFound("Door info without towncode", 200, "{}")
+        with patch("api.tasks.get_land_info", side_effect=[no_parcel, landinfo]):
+            update_landcodes([self.factory.id, other.id])
+
+        self.factory.refresh_from_db()
+        other.refresh_from_db()
+        self.assertIsNone(self.factory.landcode)
+        self.assertEqual(other.landcode, "03750000")
+        self.assertFalse(Schedule.objects.filter(schedule_type=Schedule.ONCE).exists())
+
+    @patch("api.tasks.get_land_info", side_effect=easymap.EasymapUnavailable("easymap circuit is open"))
+    def test_retry_later_if_easymap_unavailable(self, _):
+        other = Factory.objects.create(lat=24.94, lng=121.38, display_number=40002)
+        update_landcode(self.factory.id)
+        update_landcodes([self.factory.id, other.id], attempt=2)
+
+        retries = Schedule.objects.filter(schedule_type=Schedule.ONCE).order_by("func")
+        self.assertEqual([retry.func for retry in retries], ["api.tasks.update_landcode", "api.tasks.update_landcodes"])
+        # the scheduler reads the args and kwargs back with literal_eval
+        self.assertEqual(ast.literal_eval(retries[0].args), (str(self.factory.id),))
+        self.assertEqual(ast.literal_eval(retries[0].kwargs), {"attempt": 1})
+        self.assertEqual(ast.literal_eval(retries[1].args), ([str(self.factory.id), str(other.id)],))
+        self.assertEqual(ast.literal_eval(retries[1].kwargs), {"attempt": 3})
+
+        update_landcode(self.factory.id, attempt=5)
+        self.assertEqual(Schedule.objects.filter(schedule_type=Schedule.ONCE).count(), 2)
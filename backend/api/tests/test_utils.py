@@ -1,6 +1,6 @@
 from django.test import TestCase
 
-from api.utils import normalize_townname
+from api.utils import normalize_townname, split_townname
 
 
 class UtilsTestCase(TestCase):
@@ -9,3 +9,11 @@ class UtilsTestCase(TestCase):
         assert normalize_townname("台南市善化區") == "臺南市善化區"
         assert normalize_townname("臺北市大安區") == "臺北市大安區"
         assert normalize_townname("高雄市苓雅區") == "高雄市苓雅區"
+
+    def test_split_townname(self):
+        assert split_townname("臺灣省宜蘭縣頭城鎮") == ("宜蘭縣", "頭城鎮")
+        assert split_townname("福建省金門縣金城鎮") == ("金門縣", "金城鎮")
+        assert split_townname("台南市善化區") == ("臺南市", "善化區")
+        assert split_townname("新竹市東區") == ("新竹市", "東區")
+        assert split_townname("臺北市") == ("臺北市", None)
+        assert split_townname(None) == (None, None)
@@ -17,6 +17,7 @@ from django.urls import path
 
 from .views import (
     get_nearby_or_create_factories,
+    post_factories_batch,
     update_factory_attribute,
     get_factory_report,
     post_image_url,
@@ -25,10 +26,12 @@ from .views import (
     get_images_count_by_townname,
     get_report_records_count_by_townname,
     get_statistics_total,
+    get_factory_tile,
 )
 
 urlpatterns = [
     path("factories", get_nearby_or_create_factories),
+    path("factories/batch", post_factories_batch),
     path("factories/<factory_id>", update_factory_attribute),
     path("factories/<factory_id>/report_records", get_factory_report),
     path("factories/<factory_id>/images", post_factory_image_url),
@@ -39,4 +42,6 @@ urlpatterns = [
     path("statistics/total", get_statistics_total),
 
     path("images", post_image_url),
+
+    path("tiles/<int:zoom>/<int:x>/<int:y>", get_factory_tile),
 ]
@@ -10,3 +10,18 @@ def set_function_attributes(**kwargs):
 
 def normalize_townname(townname):
     return townname.replace("台", "臺")
+
+
+PROVINCES = ("臺灣省", "福建省")
+
+
+def split_townname(townname):
+    """Split a townname like "臺灣省宜蘭縣頭城鎮" into its city "宜蘭縣" and town "頭城鎮"."""
+    if not townname:
+        return None, None
+
+    townname = normalize_townname(townname)
+    for province in PROVINCES:
+        if townname.startswith(province):
+            townname = townname[len(province):]
+    return townname[:3], townname[3:] or None
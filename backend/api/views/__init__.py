@@ -1,4 +1,5 @@
 from .factories_cr import get_nearby_or_create_factories
+from .factories_batch_c import post_factories_batch
 from .factories_u import update_factory_attribute
 from .factory_report_record_r import get_factory_report
 from .image_c import post_image_url
@@ -7,3 +8,4 @@ from .statistics_r import get_factories_count_by_townname
 from .statistics_r import get_images_count_by_townname
 from .statistics_r import get_report_records_count_by_townname
 from .statistics_r import get_statistics_total
+from .factory_tile_r import get_factory_tile
@@ -0,0 +1,117 @@
+import logging
+import datetime
+import uuid
+
+from django.http import HttpResponse, JsonResponse
+from django.db import transaction
+from django_q.tasks import async_task
+from rest_framework.decorators import api_view
+
+from drf_yasg.utils import swagger_auto_schema
+from drf_yasg import openapi
+
+from .utils import _get_client_ip, _idempotent
+from ..cache import invalidate_factory_tiles
+from ..models import (
+    Factory,
+    Image,
+    ReportRecord,
+    refresh_factory_stats_rollups_of_factories,
+    refresh_factory_summaries,
+)
+from ..models.factory import next_display_numbers
+from ..serializers import FactorySerializer, serialize_factories
+from ..tasks import UPDATE_LANDCODES_CHUNK_SIZE
+
+LOGGER = logging.getLogger("django")
+
+MAX_BATCH_SIZE = 200
+
+
+@swagger_auto_schema(
+    method="post",
+    operation_summary="一次新增多筆工廠資料",
+    request_body=openapi.Schema(type=openapi.TYPE_ARRAY, items=openapi.Schema(type=openapi.TYPE_OBJECT)),
+    responses={200: openapi.Response("新增的工廠資料", FactorySerializer(many=True)), 400: "request failed"},
+    auto_schema=None
+)
+@api_view(["POST"])
+@_idempotent
+def post_factories_batch(request):
+    post_body = request.data
+    user_ip = _get_client_ip(request)
+
+    if not isinstance(post_body, list) or not 0 < len(post_body) <= MAX_BATCH_SIZE:
+        return HttpResponse(
+            f"Post body should be a list of 1 to {MAX_BATCH_SIZE} factories",
+            status=400,
+        )
+
+    serializer = FactorySerializer(data=post_body, many=True)
+    if not serializer.is_valid():
+        LOGGER.warning(f"{user_ip} : <serializer errors> ")
+        return JsonResponse(
+            serializer.errors,
+            status=400,
+            safe=False,
+        )
+
+    try:
+        # the canonical form, to match the keys of `images`
+        item_image_ids = [[str(uuid.UUID(str(image_id))) for image_id in item.get("images", [])] for item in post_body]
+    except (TypeError, ValueError):
+        LOGGER.warning(f"{user_ip} : <invalid image id> ")
+        return HttpResponse("please check if every image id is a valid UUID", status=400)
+    image_ids = [image_id for ids in item_image_ids for image_id in ids]
+    images = {str(image.id): image for image in Image.objects.only("id").filter(id__in=image_ids)}
+    if len(set(image_ids)) != len(image_ids) or len(images) != len(image_ids):
+        LOGGER.warning(f"{user_ip} : <please check if every image id exist> ")
+        return HttpResponse(
+            "please check if every image id exist and is used only once",
+            status=400,
+        )
+
+    status_time = datetime.datetime.now()
+    with transaction.atomic():
+        factories = Factory.objects.bulk_create(
+            Factory(
+                display_number=display_number,
+                name=item.get("name"),
+                lat=item["lat"],
+                lng=item["lng"],
+                factory_type=item.get("type"),
+                status_time=status_time,
+            )
+            for display_number, item in zip(next_display_numbers(len(post_body)), post_body)
+        )
+        report_records = ReportRecord.objects.bulk_create(
+            ReportRecord(
+                factory=factory,
+                user_ip=user_ip,
+                action_type="POST",
+                action_body=item,
+                nickname=item.get("nickname"),
+                contact=item.get("contact"),
+                others=item.get("others", ""),
+            )
+            for factory, item in zip(factories, post_body)
+        )
+        for factory, report_record, ids in zip(factories, report_records, item_image_ids):
+            for image_id in ids:
+                images[image_id].factory = factory
+                images[image_id].report_record = report_record
+        Image.objects.bulk_update(images.values(), ["factory", "report_record"])
+
+        factory_ids = [factory.id for factory in factories]
+        refresh_factory_summaries(factory_ids)
+        refresh_factory_stats_rollups_of_factories(factory_ids)
+        invalidate_factory_tiles(*[(factory.lat, factory.lng) for factory in factories])
+
+    LOGGER.info(f"{user_ip}: <Create {len(factories)} new factories> ids:{factory_ids}")
+    for idx in range(0, len(factory_ids), UPDATE_LANDCODES_CHUNK_SIZE):
+        chunk = factory_ids[idx:idx + UPDATE_LANDCODES_CHUNK_SIZE]
+        async_task("api.tasks.update_landcodes", [str(factory_id) for factory_id in chunk])
+    return JsonResponse(
+        serialize_factories(Factory.objects.filter(id__in=factory_ids).order_by("display_number")),
+        safe=False,
+    )
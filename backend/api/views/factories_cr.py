@@ -8,13 +8,26 @@ from django.utils.datastructures import MultiValueDictKeyError
 from django.db import transaction
 from django_q.tasks import async_task
 from rest_framework.decorators import api_view
-from django.db.models import Max
 
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 
-from .utils import _get_nearby_factories, _get_client_ip
-from ..models import Factory, Image, ReportRecord
+from .utils import (
+    _conditional_get,
+    _get_client_ip,
+    _get_factories_watermark,
+    _get_nearby_factory_data,
+    _idempotent,
+    _with_serialized_time,
+)
+from ..cache import invalidate_factory_tiles
+from ..models import (
+    Factory,
+    Image,
+    ReportRecord,
+    refresh_factory_stats_rollups_of_factories,
+    refresh_factory_summaries,
+)
 from ..serializers import FactorySerializer
 
 LOGGER = logging.getLogger("django")
@@ -67,14 +80,14 @@ def _handle_get_factories(request):
             status=400,
         )
 
-    nearby_factories = _get_nearby_factories(
+    nearby_factories = _get_nearby_factory_data(
         latitude=latitude,
         longitude=longitude,
         radius=radius,
+        watermark=getattr(request, "watermark", None),
     )
 
-    serializer = FactorySerializer(nearby_factories, many=True)
-    return JsonResponse(serializer.data, safe=False)
+    return JsonResponse(nearby_factories, safe=False)
 
 
 def _handle_create_factory(request):
@@ -99,15 +112,12 @@ def _handle_create_factory(request):
             status=400,
         )
 
-    num = Factory.objects.aggregate(Max("display_number"))
-
     new_factory_field = {
         "name": post_body["name"],
         "lat": post_body["lat"],
         "lng": post_body["lng"],
         "factory_type": post_body.get("type"),
         "status_time": datetime.datetime.now(),
-        "display_number": num["display_number__max"] + 1,
     }
 
     new_report_record_field = {
@@ -128,6 +138,10 @@ def _handle_create_factory(request):
         Image.objects.filter(id__in=image_ids).update(
             factory=new_factory, report_record=report_record
         )
+        refresh_factory_summaries([new_factory.id])
+        refresh_factory_stats_rollups_of_factories([new_factory.id])
+        invalidate_factory_tiles((new_factory.lat, new_factory.lng))
+    new_factory.refresh_from_db(fields=Factory.SUMMARY_FIELDS)
     serializer = FactorySerializer(new_factory)
     LOGGER.info(
         f"{user_ip}: <Create new factory> at {(post_body['lng'], post_body['lat'])} "
@@ -174,6 +188,8 @@ def _handle_create_factory(request):
     auto_schema=None
 )
 @api_view(["GET", "POST"])
+@_idempotent
+@_conditional_get(_with_serialized_time(_get_factories_watermark))
 def get_nearby_or_create_factories(request):
     if request.method == "GET":
         return _handle_get_factories(request)
@@ -9,10 +9,17 @@ from django.http import JsonResponse, HttpResponse
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 
+from ..cache import invalidate_factory_tiles
 from ..models import Factory, ReportRecord
 from ..serializers import FactorySerializer
+from ..utils import split_townname
 
-from .utils import _get_client_ip
+from .utils import (
+    _conditional_get,
+    _get_client_ip,
+    _get_factory_watermark,
+    _with_serialized_time,
+)
 
 from django.core.exceptions import ObjectDoesNotExist
 
@@ -58,6 +65,8 @@ def _handle_update_factory_attributes(request, factory_id):
 
     if "status" in put_body:
         updated_factory_fields["status_time"] = datetime.now()
+    if "townname" in put_body:
+        updated_factory_fields["city"], updated_factory_fields["town"] = split_townname(put_body["townname"])
 
     new_report_record_fields = {
         "factory_id": factory_id,
@@ -70,8 +79,10 @@ def _handle_update_factory_attributes(request, factory_id):
 
     with transaction.atomic():
         Factory.objects.filter(pk=factory_id).update(**updated_factory_fields)
+        # also refreshes the summaries, and the rollups of the factory's previous and current town
         ReportRecord.objects.create(**new_report_record_fields)
         factory = Factory.objects.get(pk=factory_id)
+        invalidate_factory_tiles((factory.lat, factory.lng))
 
     serializer = FactorySerializer(factory)
     LOGGER.info(f"{client_ip} : <Update factory> {factory_id} {put_body} ")
@@ -91,6 +102,7 @@ def _handle_update_factory_attributes(request, factory_id):
     auto_schema=None
 )
 @api_view(["PUT", "GET"])
+@_conditional_get(_with_serialized_time(_get_factory_watermark))
 def update_factory_attribute(request, factory_id):
     if request.method == "PUT":
         return _handle_update_factory_attributes(request, factory_id)
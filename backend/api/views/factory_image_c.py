@@ -6,9 +6,10 @@ from django.http import HttpResponse, JsonResponse
 from django.db import transaction
 from rest_framework.decorators import api_view
 
+from api.cache import invalidate_factory_tiles
 from api.models import Image, Factory, ReportRecord
 from api.serializers import ImageSerializer
-from .utils import _get_client_ip
+from .utils import _get_client_ip, _idempotent
 
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
@@ -39,6 +40,7 @@ LOGGER = logging.getLogger("django")
     auto_schema=None
 )
 @api_view(["POST"])
+@_idempotent
 def post_factory_image_url(request, factory_id):
     user_ip = _get_client_ip(request)
 
@@ -78,7 +80,7 @@ def post_factory_image_url(request, factory_id):
         orig_time = None
 
     with transaction.atomic():
-        factory = Factory.objects.only("id").get(pk=factory_id)
+        factory = Factory.objects.only("id", "lat", "lng").get(pk=factory_id)
         report_record = ReportRecord.objects.create(
             factory=factory,
             user_ip=user_ip,
@@ -95,6 +97,7 @@ def post_factory_image_url(request, factory_id):
             report_record=report_record,
             factory=factory,
         )
+        invalidate_factory_tiles((factory.lat, factory.lng))
 
     img_serializer = ImageSerializer(image)
     return JsonResponse(img_serializer.data, safe=False)
@@ -7,6 +7,7 @@ from drf_yasg import openapi
 
 from ..models import ReportRecord
 from ..serializers import ReportRecordSerializer
+from .utils import _conditional_get, _get_factory_watermark
 
 
 @swagger_auto_schema(
@@ -17,6 +18,7 @@ from ..serializers import ReportRecordSerializer
     },
 )
 @api_view(["GET"])
+@_conditional_get(_get_factory_watermark)
 def get_factory_report(request, factory_id):
     if request.method == "GET":
         report_records = ReportRecord.objects.filter(factory__id=factory_id).order_by("created_at")
@@ -0,0 +1,153 @@
+import math
+from collections import defaultdict
+
+from django.conf import settings
+from django.db.models import Avg, Count, F, FloatField
+from django.db.models.functions import Cos, Floor, Ln, Radians, Tan
+from django.http import HttpResponse, JsonResponse
+from drf_yasg import openapi
+from drf_yasg.utils import swagger_auto_schema
+from rest_framework.decorators import api_view
+
+from ..cache import (
+    FACTORY_TILE_CLUSTERS_KEY,
+    FACTORY_TILE_MARKERS_KEY,
+    get_factory_tile_payloads,
+)
+from ..geo import MAX_ZOOM, lnglat_to_tile, tile_bounds
+from ..models import Factory
+from .utils import _conditional_get, _get_factories_watermark
+
+# clusters of a tile are the cells of an 8x8 grid, i.e. the tiles 3 zoom levels deeper
+CLUSTER_GRID_ZOOM_OFFSET = 3
+
+
+def _factories_in_tiles(zoom, tiles):
+    """Return the factories inside the bounding box of every tile."""
+    bounds = [tile_bounds(zoom, x, y) for x, y in tiles]
+    return Factory.objects.filter(
+        lat__range=(min(bound[0] for bound in bounds), max(bound[1] for bound in bounds)),
+        lng__range=(min(bound[2] for bound in bounds), max(bound[3] for bound in bounds)),
+    )
+
+
+def _load_cluster_payloads(zoom, tiles):
+    """Aggregate the factories of the tiles into grid cells with a single GROUP BY query."""
+    n = 2 ** (zoom + CLUSTER_GRID_ZOOM_OFFSET)
+    # the same projection as `lnglat_to_tile`, asinh(tan(lat)) = ln(tan(lat) + sec(lat))
+    cell_x = Floor((F("lng") + 180.0) / 360.0 * n, output_field=FloatField())
+    cell_y = Floor(
+        (1.0 - Ln(Tan(Radians("lat")) + 1.0 / Cos(Radians("lat"))) / math.pi) / 2.0 * n,
+        output_field=FloatField(),
+    )
+    cells = (
+        _factories_in_tiles(zoom, tiles)
+        .annotate(cell_x=cell_x, cell_y=cell_y)
+        .values("cell_x", "cell_y")
+        .annotate(count=Count("id"), lat=Avg("lat"), lng=Avg("lng"))
+        .order_by("cell_x", "cell_y")
+    )
+
+    payloads = {tile: [] for tile in tiles}
+    for cell in cells:
+        tile = (
+            int(cell["cell_x"]) >> CLUSTER_GRID_ZOOM_OFFSET,
+            int(cell["cell_y"]) >> CLUSTER_GRID_ZOOM_OFFSET,
+        )
+        if tile in payloads:
+            payloads[tile].append({
+                "lat": cell["lat"],
+                "lng": cell["lng"],
+                "count": cell["count"],
+            })
+    return payloads
+
+
+def _load_marker_payloads(zoom, tiles):
+    """Return the position and identity of every factory in the tiles."""
+    factories = (
+        _factories_in_tiles(zoom, tiles)
+        .order_by("display_number")
+        .values_list("id", "display_number", "lat", "lng", "name", "factory_type")
+    )
+
+    payloads = defaultdict(list)
+    for factory_id, display_number, lat, lng, name, factory_type in factories:
+        payloads[lnglat_to_tile(lng, lat, zoom)].append({
+            "id": factory_id,
+            "display_number": display_number,
+            "lat": lat,
+            "lng": lng,
+            "name": name,
+            "type": factory_type,
+        })
+    return {tile: payloads[tile] for tile in tiles}
+
+
+@swagger_auto_schema(
+    method="get",
+    operation_summary="取得地圖圖磚內的工廠，低縮放等級時為聚合後的數量與中心點",
+    responses={
+        200: openapi.Response(
+            "圖磚內的工廠或聚合",
+            openapi.Schema(
+                type=openapi.TYPE_OBJECT,
+                properties={
+                    "zoom": openapi.Schema(type=openapi.TYPE_INTEGER),
+                    "x": openapi.Schema(type=openapi.TYPE_INTEGER),
+                    "y": openapi.Schema(type=openapi.TYPE_INTEGER),
+                    "clusters": openapi.Schema(
+                        type=openapi.TYPE_ARRAY,
+                        description=f"zoom < {settings.FACTORY_TILE_MARKER_MIN_ZOOM} 時回傳",
+                        items=openapi.Schema(
+                            type=openapi.TYPE_OBJECT,
+                            properties={
+                                "lat": openapi.Schema(type=openapi.TYPE_NUMBER, description="中心點緯度"),
+                                "lng": openapi.Schema(type=openapi.TYPE_NUMBER, description="中心點經度"),
+                                "count": openapi.Schema(type=openapi.TYPE_INTEGER, description="工廠數量"),
+                            },
+                        ),
+                    ),
+                    "factories": openapi.Schema(
+                        type=openapi.TYPE_ARRAY,
+                        description=f"zoom >= {settings.FACTORY_TILE_MARKER_MIN_ZOOM} 時回傳",
+                        items=openapi.Schema(
+                            type=openapi.TYPE_OBJECT,
+                            properties={
+                                "id": openapi.Schema(type=openapi.TYPE_STRING),
+                                "display_number": openapi.Schema(type=openapi.TYPE_INTEGER),
+                                "lat": openapi.Schema(type=openapi.TYPE_NUMBER),
+                                "lng": openapi.Schema(type=openapi.TYPE_NUMBER),
+                                "name": openapi.Schema(type=openapi.TYPE_STRING),
+                                "type": openapi.Schema(type=openapi.TYPE_STRING),
+                            },
+                        ),
+                    ),
+                },
+            ),
+        ),
+        400: "request failed",
+    },
+)
+@api_view(["GET"])
+@_conditional_get(_get_factories_watermark)
+def get_factory_tile(request, zoom, x, y):
+    if not 0 <= zoom <= MAX_ZOOM:
+        return HttpResponse(f"zoom should be within 0 to {MAX_ZOOM}, but got {zoom}", status=400)
+    if not (0 <= x < 2 ** zoom and 0 <= y < 2 ** zoom):
+        return HttpResponse(f"Tile ({x}, {y}) does not exist at zoom {zoom}", status=400)
+
+    if zoom < settings.FACTORY_TILE_MARKER_MIN_ZOOM:
+        field, load_payloads, payload_key = "clusters", _load_cluster_payloads, FACTORY_TILE_CLUSTERS_KEY
+    else:
+        field, load_payloads, payload_key = "factories", _load_marker_payloads, FACTORY_TILE_MARKERS_KEY
+
+    if settings.FACTORY_TILE_CACHE_TIMEOUT <= 0:
+        payloads = load_payloads(zoom, [(x, y)])
+    else:
+        # keyed by the watermark too, the tile generations of other processes are unknown here
+        payloads = get_factory_tile_payloads(
+            zoom, [(x, y)], load_payloads, payload_key, watermark=getattr(request, "watermark", None)
+        )
+
+    return JsonResponse({"zoom": zoom, "x": x, "y": y, field: payloads[(x, y)]})
@@ -9,7 +9,7 @@ from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 
 from api.models import Image
-from .utils import _get_client_ip
+from .utils import _get_client_ip, _idempotent
 
 LOGGER = logging.getLogger("django")
 
@@ -45,6 +45,7 @@ LOGGER = logging.getLogger("django")
     auto_schema=None
 )
 @api_view(["POST"])
+@_idempotent
 def post_image_url(request):
     user_ip = _get_client_ip(request)
 
@@ -4,22 +4,33 @@ from drf_yasg.utils import swagger_auto_schema
 from rest_framework.decorators import api_view
 import datetime
 import time
-from django.db.models import Q
+from collections import defaultdict
 
-from ..models import Factory, Document, Image, ReportRecord
+from django.db.models import Sum
+
+from ..models import FactoryStatsRollup
 from ..models.document import DocumentDisplayStatusEnum
-from ..utils import normalize_townname
+from ..utils import normalize_townname, split_townname
+from .utils import _cache_statistics, _conditional_get, _get_factories_watermark
 from .zipcode import ZIP_CODE
 
-def _generate_factories_query_set(townname, source, display_status):
-    # display_status
-    if display_status is not None:
+# display_status of the latest document -> the status counted by `get_statistics_total`
+TOTAL_DISPLAY_STATUS_LABELS = {
+    DocumentDisplayStatusEnum.INDICES["已檢舉"]: "未處理",
+    DocumentDisplayStatusEnum.INDICES["已排程稽查"]: "處理中",
+    DocumentDisplayStatusEnum.INDICES["陳述意見期"]: "處理中",
+    DocumentDisplayStatusEnum.INDICES["已勒令停工"]: "處理中",
+    DocumentDisplayStatusEnum.INDICES["已排程拆除"]: "處理中",
+    DocumentDisplayStatusEnum.INDICES["已發函斷電"]: "已斷電",
+    DocumentDisplayStatusEnum.INDICES["已拆除"]: "已拆除",
+}
 
-        docs = Document.objects\
-            .only("id", "factory_id")\
-            .order_by("factory_id", "-created_at")\
-            .distinct('factory_id')
 
+def _generate_rollups_query_set(townname, source, display_status):
+    queryset = FactoryStatsRollup.objects.all()
+
+    # display_status of the latest document
+    if display_status is not None:
         display_status_options = map((lambda item: item[1]),DocumentDisplayStatusEnum.CHOICES)
         if display_status == "處理中":
             display_status = [
@@ -28,7 +39,7 @@ def _generate_factories_query_set(townname, source, display_status):
                 DocumentDisplayStatusEnum.INDICES["已勒令停工"],
                 DocumentDisplayStatusEnum.INDICES["已排程拆除"],
             ]
-            docs = docs.filter(display_status__in=display_status)
+            queryset = queryset.filter(display_status__in=display_status)
         else:
             if display_status not in display_status_options:
                 display_status_choices = ",".join(display_status_options)
@@ -37,16 +48,14 @@ def _generate_factories_query_set(townname, source, display_status):
                     status=400
                 )
             display_status = DocumentDisplayStatusEnum.INDICES[display_status]
-            docs = docs.filter(display_status=display_status)
-
-        factory_id_list = list(map(lambda item: item.factory_id, docs))
-        queryset = Factory.objects.filter(id__in=factory_id_list)
-    else:
-        queryset = Factory.objects
+            queryset = queryset.filter(display_status=display_status)
 
     # townname
     if townname:
-        queryset = queryset.filter(Q(townname__startswith=townname) | Q(townname__startswith=f"臺灣省{townname}"))
+        city, town = split_townname(townname)
+        queryset = queryset.filter(city=city)
+        if town:
+            queryset = queryset.filter(town=town)
 
     # source
     if source is not None:
@@ -54,6 +63,7 @@ def _generate_factories_query_set(townname, source, display_status):
 
     return queryset
 
+
 @swagger_auto_schema(
     method="get",
     operation_summary="取得某個地區的工廠數量",
@@ -159,6 +169,8 @@ def _generate_factories_query_set(townname, source, display_status):
     ]
 )
 @api_view(["GET"])
+@_conditional_get(_get_factories_watermark)
+@_cache_statistics
 def get_factories_count_by_townname(request):
     townname = request.GET.get("townname", None)
     if townname:
@@ -199,15 +211,26 @@ def get_factories_count_by_townname(request):
             if town:
                 level = "town"
 
+    rollups_queryset = _generate_rollups_query_set(None, source, display_status)
+    if isinstance(rollups_queryset, HttpResponse):
+        return rollups_queryset  # invalid display_status
+    information_by_city = _get_factories_information_by_city(rollups_queryset, display_status)
+
     # all
-    result = _get_factories_information(None, source, display_status)
+    result = _sum_factories_information(
+        information
+        for city_information in information_by_city.values()
+        for information in city_information.values()
+    )
     if level is None:
         return JsonResponse(result)
 
     # cities
     result["cities"] = {}
     for city in cities:
-        result["cities"][city] = _get_factories_information(city, source, display_status)
+        result["cities"][city] = _sum_factories_information(
+            information_by_city.get(city, {}).values()
+        )
 
     if level == "city":
         return JsonResponse(result)
@@ -224,31 +247,49 @@ def get_factories_count_by_townname(request):
         # towns
         result["cities"][city]["towns"] = {}
         for item in towns:
-            full_town_name = f"{city}{item}"
-            data = _get_factories_information(full_town_name, source, display_status)
+            information = information_by_city.get(city, {}).get(item)
+            data = _sum_factories_information([information] if information else [])
             result["cities"][city]["towns"][item] = data
 
     return JsonResponse(result)
 
 
-def _get_factories_information(townname, source, display_status):
-    factories_queryset = _generate_factories_query_set(townname, source, display_status)
-    n_factories = factories_queryset.count()
+def _get_factories_information_by_city(rollups_queryset, display_status):
+    """Sum the counts of factories, documents and report records per city and town.
 
-    id_list = factories_queryset.values_list('id', flat=True)
-    report_records_queryset = ReportRecord.objects.prefetch_related('factory').filter(factory__in=id_list)
-    if display_status:
-        # Because the factories are filtered by document, so the number of factories should be equal to number of documents
-        n_documents = n_factories
-    else:
-        documents_queryset = Document.objects.prefetch_related('factory').filter(factory__in=id_list)
-        n_documents = documents_queryset.count()
-
-    return {
-        "factories": n_factories,
-        "documents": n_documents,
-        "report_records": report_records_queryset.count()
-    }
+    Return {city: {town: counts}}.
+    """
+    information_by_city = defaultdict(dict)
+    rows = (
+        rollups_queryset
+        .values("city", "town")
+        .annotate(
+            factories=Sum("factories"),
+            documents=Sum("documents"),
+            report_records=Sum("report_records"),
+        )
+        .order_by()
+    )
+    for row in rows:
+        information = {
+            "factories": row["factories"],
+            "documents": row["documents"],
+            "report_records": row["report_records"],
+        }
+        if display_status:
+            # Because the factories are filtered by document, so the number of factories should be equal to number of documents
+            information["documents"] = information["factories"]
+        information_by_city[row["city"]][row["town"]] = information
+
+    return information_by_city
+
+
+def _sum_factories_information(informations):
+    result = {"factories": 0, "documents": 0, "report_records": 0}
+    for information in informations:
+        for key in result:
+            result[key] += information[key]
+    return result
 
 
 @swagger_auto_schema(
@@ -309,6 +350,8 @@ def _get_factories_information(townname, source, display_status):
     ]
 )
 @api_view(["GET"])
+@_conditional_get(_get_factories_watermark)
+@_cache_statistics
 def get_images_count_by_townname(request):
     townname = request.GET.get("townname", None)
     if townname:
@@ -316,12 +359,12 @@ def get_images_count_by_townname(request):
     source = request.GET.get("source", None)
     display_status = request.GET.get("display_status", None)
 
-    factories_queryset = _generate_factories_query_set(townname, source, display_status)
-    id_list = factories_queryset.values_list('id', flat=True)
-    queryset = Image.objects.prefetch_related('factory').filter(factory__id__in=id_list)
+    rollups_queryset = _generate_rollups_query_set(townname, source, display_status)
+    if isinstance(rollups_queryset, HttpResponse):
+        return rollups_queryset  # invalid display_status
 
     return JsonResponse({
-        "count": queryset.count()
+        "count": rollups_queryset.aggregate(count=Sum("images"))["count"] or 0
     })
 
 @swagger_auto_schema(
@@ -382,6 +425,8 @@ def get_images_count_by_townname(request):
     ]
 )
 @api_view(["GET"])
+@_conditional_get(_get_factories_watermark)
+@_cache_statistics
 def get_report_records_count_by_townname(request):
     townname = request.GET.get("townname", None)
     if townname:
@@ -389,12 +434,12 @@ def get_report_records_count_by_townname(request):
     source = request.GET.get("source", None)
     display_status = request.GET.get("display_status", None)
 
-    factories_queryset = _generate_factories_query_set(townname, source, display_status)
-    id_list = factories_queryset.values_list('id', flat=True)
-    queryset = ReportRecord.objects.prefetch_related('factory').filter(factory__in=id_list)
+    rollups_queryset = _generate_rollups_query_set(townname, source, display_status)
+    if isinstance(rollups_queryset, HttpResponse):
+        return rollups_queryset  # invalid display_status
 
     return JsonResponse({
-        "count": queryset.count()
+        "count": rollups_queryset.aggregate(count=Sum("report_records"))["count"] or 0
     })
 
 
@@ -455,47 +500,33 @@ def get_report_records_count_by_townname(request):
     },
 )
 @api_view(["GET"])
+@_conditional_get(_get_factories_watermark)
+@_cache_statistics
 def get_statistics_total(request):
     result = {}
-    cities = ZIP_CODE.keys()
-    for city in cities:
+    for city in ZIP_CODE.keys():
         city = city.replace("台", "臺")
-        result[city] = {}
-
-        # factories
-        factories = Factory.objects.filter(Q(townname__startswith=city) | Q(townname__startswith=f"臺灣省{city}"))
-        result[city]["factories"] = factories.count()
-
-        # report records
-        factory_id_list = factories.values_list('id', flat=True)
-        report_records = ReportRecord.objects.prefetch_related('factory').filter(factory__id__in=factory_id_list).distinct("factory_id")
-        result[city]["report_records"] = report_records.count()
-
-        # display_status
-        docs = Document.objects.prefetch_related("factory")\
-                               .order_by("factory__id", "-created_at")\
-                               .distinct('factory__id')\
-                               .filter(factory__id__in=factory_id_list)
-
-        result[city]["documents"] = docs.count()
-
-        ## 處理中
-        result[city]["未處理"] = 0
-        result[city]["處理中"] = 0
-        result[city]["已斷電"] = 0
-        result[city]["已拆除"] = 0
-
-        for doc in docs:
-            if doc.display_status == DocumentDisplayStatusEnum.INDICES["已檢舉"]:
-                result[city]["未處理"] += 1
-            elif doc.display_status == DocumentDisplayStatusEnum.INDICES["已排程稽查"] or \
-                 doc.display_status == DocumentDisplayStatusEnum.INDICES["陳述意見期"] or \
-                 doc.display_status == DocumentDisplayStatusEnum.INDICES["已勒令停工"] or \
-                 doc.display_status == DocumentDisplayStatusEnum.INDICES["已排程拆除"]:
-                result[city]["處理中"] += 1
-            elif doc.display_status == DocumentDisplayStatusEnum.INDICES["已發函斷電"]:
-                result[city]["已斷電"] += 1
-            elif doc.display_status == DocumentDisplayStatusEnum.INDICES["已拆除"]:
-                result[city]["已拆除"] += 1
+        result[city] = {"factories": 0, "report_records": 0, "documents": 0}
+        result[city].update({label: 0 for label in TOTAL_DISPLAY_STATUS_LABELS.values()})
+
+    rows = (
+        FactoryStatsRollup.objects
+        .values("city", "display_status")
+        .annotate(factories=Sum("factories"), reported_factories=Sum("reported_factories"))
+        .order_by()
+    )
+    for row in rows:
+        if row["city"] not in result:
+            continue
+
+        city_result = result[row["city"]]
+        city_result["factories"] += row["factories"]
+        city_result["report_records"] += row["reported_factories"]
+        if row["display_status"] is not None:
+            city_result["documents"] += row["factories"]
+
+        label = TOTAL_DISPLAY_STATUS_LABELS.get(row["display_status"])
+        if label is not None:
+            city_result[label] += row["factories"]
 
     return JsonResponse(result)
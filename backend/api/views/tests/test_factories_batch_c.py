@@ -0,0 +1,132 @@
+from unittest.mock import patch
+from uuid import uuid4
+
+from django.core.cache import cache
+from django.test import TestCase, Client
+
+from ...models import Factory, ReportRecord, Image
+
+
+class PostFactoriesBatchViewTestCase(TestCase):
+    def setUp(self):
+        self.cli = Client()
+        cache.clear()
+
+    def post_batch(self, request_body):
+        return self.cli.post("/api/factories/batch", data=request_body, content_type="application/json")
+
+    def test_create_factories_db_status_correct(self):
+        im1 = Image.objects.create(image_path="https://i.imgur.com/RxArJUc.png")
+        im2 = Image.objects.create(image_path="https://imgur.dcard.tw/BB2L2LT.jpg")
+        request_body = [
+            {
+                "name": "a new factory",
+                "type": "2-3",
+                "images": [str(im1.id), str(im2.id)],
+                "lat": 23.234,
+                "lng": 120.1,
+                "nickname": "路過的家庭主婦",
+                "contact": "07-7533967",
+            },
+            {
+                "name": "another new factory",
+                "lat": 23.5,
+                "lng": 120.2,
+                "others": "這個工廠實在太臭啦",
+            },
+        ]
+
+        with patch("api.views.factories_batch_c.async_task") as mock_async_task:
+            resp = self.post_batch(request_body)
+
+        self.assertEqual(resp.status_code, 200, resp.content)
+        factory_ids = [factory["id"] for factory in resp.json()]
+        self.assertEqual([factory["name"] for factory in resp.json()], ["a new factory", "another new factory"])
+        self.assertEqual(resp.json()[0]["images"][0]["id"], str(im1.id))
+        self.assertEqual(resp.json()[1]["images"], [])
+        self.assertEqual(
+            len({factory.display_number for factory in Factory.objects.filter(id__in=factory_ids)}),
+            2,
+        )
+        mock_async_task.assert_called_once()
+        self.assertEqual(mock_async_task.call_args[0][0], "api.tasks.update_landcodes")
+
+        for factory_id, item in zip(factory_ids, request_body):
+            report_record = ReportRecord.objects.get(factory_id=factory_id)
+            self.assertEqual(report_record.action_type, "POST")
+            self.assertEqual(report_record.action_body, item)
+            self.assertEqual(report_record.nickname, item.get("nickname"))
+            self.assertEqual(report_record.others, item.get("others", ""))
+            self.assertEqual(
+                {str(image.id) for image in Image.objects.filter(report_record=report_record)},
+                set(item.get("images", [])),
+            )
+
+        factory = Factory.objects.get(pk=factory_ids[0])
+        self.assertTrue(factory.data_complete)
+        self.assertIsNotNone(factory.reported_at)
+
+    @patch("api.views.factories_batch_c.UPDATE_LANDCODES_CHUNK_SIZE", 5)
+    def test_look_up_landcodes_in_chunks(self):
+        request_body = [{"name": f"factory {idx}", "lat": 23.234, "lng": 120.1} for idx in range(12)]
+
+        with patch("api.views.factories_batch_c.async_task") as mock_async_task:
+            resp = self.post_batch(request_body)
+
+        self.assertEqual(resp.status_code, 200, resp.content)
+        chunks = [call[0][1] for call in mock_async_task.call_args_list]
+        self.assertEqual([len(chunk) for chunk in chunks], [5, 5, 2])
+        self.assertEqual(
+            sorted(factory_id for chunk in chunks for factory_id in chunk),
+            sorted(factory["id"] for factory in resp.json()),
+        )
+
+    def test_create_factories_raise_if_any_item_invalid(self):
+        factory_count = Factory.objects.count()
+        resp = self.post_batch([
+            {"name": "in Taiwan", "lat": 23.234, "lng": 120.1},
+            {"name": "not in Taiwan", "lat": 23.234, "lng": 10},
+        ])
+
+        self.assertEqual(resp.status_code, 400)
+        self.assertEqual(resp.json()[0], {})
+        self.assertIn("lng", resp.json()[1])
+        self.assertEqual(Factory.objects.count(), factory_count)
+
+    def test_create_factories_raise_if_image_id_not_exist_or_reused(self):
+        factory_count = Factory.objects.count()
+        im1 = Image.objects.create(image_path="https://i.imgur.com/RxArJUc.png")
+
+        for images in ([[str(im1.id)], [str(uuid4())]], [[str(im1.id)], [str(im1.id)]]):
+            resp = self.post_batch([
+                {"name": "a new factory", "lat": 23.234, "lng": 120.1, "images": images[0]},
+                {"name": "another new factory", "lat": 23.5, "lng": 120.2, "images": images[1]},
+            ])
+            self.assertEqual(resp.status_code, 400)
+
+        self.assertEqual(Factory.objects.count(), factory_count)
+
+    def test_create_factories_with_non_canonical_image_ids(self):
+        im1 = Image.objects.create(image_path="https://i.imgur.com/RxArJUc.png")
+
+        with patch("api.views.factories_batch_c.async_task"):
+            resp = self.post_batch([{"name": "a new factory", "lat": 23.234, "lng": 120.1, "images": [str(im1.id).upper()]}])
+        self.assertEqual(resp.status_code, 200, resp.content)
+        self.assertEqual(resp.json()[0]["images"][0]["id"], str(im1.id))
+
+        resp = self.post_batch([{"name": "a new factory", "lat": 23.234, "lng": 120.1, "images": ["not an uuid"]}])
+        self.assertEqual(resp.status_code, 400)
+
+    def test_create_factories_without_name(self):
+        with patch("api.views.factories_batch_c.async_task"):
+            resp = self.post_batch([
+                {"name": "a new factory", "lat": 23.234, "lng": 120.1},
+                {"lat": 23.5, "lng": 120.2},
+            ])
+
+        self.assertEqual(resp.status_code, 200, resp.content)
+        self.assertEqual([factory["name"] for factory in resp.json()], ["a new factory", None])
+
+    def test_create_factories_raise_if_body_not_list(self):
+        self.assertEqual(self.post_batch({"name": "a new factory", "lat": 23.234, "lng": 120.1}).status_code, 400)
+        self.assertEqual(self.post_batch([]).status_code, 400)
@@ -71,6 +71,18 @@ class PutUpdateFactoryAttribute(TestCase):
         self.assertEqual(report_records[0].contact, "0800092000")
         self.assertEqual(report_records[0].others, "這工廠讓我坐骨神經痛")
 
+    def test_update_factory_townname_should_split_city_and_town(self):
+        cli = Client()
+        resp = cli.put(
+            f"/api/factories/{self.factory.id}",
+            data={"townname": "臺灣省宜蘭縣頭城鎮"},
+            content_type="application/json",
+        )
+        self.assertEqual(resp.status_code, 200)
+
+        factory = Factory.objects.get(pk=self.factory.id)
+        self.assertEqual((factory.city, factory.town), ("宜蘭縣", "頭城鎮"))
+
     def test_update_factory_status(self):
         cli = Client()
         put_body = {
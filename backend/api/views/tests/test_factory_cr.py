@@ -1,16 +1,22 @@
 import datetime
-from unittest.mock import patch
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import ANY, patch
 from uuid import uuid4
 
 from freezegun import freeze_time
-from django.test import TestCase, Client
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, Client
+from django.utils import timezone
 
 from ...models import Factory, ReportRecord, Image
+from ...serializers import serialize_factories
 
 
 class GetNearbyOrCreateFactoriesViewTestCase(TestCase):
     def setUp(self):
         self.cli = Client()
+        cache.clear()
 
     def test_get_nearby_factory_wrong_params(self):
 
@@ -39,7 +45,7 @@ class GetNearbyOrCreateFactoriesViewTestCase(TestCase):
 
     def test_get_nearby_factory_called_util_func_correctly(self):
 
-        with patch("api.views.factories_cr._get_nearby_factories") as mock_func:
+        with patch("api.views.factories_cr._get_nearby_factory_data", return_value=[]) as mock_func:
             lat = 23.12
             lng = 121.5566
             r = 0.5
@@ -49,6 +55,7 @@ class GetNearbyOrCreateFactoriesViewTestCase(TestCase):
                 latitude=lat,
                 longitude=lng,
                 radius=r,
+                watermark=ANY,
             )
 
     def test_get_nearby_factory_called_on_test_data(self):
@@ -135,6 +142,25 @@ class GetNearbyOrCreateFactoriesViewTestCase(TestCase):
             set(["None"]),
         )
 
+    def test_create_new_factory_replay_retry_with_idempotency_key(self):
+        request_body = {"name": "a new factory", "type": "2-3", "lat": 23.234, "lng": 120.1}
+
+        with patch("api.views.factories_cr.async_task") as mock_async_task:
+            responses = [
+                self.cli.post(
+                    "/api/factories",
+                    data=request_body,
+                    content_type="application/json",
+                    HTTP_IDEMPOTENCY_KEY="a4b5bd3e-3f1c-4a8c-9d63-3c0c4b7d7d6e",
+                )
+                for _ in range(3)
+            ]
+
+        self.assertEqual([resp.status_code for resp in responses], [200, 200, 200])
+        self.assertEqual(len({resp.json()["id"] for resp in responses}), 1)
+        self.assertEqual(ReportRecord.objects.filter(factory_id=responses[0].json()["id"]).count(), 1)
+        mock_async_task.assert_called_once()
+
     def test_create_new_factory_raise_if_image_id_not_exist(self):
         im1 = Image.objects.create(image_path="https://i.imgur.com/RxArJUc.png")
         Image.objects.create(image_path="https://imgur.dcard.tw/BB2L2LT.jpg")
@@ -219,3 +245,134 @@ class GetNearbyOrCreateFactoriesViewTestCase(TestCase):
 
         self.assertEqual(resp.status_code, 400)
         self.assertIn("type", resp.json())
+
+    def test_get_nearby_factory_served_from_tile_cache(self):
+        lat = 23.234
+        lng = 120.1
+        r = 1
+        resp = self.cli.get(f"/api/factories?lat={lat}&lng={lng}&range={r}")
+        self.assertEqual(len(resp.json()), 9)
+
+        # nearby circles share the cached tiles, only the ETag watermark is queried
+        with self.assertNumQueries(1):
+            resp = self.cli.get(f"/api/factories?lat={lat + 0.001}&lng={lng}&range={r}")
+        self.assertEqual(resp.status_code, 200)
+
+    def test_get_nearby_factory_same_result_with_and_without_tile_cache(self):
+        for lat, lng, r in [(23.234, 120.1, 1), (23.0, 120.3, 2), (23.0, 120.3, 0.5)]:
+            with self.settings(FACTORY_TILE_CACHE_TIMEOUT=0, MAX_FACTORY_PER_GET=10000):
+                expected = self.cli.get(f"/api/factories?lat={lat}&lng={lng}&range={r}").json()
+            with self.settings(MAX_FACTORY_PER_GET=10000):
+                cached = self.cli.get(f"/api/factories?lat={lat}&lng={lng}&range={r}").json()
+
+            self.assertCountEqual(
+                [factory["id"] for factory in cached],
+                [factory["id"] for factory in expected],
+            )
+
+    def test_get_nearby_factory_same_sample_with_and_without_tile_cache(self):
+        lat, lng, r = 23.234, 120.1, 5
+        with self.settings(FACTORY_TILE_CACHE_TIMEOUT=0, MAX_FACTORY_PER_GET=5):
+            expected = self.cli.get(f"/api/factories?lat={lat}&lng={lng}&range={r}").json()
+        with self.settings(MAX_FACTORY_PER_GET=5):
+            cached = self.cli.get(f"/api/factories?lat={lat}&lng={lng}&range={r}").json()
+
+        self.assertEqual(len(expected), 5)
+        self.assertEqual(
+            [factory["id"] for factory in cached],
+            [factory["id"] for factory in expected],
+        )
+
+    def test_get_nearby_factory_serialize_sampled_factories_only(self):
+        lat, lng, r = 23.234, 120.1, 5
+        with self.settings(MAX_FACTORY_PER_GET=5):
+            with patch("api.views.utils.serialize_factories", wraps=serialize_factories) as mock_func:
+                resp = self.cli.get(f"/api/factories?lat={lat}&lng={lng}&range={r}")
+        self.assertEqual(len(resp.json()), 5)
+        mock_func.assert_called_once()
+        self.assertEqual(mock_func.call_args[0][0].count(), 5)
+
+    def test_get_nearby_factory_cache_missed_after_write_of_another_process(self):
+        url = "/api/factories?lat=23.234&lng=120.1&range=1"
+        factory_id = self.cli.get(url).json()[0]["id"]
+
+        # a raw update skips the tile invalidation of this process, only the watermark moves
+        Factory.objects.filter(pk=factory_id).update(name="renamed", updated_at=timezone.now())
+        factories = self.cli.get(url).json()
+        self.assertEqual(next(factory["name"] for factory in factories if factory["id"] == factory_id), "renamed")
+
+    @patch("api.cache.transaction.on_commit", side_effect=lambda func: func())
+    def test_create_new_factory_invalidate_tile_cache(self, _):
+        lat = 23.234
+        lng = 120.1
+        resp = self.cli.get(f"/api/factories?lat={lat}&lng={lng}&range=1")
+        self.assertEqual(len(resp.json()), 9)
+
+        request_body = {
+            "name": "a new factory",
+            "images": [],
+            "others": "",
+            "lat": lat,
+            "lng": lng,
+            "nickname": "",
+        }
+        resp = self.cli.post("/api/factories", data=request_body, content_type="application/json")
+        self.assertEqual(resp.status_code, 200)
+
+        resp = self.cli.get(f"/api/factories?lat={lat}&lng={lng}&range=1")
+        self.assertEqual(len(resp.json()), 10)
+
+    def test_get_nearby_factory_not_modified(self):
+        url = "/api/factories?lat=23.234&lng=120.1&range=1"
+        resp = self.cli.get(url)
+        self.assertEqual(resp.status_code, 200)
+        etag = resp["ETag"]
+
+        with patch("api.views.factories_cr._get_nearby_factory_data") as mock_func:
+            resp = self.cli.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 304)
+        mock_func.assert_not_called()
+
+        request_body = {
+            "name": "a new factory",
+            "images": [],
+            "others": "",
+            "lat": 23.234,
+            "lng": 120.1,
+            "nickname": "",
+        }
+        resp = self.cli.post("/api/factories", data=request_body, content_type="application/json")
+        self.assertEqual(resp.status_code, 200)
+        self.assertNotIn("ETag", resp)
+
+        resp = self.cli.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 200)
+        self.assertNotEqual(resp["ETag"], etag)
+
+
+class CreateFactoriesConcurrentlyTestCase(TransactionTestCase):
+    # restore the seed factories loaded by the migrations after flushing
+    serialized_rollback = True
+
+    def create_factory(self, idx):
+        try:
+            resp = Client().post(
+                "/api/factories",
+                data={"name": f"factory {idx}", "type": "2-3", "lat": 23.234, "lng": 120.1},
+                content_type="application/json",
+            )
+            return resp.status_code, resp.json()["display_number"]
+        finally:
+            connection.close()
+
+    def test_create_new_factories_in_parallel_with_unique_display_numbers(self):
+        max_display_number = max(Factory.raw_objects.values_list("display_number", flat=True))
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(self.create_factory, range(32)))
+
+        self.assertEqual([status for status, _ in results], [200] * 32)
+        display_numbers = [display_number for _, display_number in results]
+        self.assertEqual(len(set(display_numbers)), 32)
+        # numbers may have gaps, but never reuse the ones taken before
+        self.assertGreater(min(display_numbers), max_display_number)
@@ -68,6 +68,18 @@ class PostFactoryImageViewTestCase(TestCase):
         self.assertEqual(report_record.nickname, self.nickname)
         self.assertEqual(report_record.contact, self.contact)
 
+    def test_image_upload_move_factory_watermark(self):
+        long_ago = datetime(2000, 1, 1, tzinfo=timezone.utc)
+        Factory.objects.filter(pk=self.factory.pk).update(updated_at=long_ago)
+
+        resp = self.cli.post(
+            f"/api/factories/{self.factory.id}/images", data=self.post_body, content_type="application/json"
+        )
+
+        self.assertEqual(resp.status_code, 200)
+        self.factory.refresh_from_db()
+        self.assertGreater(self.factory.updated_at, long_ago)
+
     def test_return_400_if_url_not_provided(self):
         wrong_body = {
             "Latitude": self.fake_lat,
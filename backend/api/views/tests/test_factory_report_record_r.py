@@ -63,3 +63,22 @@ class GetFactoryReportRecordTestCase(TestCase):
 
         rrs = resp.json()
         self.assertEqual([], [rr["id"] for rr in rrs])
+
+    def test_get_not_modified_until_new_report_record(self):
+        self.create_report_record(self.factory)
+        resp = self.cli.get(f"/api/factories/{self.factory.id}/report_records")
+        etag = resp["ETag"]
+
+        resp = self.cli.get(
+            f"/api/factories/{self.factory.id}/report_records",
+            HTTP_IF_NONE_MATCH=etag,
+        )
+        self.assertEqual(resp.status_code, 304)
+
+        self.create_report_record(self.factory)
+        resp = self.cli.get(
+            f"/api/factories/{self.factory.id}/report_records",
+            HTTP_IF_NONE_MATCH=etag,
+        )
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(len(resp.json()), 2)
@@ -0,0 +1,91 @@
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.test import TestCase, Client, override_settings
+from django.utils import timezone
+
+from ...geo import lnglat_to_tile
+from ...models import Factory
+
+
+class GetFactoryTileViewTestCase(TestCase):
+    def setUp(self):
+        self.cli = Client()
+        cache.clear()
+
+        self.taipei = [
+            Factory.objects.create(lat=25.0330, lng=121.5654, display_number=20001),
+            Factory.objects.create(lat=25.0340, lng=121.5664, display_number=20002),
+        ]
+        self.banqiao = Factory.objects.create(lat=25.0335, lng=121.40, display_number=20003)
+
+    def get_tile(self, zoom, lat, lng):
+        x, y = lnglat_to_tile(lng, lat, zoom)
+        return self.cli.get(f"/api/tiles/{zoom}/{x}/{y}")
+
+    def test_get_tile_wrong_params(self):
+        resp = self.cli.get("/api/tiles/19/0/0")
+        self.assertEqual(resp.status_code, 400)
+
+        resp = self.cli.get("/api/tiles/2/4/0")
+        self.assertEqual(resp.status_code, 400)
+
+    def test_get_tile_clusters_at_low_zoom(self):
+        resp = self.get_tile(10, 25.0335, 121.5)
+        self.assertEqual(resp.status_code, 200)
+
+        clusters = resp.json()["clusters"]
+        self.assertEqual(len(clusters), 2)
+        self.assertEqual(sum(cluster["count"] for cluster in clusters), 3)
+
+        taipei = next(cluster for cluster in clusters if cluster["count"] == 2)
+        self.assertAlmostEqual(taipei["lat"], 25.0335)
+        self.assertAlmostEqual(taipei["lng"], 121.5659)
+
+    def test_get_tile_markers_at_high_zoom(self):
+        resp = self.get_tile(16, 25.0330, 121.5654)
+        self.assertEqual(resp.status_code, 200)
+
+        factories = resp.json()["factories"]
+        self.assertEqual(
+            [factory["display_number"] for factory in factories],
+            [factory.display_number for factory in self.taipei],
+        )
+
+    def test_get_tile_from_cache_until_factory_created(self):
+        self.get_tile(10, 25.0335, 121.5)
+        # only the watermark is queried
+        with self.assertNumQueries(1):
+            resp = self.get_tile(10, 25.0335, 121.5)
+        self.assertEqual(sum(cluster["count"] for cluster in resp.json()["clusters"]), 3)
+
+        with patch("api.cache.transaction.on_commit", side_effect=lambda func: func()):
+            self.cli.post(
+                "/api/factories",
+                data={"name": "a new factory", "lat": 25.05, "lng": 121.5, "type": "2-1"},
+                content_type="application/json",
+            )
+
+        resp = self.get_tile(10, 25.0335, 121.5)
+        self.assertEqual(sum(cluster["count"] for cluster in resp.json()["clusters"]), 4)
+
+    def test_get_tile_cache_missed_after_write_of_another_process(self):
+        self.get_tile(16, 25.0330, 121.5654)
+
+        # a raw update skips the tile invalidation of this process, only the watermark moves
+        Factory.objects.filter(pk=self.taipei[0].pk).update(name="renamed", updated_at=timezone.now())
+        resp = self.get_tile(16, 25.0330, 121.5654)
+        self.assertEqual(resp.json()["factories"][0]["name"], "renamed")
+
+    def test_get_tile_not_modified(self):
+        resp = self.get_tile(16, 25.0330, 121.5654)
+        x, y = lnglat_to_tile(121.5654, 25.0330, 16)
+
+        resp = self.cli.get(f"/api/tiles/16/{x}/{y}", HTTP_IF_NONE_MATCH=resp["ETag"])
+        self.assertEqual(resp.status_code, 304)
+
+    @override_settings(FACTORY_TILE_CACHE_TIMEOUT=0)
+    def test_get_tile_without_cache(self):
+        resp = self.get_tile(16, 25.0335, 121.40)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual([factory["id"] for factory in resp.json()["factories"]], [str(self.banqiao.id)])
@@ -1,9 +1,12 @@
+import hashlib
+import json
 from datetime import datetime, timezone, timedelta
 
 from django.test import TestCase, Client
+from django.utils import timezone as django_timezone
 from freezegun import freeze_time
 
-from api.models import Image
+from api.models import IdempotencyKey, Image
 
 
 class PostImageUrlViewTestCase(TestCase):
@@ -60,3 +63,67 @@ class PostImageUrlViewTestCase(TestCase):
                 content_type="application/json",
             )
         self.assertEqual(resp.status_code, 400)
+
+    def test_post_image_url_replay_retry_with_idempotency_key(self):
+        request_body = {"url": "https://i.imgur.com/123456.png"}
+        resp = self.cli.post(
+            "/api/images", data=request_body, content_type="application/json", HTTP_IDEMPOTENCY_KEY="retry-1"
+        )
+        self.assertEqual(resp.status_code, 200)
+
+        retry = self.cli.post(
+            "/api/images", data=request_body, content_type="application/json", HTTP_IDEMPOTENCY_KEY="retry-1"
+        )
+        self.assertEqual(retry.status_code, 200)
+        self.assertEqual(retry["Idempotent-Replayed"], "true")
+        self.assertEqual(retry.json(), resp.json())
+        self.assertEqual(Image.objects.filter(image_path=request_body["url"]).count(), 1)
+
+        resp = self.cli.post(
+            "/api/images",
+            data={"url": "https://i.imgur.com/654321.png"},
+            content_type="application/json",
+            HTTP_IDEMPOTENCY_KEY="retry-1",
+        )
+        self.assertEqual(resp.status_code, 422)
+
+    def test_post_image_url_retry_failed_request_with_idempotency_key(self):
+        resp = self.cli.post("/api/images", data={}, content_type="application/json", HTTP_IDEMPOTENCY_KEY="retry-2")
+        self.assertEqual(resp.status_code, 400)
+
+        resp = self.cli.post(
+            "/api/images",
+            data={"url": "https://i.imgur.com/123456.png"},
+            content_type="application/json",
+            HTTP_IDEMPOTENCY_KEY="retry-2",
+        )
+        self.assertEqual(resp.status_code, 200)
+        self.assertNotIn("Idempotent-Replayed", resp)
+
+    def test_post_image_url_take_over_abandoned_idempotency_key(self):
+        request_body = {"url": "https://i.imgur.com/123456.png"}
+        # left pending by a worker killed in the middle of the request
+        record = IdempotencyKey.objects.create(
+            key="retry-3",
+            path="/api/images",
+            request_hash=hashlib.md5(json.dumps(request_body).encode()).hexdigest(),
+        )
+
+        resp = self.cli.post(
+            "/api/images", data=request_body, content_type="application/json", HTTP_IDEMPOTENCY_KEY="retry-3"
+        )
+        self.assertEqual(resp.status_code, 409)
+
+        IdempotencyKey.objects.filter(pk=record.pk).update(created_at=django_timezone.now() - timedelta(minutes=2))
+        resp = self.cli.post(
+            "/api/images", data=request_body, content_type="application/json", HTTP_IDEMPOTENCY_KEY="retry-3"
+        )
+        self.assertEqual(resp.status_code, 200)
+        self.assertNotIn("Idempotent-Replayed", resp)
+        self.assertEqual(IdempotencyKey.objects.get(pk=record.pk).status_code, 200)
+
+        retry = self.cli.post(
+            "/api/images", data=request_body, content_type="application/json", HTTP_IDEMPOTENCY_KEY="retry-3"
+        )
+        self.assertEqual(retry["Idempotent-Replayed"], "true")
+        self.assertEqual(retry.json(), resp.json())
@@ -1,20 +1,25 @@
 import datetime
+from unittest.mock import patch
 
-from django.test import TestCase, Client
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, Client, override_settings
+from django.test.utils import CaptureQueriesContext
 from freezegun import freeze_time
 
 from ...models import Image, Factory, Document, ReportRecord
 from ...models.document import DocumentDisplayStatusEnum
+from ...tasks import reconcile_factory_stats_rollups
 
 
 def update_landcode_with_custom_factory_model(factory_id):
-    Factory.objects.filter(pk=factory_id).update(
-        landcode="853-2",
-        sectcode="5404",
-        sectname="溪底寮段三寮灣小段",
-        towncode="D24",
-        townname="臺北市中山區",
-    )
+    factory = Factory.objects.get(pk=factory_id)
+    factory.landcode = "853-2"
+    factory.sectcode = "5404"
+    factory.sectname = "溪底寮段三寮灣小段"
+    factory.towncode = "D24"
+    factory.townname = "臺北市中山區"
+    factory.save()
 
 
 def create_factory(cli):
@@ -52,6 +57,12 @@ def create_factory(cli):
 class GetStatisticsTestCase(TestCase):
     def setUp(self):
         self.cli = Client()
+        cache.clear()
+
+        # the rollups are refreshed once committed, which never happens inside a TestCase
+        patcher = patch("api.models.factory_stats_rollup.transaction.on_commit", side_effect=lambda func: func())
+        patcher.start()
+        self.addCleanup(patcher.stop)
 
     def test_get_factory_statistics(self):
         cli = Client()
@@ -116,9 +127,10 @@ class GetStatisticsTestCase(TestCase):
             factory=Factory.objects.get(id=id_list[0]),
             display_status=1
         )
+        # only the latest document of a factory counts
         resp = self.cli.get("/api/statistics/factories?townname=台北市&display_status=已檢舉")
-        assert resp.json()["factories"] == 1
-        assert resp.json()["cities"]["臺北市"]["factories"] == 1
+        assert resp.json()["factories"] == 0
+        assert resp.json()["cities"]["臺北市"]["factories"] == 0
 
         resp = self.cli.get("/api/statistics/factories?townname=台北市&display_status=已排程稽查")
         assert resp.json()["factories"] == 1
@@ -276,3 +288,151 @@ class GetStatisticsTestCase(TestCase):
 
         count = resp.json()["臺北市"]["處理中"]
         assert count == 10, f"expect 10 but {count}"
+
+    def test_get_statistics_not_modified_until_document_created(self):
+        resp = self.cli.get("/api/statistics/total")
+        etag = resp["ETag"]
+        documents = resp.json()["臺南市"]["documents"]
+
+        resp = self.cli.get("/api/statistics/total", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 304)
+        self.assertEqual(resp.content, b"")
+
+        Document.objects.create(code="123456", factory=Factory.objects.filter(townname__startswith="臺南市").first())
+        resp = self.cli.get("/api/statistics/total", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json()["臺南市"]["documents"], documents + 1)
+
+    def test_get_factory_statistics_of_every_town_in_a_few_queries(self):
+        for _ in range(3):
+            create_factory(self.cli)
+
+        # ETag watermark and the rollups
+        with self.assertNumQueries(2):
+            resp = self.cli.get("/api/statistics/factories?level=town")
+        self.assertEqual(resp.status_code, 200)
+
+        result = resp.json()
+        self.assertEqual(result["factories"], Factory.objects.count())
+        self.assertEqual(result["report_records"], ReportRecord.objects.count())
+        self.assertEqual(result["cities"]["臺北市"]["factories"], 3)
+        self.assertEqual(result["cities"]["臺北市"]["towns"]["中山區"]["factories"], 3)
+        self.assertEqual(result["cities"]["臺北市"]["towns"]["中山區"]["report_records"], 3)
+        self.assertEqual(result["cities"]["臺南市"]["factories"], 101)
+        self.assertEqual(result["cities"]["臺南市"]["towns"]["善化區"]["factories"], 101)
+        self.assertEqual(result["cities"]["基隆市"]["towns"]["中山區"]["factories"], 0)
+
+    def test_get_total_counts_latest_document_in_a_few_queries(self):
+        with freeze_time("2020-01-01"):
+            superseded = Factory.objects.create(lat=24, lng=121, display_number=30001, townname="臺灣省宜蘭縣頭城鎮")
+            Document.objects.create(code="123456", factory=superseded, display_status=DocumentDisplayStatusEnum.INDICES["已檢舉"])
+        Document.objects.create(code="123457", factory=superseded, display_status=DocumentDisplayStatusEnum.INDICES["已拆除"])
+
+        deleted = Factory.objects.create(lat=24, lng=121, display_number=30002, townname="宜蘭縣礁溪鄉")
+        Document.objects.create(code="123458", factory=deleted, display_status=DocumentDisplayStatusEnum.INDICES["已發函斷電"]).delete()
+        ReportRecord.objects.create(factory=deleted, action_type="POST", action_body={})
+
+        # ETag watermark and the aggregation
+        with self.assertNumQueries(2):
+            resp = self.cli.get("/api/statistics/total")
+
+        self.assertEqual(resp.json()["宜蘭縣"], {
+            "factories": 2,
+            "report_records": 1,
+            "documents": 1,
+            "未處理": 0,
+            "處理中": 0,
+            "已斷電": 0,
+            "已拆除": 1,
+        })
+        self.assertEqual(resp.json()["臺南市"]["factories"], 101)
+
+    def test_statistics_follow_rollups_of_changed_towns(self):
+        factory = Factory.objects.create(lat=24.8, lng=121.8, display_number=30001, townname="臺灣省宜蘭縣頭城鎮")
+        ReportRecord.objects.create(factory=factory, action_type="POST", action_body={})
+        Image.objects.create(image_path="https://i.imgur.com/RxArJUc.png", factory=factory)
+
+        resp = self.cli.get("/api/statistics/factories?townname=宜蘭縣頭城鎮")
+        self.assertEqual(resp.json()["cities"]["宜蘭縣"]["towns"]["頭城鎮"]["report_records"], 1)
+        resp = self.cli.get("/api/statistics/images?townname=宜蘭縣")
+        self.assertEqual(resp.json()["count"], 1)
+
+        factory.townname = "臺灣省宜蘭縣礁溪鄉"
+        factory.save()
+        resp = self.cli.get("/api/statistics/factories?townname=宜蘭縣&level=town")
+        self.assertEqual(resp.json()["cities"]["宜蘭縣"]["towns"]["頭城鎮"]["factories"], 0)
+        self.assertEqual(resp.json()["cities"]["宜蘭縣"]["towns"]["礁溪鄉"]["factories"], 1)
+
+        Factory.objects.filter(pk=factory.pk).delete()
+        resp = self.cli.get("/api/statistics/report_records?townname=宜蘭縣")
+        self.assertEqual(resp.json()["count"], 0)
+
+    def test_reconcile_rollups(self):
+        factory = Factory.objects.create(lat=24.8, lng=121.8, display_number=30001, townname="臺灣省宜蘭縣頭城鎮")
+        # update() skips the signals which refresh the rollups
+        Factory.objects.filter(pk=factory.pk).update(source="G")
+        resp = self.cli.get("/api/statistics/factories?townname=宜蘭縣&source=G")
+        self.assertEqual(resp.json()["cities"]["宜蘭縣"]["factories"], 0)
+
+        reconcile_factory_stats_rollups()
+        resp = self.cli.get("/api/statistics/factories?townname=宜蘭縣&source=G")
+        self.assertEqual(resp.json()["cities"]["宜蘭縣"]["factories"], 1)
+
+    def test_statistics_from_cache_until_rollups_refreshed(self):
+        resp = self.cli.get("/api/statistics/factories?townname=台南市")
+        self.assertEqual(resp.json()["cities"]["臺南市"]["factories"], 101)
+
+        # only the ETag watermark, and the same normalized townname hits the cache
+        with self.assertNumQueries(1):
+            resp = self.cli.get("/api/statistics/factories?townname=臺南市")
+        self.assertEqual(resp.json()["cities"]["臺南市"]["factories"], 101)
+
+        Factory.objects.create(lat=23.1, lng=120.3, display_number=30001, townname="臺南市善化區")
+        resp = self.cli.get("/api/statistics/factories?townname=臺南市")
+        self.assertEqual(resp.json()["cities"]["臺南市"]["factories"], 102)
+
+    def test_statistics_cache_missed_after_write_of_another_process(self):
+        resp = self.cli.get("/api/statistics/factories?townname=臺南市")
+        self.assertEqual(resp.json()["cities"]["臺南市"]["factories"], 101)
+
+        # the generation token of this process isn't replaced, only the watermark moves
+        with patch("api.models.factory_stats_rollup.invalidate_statistics"):
+            Factory.objects.create(lat=23.1, lng=120.3, display_number=30001, townname="臺南市善化區")
+        resp = self.cli.get("/api/statistics/factories?townname=臺南市")
+        self.assertEqual(resp.json()["cities"]["臺南市"]["factories"], 102)
+
+    @override_settings(STATISTICS_CACHE_TIMEOUT=0)
+    def test_statistics_without_cache(self):
+        self.cli.get("/api/statistics/images?townname=臺南市")
+        with self.assertNumQueries(2):
+            resp = self.cli.get("/api/statistics/images?townname=臺南市")
+        self.assertEqual(resp.status_code, 200)
+
+    def test_statistics_with_display_status_in_one_statement(self):
+        factory = Factory.objects.filter(city="臺南市").first()
+        for code in range(1090001, 1090051):
+            Document.objects.create(
+                code=code,
+                factory=factory,
+                display_status=DocumentDisplayStatusEnum.INDICES["已排程稽查"],
+            )
+
+        for path in [
+            "/api/statistics/factories?display_status=處理中&level=town",
+            "/api/statistics/images?townname=臺南市&display_status=處理中",
+            "/api/statistics/report_records?townname=臺南市善化區&display_status=已排程稽查",
+        ]:
+            cache.clear()
+            with CaptureQueriesContext(connection) as context:
+                resp = self.cli.get(path)
+            self.assertEqual(resp.status_code, 200)
+
+            # the ETag watermark, and a single statement on the rollups which
+            # doesn't depend on the number of documents
+            watermark, statistics = [query["sql"] for query in context.captured_queries]
+            self.assertIn("api_factorystatsrollup", statistics)
+            self.assertNotIn("api_document", statistics)
+            self.assertNotIn("api_factory\"", statistics)
+
+        resp = self.cli.get("/api/statistics/factories?display_status=處理中&townname=臺南市善化區")
+        self.assertEqual(resp.json()["cities"]["臺南市"]["towns"]["善化區"]["factories"], 1)
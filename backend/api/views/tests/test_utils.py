@@ -0,0 +1,53 @@
+from django.test import TestCase, override_settings
+
+from ..utils import _get_nearby_factories, _sample, _sample_queryset
+from ...geo import get_bounding_box
+from ...models import Factory
+
+
+class NearbyFactoriesUtilsTestCase(TestCase):
+    def test_nearby_factories_exclude_corners_of_bounding_box(self):
+        lat, lng, radius = 23.5, 121.0, 1
+        min_lat, max_lat, min_lng, max_lng = get_bounding_box(lat, lng, radius)
+        inside = Factory.objects.create(lat=lat, lng=lng + 0.005, display_number=10001)
+        corner = Factory.objects.create(lat=max_lat - 1e-4, lng=max_lng - 1e-4, display_number=10002)
+
+        factory_ids = [factory.id for factory in _get_nearby_factories(lat, lng, radius)]
+
+        self.assertIn(inside.id, factory_ids)
+        self.assertNotIn(corner.id, factory_ids)
+
+    @override_settings(MAX_FACTORY_PER_GET=4)
+    def test_nearby_factories_sample_spread_over_area(self):
+        lat, lng, radius = 23.99, 121.6, 2
+        for i in range(20):
+            Factory.objects.create(lat=lat - 0.01 + i * 1e-4, lng=lng - 0.01, display_number=10100 + i)
+        scattered = [
+            Factory.objects.create(lat=lat - 0.01, lng=lng + 0.01, display_number=10201),
+            Factory.objects.create(lat=lat + 0.01, lng=lng - 0.01, display_number=10202),
+            Factory.objects.create(lat=lat + 0.01, lng=lng + 0.01, display_number=10203),
+        ]
+
+        factory_ids = [factory.id for factory in _get_nearby_factories(lat, lng, radius)]
+
+        self.assertEqual(len(factory_ids), 4)
+        for factory in scattered:
+            self.assertIn(factory.id, factory_ids)
+        self.assertEqual(
+            factory_ids,
+            [factory.id for factory in _get_nearby_factories(lat, lng, radius)],
+        )
+
+    def test_sample_queryset_same_as_sample(self):
+        bounding_box = get_bounding_box(23.234, 120.1, 5)
+        min_lat, max_lat, min_lng, max_lng = bounding_box
+        queryset = Factory.objects.filter(lat__range=(min_lat, max_lat), lng__range=(min_lng, max_lng))
+
+        for k in (1, 7, 30):
+            self.assertEqual(
+                list(_sample_queryset(queryset, k, bounding_box).values_list("id", flat=True)),
+                [
+                    factory_id
+                    for factory_id, _, _ in _sample(queryset.values_list("id", "lat", "lng"), k, bounding_box)
+                ],
+            )
@@ -1,41 +1,214 @@
-import random
+import hashlib
+import math
+from datetime import timedelta
+from functools import wraps
 
 from django.conf import settings
-from django.db.models import Prefetch
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from django.db.models import CharField, F, FloatField, Func, Max, Prefetch, TextField, Window
+from django.db.models.functions import Cast, Floor, RowNumber
 from django.db.models.functions.math import Radians, Cos, ACos, Sin
+from django.http import HttpResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
 
-from ..models import Factory, ReportRecord, Image, Document
+from ..cache import (
+    FACTORY_TILE_POSITIONS_KEY,
+    get_factory_payloads,
+    get_factory_tile_payloads,
+    get_statistics_payload,
+    set_statistics_payload,
+)
+from ..geo import (
+    EARTH_RADIUS_KM,
+    get_bounding_box,
+    great_circle_distance,
+    lnglat_to_tile,
+    tile_bounds,
+    tiles_in_bounding_box,
+    zoom_for_radius,
+)
+from ..models import Factory, IdempotencyKey, Image
+from ..serializers import serialize_factories
+from ..spatial_index import get_factory_spatial_index
+from ..utils import normalize_townname
 
 
-def _sample(objs, k):
-    list_of_objs = list(objs)
-    random.shuffle(list_of_objs)
-    return list_of_objs[:k]
+class MD5(Func):
+    function = "MD5"
+    output_field = CharField()
+
+
+def _sample_key(factory_id):
+    """Return the same value as `MD5(Cast("id", TextField()))` in PostgreSQL."""
+    return hashlib.md5(str(factory_id).encode()).hexdigest()
+
+
+def _sample_cell_size(bounding_box, k):
+    """Return the (lat, lng) size of the cells splitting the bounding box into a grid of about k cells."""
+    min_lat, max_lat, min_lng, max_lng = bounding_box
+    n = math.ceil(math.sqrt(k))
+    return ((max_lat - min_lat) / n, (max_lng - min_lng) / n)
+
+
+def _sample_queryset(queryset, k, bounding_box):
+    """Pick k factories spread over the bounding box in a single query.
+
+    Factories are ranked inside each grid cell by the md5 of their id, then
+    the first of every cell is taken, then the second, and so on. The same
+    area always gives the same sample, which keeps responses cacheable.
+    """
+    min_lat, _, min_lng, _ = bounding_box
+    cell_lat, cell_lng = _sample_cell_size(bounding_box, k)
+    sample_key = MD5(Cast("id", TextField()))
+    return queryset.annotate(
+        sample_key=sample_key,
+        sample_rank=Window(
+            expression=RowNumber(),
+            partition_by=[
+                Floor((F("lat") - min_lat) / cell_lat, output_field=FloatField()),
+                Floor((F("lng") - min_lng) / cell_lng, output_field=FloatField()),
+            ],
+            order_by=sample_key.asc(),
+        ),
+    ).order_by("sample_rank", "sample_key")[:k]
+
+
+def _sample(objs, k, bounding_box, unpack=lambda obj: obj):
+    """Pick k of the objs the same way as `_sample_queryset`, `unpack(obj)` gives (id, lat, lng)."""
+    min_lat, _, min_lng, _ = bounding_box
+    cell_lat, cell_lng = _sample_cell_size(bounding_box, k)
+
+    keyed_objs = []
+    for obj in objs:
+        factory_id, lat, lng = unpack(obj)
+        cell = (math.floor((lat - min_lat) / cell_lat), math.floor((lng - min_lng) / cell_lng))
+        keyed_objs.append((cell, _sample_key(factory_id), obj))
+    keyed_objs.sort(key=lambda keyed_obj: keyed_obj[:2])
+
+    ranked_objs = []
+    rank, last_cell = 0, None
+    for cell, sample_key, obj in keyed_objs:
+        rank = rank + 1 if cell == last_cell else 1
+        last_cell = cell
+        ranked_objs.append((rank, sample_key, obj))
+    ranked_objs.sort(key=lambda ranked_obj: ranked_obj[:2])
+
+    return [obj for _, _, obj in ranked_objs[:k]]
+
+
+def _prefetch_factory_relations(queryset):
+    """Prefetch the relations `FactorySerializer` reads, the others are summarized on `Factory`."""
+    return queryset.prefetch_related(
+        Prefetch(
+            'images',
+            queryset=Image.objects.only("id", "factory_id", "image_path").order_by("created_at", "id"),
+        )
+    )
 
 
 def _get_nearby_factories(latitude, longitude, radius):
     """Return nearby factories based on position and search range."""
 
     # ref: https://stackoverflow.com/questions/574691/mysql-great-circle-distance-haversine-formula
-    distance = 6371 * ACos(
+    distance = EARTH_RADIUS_KM * ACos(
         Cos(Radians(latitude)) * Cos(Radians("lat")) * Cos(Radians("lng") - Radians(longitude))
         + Sin(Radians(latitude)) * Sin(Radians("lat"))
     )
 
     radius_km = radius
-    ids = Factory.objects.annotate(distance=distance).only("id").filter(distance__lt=radius_km).order_by("id")
+    bounding_box = get_bounding_box(latitude, longitude, radius)
+    if settings.FACTORY_SPATIAL_INDEX_ENABLED:
+        positions = get_factory_spatial_index().query_positions(latitude, longitude, radius_km)
+        ids = [
+            factory_id
+            for factory_id, _, _ in _sample(positions, settings.MAX_FACTORY_PER_GET, bounding_box)
+        ]
+        queryset = Factory.objects.filter(id__in=ids)
+    else:
+        # narrow down the candidates with the (lat, lng) index before computing the exact distance
+        min_lat, max_lat, min_lng, max_lng = bounding_box
+        queryset = _sample_queryset(
+            Factory.objects.filter(lat__range=(min_lat, max_lat), lng__range=(min_lng, max_lng))
+            .annotate(distance=distance)
+            .filter(distance__lt=radius_km),
+            settings.MAX_FACTORY_PER_GET,
+            bounding_box,
+        )
+
+    return _prefetch_factory_relations(queryset).all()
+
+
+def _load_factory_tile_positions(zoom, tiles):
+    """Return {(x, y): [(id, lat, lng)]} of every factory inside the tiles."""
+    bounds = [tile_bounds(zoom, x, y) for x, y in tiles]
+    min_lat = min(bound[0] for bound in bounds)
+    max_lat = max(bound[1] for bound in bounds)
+    min_lng = min(bound[2] for bound in bounds)
+    max_lng = max(bound[3] for bound in bounds)
+
+    if settings.FACTORY_SPATIAL_INDEX_ENABLED:
+        positions = get_factory_spatial_index().query_bounding_box(min_lat, max_lat, min_lng, max_lng)
+    else:
+        positions = Factory.objects.filter(
+            lat__range=(min_lat, max_lat),
+            lng__range=(min_lng, max_lng),
+        ).values_list("id", "lat", "lng")
+
+    payloads = {tile: [] for tile in tiles}
+    for factory_id, lat, lng in positions:
+        tile = lnglat_to_tile(lng, lat, zoom)
+        if tile in payloads:
+            payloads[tile].append((str(factory_id), lat, lng))
+    return payloads
+
 
-    if len(ids) > settings.MAX_FACTORY_PER_GET:
-        ids = _sample(ids, settings.MAX_FACTORY_PER_GET)
+def _load_factory_payloads(ids):
+    """Serialize the factories, return {id: factory data}."""
+    return {
+        factory_data["id"]: factory_data
+        for factory_data in serialize_factories(Factory.objects.filter(id__in=ids))
+    }
 
-    return (
-        Factory.objects.filter(id__in=[obj.id for obj in ids])
-               .prefetch_related(Prefetch('report_records', queryset=ReportRecord.objects.only("created_at").all()))
-               .prefetch_related(Prefetch('images', queryset=Image.objects.only("id").all()))
-               .prefetch_related(Prefetch('documents', queryset=Document.objects.only('created_at', 'display_status').all()))
-               .all()
+
+def _get_nearby_factory_data(latitude, longitude, radius, watermark=None):
+    """Return serialized nearby factories, assembled from the per tile cache when enabled.
+
+    Only positions are cached per tile, the factories are sampled among them
+    before being serialized. Pass the watermark of the request, so payloads
+    cached before a write of another process are missed.
+    """
+    if settings.FACTORY_TILE_CACHE_TIMEOUT <= 0:
+        nearby_factories = _get_nearby_factories(
+            latitude=latitude,
+            longitude=longitude,
+            radius=radius,
+        )
+        return serialize_factories(nearby_factories)
+
+    bounding_box = get_bounding_box(latitude, longitude, radius)
+    zoom = zoom_for_radius(latitude, radius)
+    tiles = tiles_in_bounding_box(zoom, *bounding_box)
+    positions = get_factory_tile_payloads(
+        zoom, tiles, _load_factory_tile_positions, FACTORY_TILE_POSITIONS_KEY, watermark
     )
 
+    nearby_positions = [
+        position
+        for tile in tiles
+        for position in positions[tile]
+        if great_circle_distance(latitude, longitude, position[1], position[2]) < radius
+    ]
+    ids = [
+        factory_id
+        for factory_id, _, _ in _sample(nearby_positions, settings.MAX_FACTORY_PER_GET, bounding_box)
+    ]
+
+    payloads = get_factory_payloads(ids, _load_factory_payloads, watermark)
+    return [payloads[factory_id] for factory_id in ids if factory_id in payloads]
+
 
 def _get_client_ip(request):
     # ref: https://stackoverflow.com/a/30558984
@@ -46,3 +219,163 @@ def _get_client_ip(request):
         return request.META.get("HTTP_X_REAL_IP")
     else:
         return request.META.get("REMOTE_ADDR")
+
+
+def _conditional_get(get_watermark):
+    """Answer unchanged GET requests with 304 before running the view.
+
+    `get_watermark(request, *args, **kwargs)` returns the latest time the
+    response could have changed, or None to skip validation. The ETag and
+    Last-Modified of the response are derived from it.
+    """
+
+    def decorator(view):
+        @wraps(view)
+        def inner(request, *args, **kwargs):
+            if request.method not in ("GET", "HEAD"):
+                return view(request, *args, **kwargs)
+
+            watermark = get_watermark(request, *args, **kwargs)
+            # let the view cache its payload under the watermark, see `_cache_statistics`
+            request.watermark = watermark
+            if watermark is None:
+                return view(request, *args, **kwargs)
+
+            etag = quote_etag(f"{round(watermark.timestamp() * 10 ** 6):x}")
+            last_modified = int(watermark.timestamp())
+            response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+            if response is None:
+                response = view(request, *args, **kwargs)
+                if response.status_code == 200:
+                    response["ETag"] = etag
+                    response["Last-Modified"] = http_date(last_modified)
+            return response
+
+        return inner
+
+    return decorator
+
+
+def _get_factories_watermark(*args, **kwargs):
+    """Return the last time any factory, or a row summarized on it, changed."""
+    return Factory.raw_objects.aggregate(Max("updated_at"))["updated_at__max"]
+
+
+def _get_factory_watermark(request, factory_id, *args, **kwargs):
+    """Return the last time the factory, or a row summarized on it, changed."""
+    try:
+        return Factory.raw_objects.filter(pk=factory_id).values_list("updated_at", flat=True).first()
+    except ValidationError:
+        return None  # not a valid uuid
+
+
+def _with_serialized_time(get_watermark):
+    """Move the watermark at least every hour, `data_complete` depends on the current time."""
+
+    def get_serialized_watermark(*args, **kwargs):
+        watermark = get_watermark(*args, **kwargs)
+        if watermark is None:
+            return None
+        return max(watermark, timezone.now().replace(minute=0, second=0, microsecond=0))
+
+    return get_serialized_watermark
+
+
+def _cache_statistics(view):
+    """Serve successful JSON responses of the view from the statistics cache.
+
+    Responses are cached per normalized query parameters and factories
+    watermark, until the statistics rollups are refreshed or
+    `STATISTICS_CACHE_TIMEOUT` expires. The watermark is the one queried by
+    `_conditional_get`, when the view is wrapped in it.
+    """
+
+    @wraps(view)
+    def inner(request, *args, **kwargs):
+        params = {
+            key: normalize_townname(value) if key == "townname" else value
+            for key, value in request.GET.items()
+        }
+        if hasattr(request, "watermark"):
+            watermark = request.watermark
+        else:
+            watermark = _get_factories_watermark()
+        key, content = get_statistics_payload(view.__name__, params, watermark)
+        if content is not None:
+            return HttpResponse(content, content_type="application/json")
+
+        response = view(request, *args, **kwargs)
+        if response.status_code == 200:
+            set_statistics_payload(key, response.content)
+        return response
+
+    return inner
+
+
+def _idempotent(view):
+    """Replay the stored response of a POST retried with the same `Idempotency-Key` header.
+
+    Only successful responses are stored, so a failed request can be retried
+    with the same key. A retry arriving while the first request is still
+    running gets 409, unless the first request has been running for longer
+    than `IDEMPOTENCY_KEY_LEASE` seconds: its worker is deemed dead and the
+    retry takes the key over. A key reused with another body gets 422.
+    """
+
+    @wraps(view)
+    def inner(request, *args, **kwargs):
+        key = request.META.get("HTTP_IDEMPOTENCY_KEY")
+        if request.method != "POST" or not key:
+            return view(request, *args, **kwargs)
+        if len(key) > 255:
+            return HttpResponse("Idempotency-Key should be at most 255 characters", status=400)
+
+        path = request.path[:255]
+        request_hash = hashlib.md5(request.body).hexdigest()
+        now = timezone.now()
+        expired_at = now - timedelta(seconds=settings.IDEMPOTENCY_KEY_TIMEOUT)
+        IdempotencyKey.objects.filter(key=key, path=path, created_at__lt=expired_at).delete()
+
+        try:
+            with transaction.atomic():
+                record = IdempotencyKey.objects.create(key=key, path=path, request_hash=request_hash)
+        except IntegrityError:
+            record = IdempotencyKey.objects.filter(key=key, path=path).first()
+            if record is not None and record.request_hash != request_hash:
+                return HttpResponse("Idempotency-Key was used with another request body", status=422)
+            if record is None:
+                return HttpResponse("A request with the same Idempotency-Key is in progress", status=409)
+            if record.status_code is not None:
+                response = HttpResponse(
+                    bytes(record.content), status=record.status_code, content_type=record.content_type
+                )
+                response["Idempotent-Replayed"] = "true"
+                return response
+
+            # take over the key of an abandoned request, only one retry wins
+            abandoned_at = now - timedelta(seconds=settings.IDEMPOTENCY_KEY_LEASE)
+            if record.created_at >= abandoned_at or not IdempotencyKey.objects.filter(
+                pk=record.pk, status_code=None, created_at=record.created_at
+            ).update(created_at=now):
+                return HttpResponse("A request with the same Idempotency-Key is in progress", status=409)
+            record.created_at = now
+
+        # leave the key alone if a retry has taken it over meanwhile
+        lease = IdempotencyKey.objects.filter(pk=record.pk, created_at=record.created_at)
+        try:
+            response = view(request, *args, **kwargs)
+        except Exception:
+            lease.delete()
+            raise
+
+        if 200 <= response.status_code < 300 and not response.streaming:
+            lease.update(
+                status_code=response.status_code,
+                content_type=response.get("Content-Type", ""),
+                content=response.content,
+            )
+        else:
+            lease.delete()
+        return response
+
+    return inner
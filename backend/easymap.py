@@ -1,10 +1,16 @@
 #!/usr/bin/env python
 
-import requests
 import re
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
 
 import towninfo
 
+EASYMAP_URL = "http://easymap.land.moi.gov.tw/P02"
+
 
 class WebRequestError(RuntimeError):
     def __init__(self, message, status_code, response_body):
@@ -13,21 +19,124 @@ class WebRequestError(RuntimeError):
         self.response_body = response_body
 
 
-def get_session():
-    easymap_url = "http://easymap.land.moi.gov.tw/P02/Index"
-    sess = requests.Session()
+class LandNumberNotFound(WebRequestError):
+    """Easymap answered, but has no land number at the position."""
+
+
+class EasymapUnavailable(RuntimeError):
+    """The lookup was skipped, easymap is failing or we are over the rate limit."""
+
+
+class CircuitBreaker:
+    """Fail fast while the upstream keeps failing.
+
+    The circuit opens after `failure_threshold` consecutive failures. Calls
+    are rejected for `reset_timeout` seconds, then a single trial call is
+    let through: its success closes the circuit, its failure opens it again.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=60):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+
+    @property
+    def is_open(self):
+        with self._lock:
+            return self._opened_at is not None
+
+    def before_call(self):
+        with self._lock:
+            if self._opened_at is None:
+                return
+            if self._trial_in_flight or time.monotonic() - self._opened_at < self.reset_timeout:
+                raise EasymapUnavailable("easymap circuit is open")
+            self._trial_in_flight = True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_skipped(self):
+        """Give the trial call back, the caller didn't call the upstream after all."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial_in_flight or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+
+class TokenBucket:
+    """Token bucket whose rate adapts to how the upstream copes.
+
+    The refill rate is halved on each failure and grows by `rate_step` per
+    success, staying within `min_rate` and `max_rate` tokens per second.
+    """
+
+    def __init__(self, rate=5, capacity=10, min_rate=0.5, max_rate=20, rate_step=0.5):
+        self.rate = rate
+        self.capacity = capacity
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.rate_step = rate_step
+
+        self._lock = threading.Lock()
+        self._tokens = capacity
+        self._refilled_at = time.monotonic()
+
+    def _refill(self, now):
+        self._tokens = min(self.capacity, self._tokens + (now - self._refilled_at) * self.rate)
+        self._refilled_at = now
+
+    def acquire(self, timeout=0):
+        """Take a token, waiting up to `timeout` seconds for one, return whether one was taken."""
+        deadline = time.monotonic() + timeout
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait = (1 - self._tokens) / self.rate
+            if now + wait > deadline:
+                return False
+            time.sleep(wait)
+
+    def on_success(self):
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.rate_step)
+
+    def on_failure(self):
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+
+
+def get_session(sess=None, base_url=EASYMAP_URL, timeout=None):
+    easymap_url = f"{base_url}/Index"
+    sess = sess or requests.Session()
     # XXX don't need this?
     # sess.headers.update({"User-Agent": "Mozilla/5.0"})
-    resp = sess.get(easymap_url)
+    resp = sess.get(easymap_url, timeout=timeout)
     if "JSESSIONID" not in sess.cookies:
         raise WebRequestError("Failed getting session from easymap", resp.status_code, resp.text)
     return sess
 
 
-def get_point_city(sess, x, y):
-    point_city_url = "http://easymap.land.moi.gov.tw/P02/Query_json_getPointCity"
+def get_point_city(sess, x, y, base_url=EASYMAP_URL, timeout=None):
+    point_city_url = f"{base_url}/Query_json_getPointCity"
     data = {"wgs84x": x, "wgs84y": y}
-    resp = sess.post(point_city_url, data=data)
+    resp = sess.post(point_city_url, data=data, timeout=timeout)
     if resp.status_code != requests.codes.ok:
         raise WebRequestError("Failed getting city code", resp.status_code, resp.text)
     try:
@@ -36,10 +145,10 @@ def get_point_city(sess, x, y):
         raise WebRequestError("Failed parsing city code", resp.status_code, resp.text)
 
 
-def get_token(sess):
-    set_token_url = "http://easymap.land.moi.gov.tw/P02/pages/setToken.jsp"
+def get_token(sess, base_url=EASYMAP_URL, timeout=None):
+    set_token_url = f"{base_url}/pages/setToken.jsp"
     token_re = re.compile('<input type="hidden" name="(.*?)" value="(.*?)" />')
-    resp = sess.post(set_token_url)
+    resp = sess.post(set_token_url, timeout=timeout)
     if resp.status_code != requests.codes.ok:
         raise WebRequestError("Failed getting token", resp.status_code, resp.text)
     token = dict([(m.group(1), m.group(2)) for m in token_re.finditer(resp.text)])
@@ -48,16 +157,145 @@ def get_token(sess):
     return token
 
 
-def get_door_info(sess, x, y, city, token):
-    get_door_info_url = "http://easymap.land.moi.gov.tw/P02/Door_json_getDoorInfoByXY"
+def get_door_info(sess, x, y, city, token, base_url=EASYMAP_URL, timeout=None):
+    get_door_info_url = f"{base_url}/Door_json_getDoorInfoByXY"
     data = {"city": city["cityCode"], "coordX": x, "coordY": y, **token}
-    resp = sess.post(get_door_info_url, data=data)
+    resp = sess.post(get_door_info_url, data=data, timeout=timeout)
     if resp.status_code != requests.codes.ok:
         raise WebRequestError("Failed getting door info", resp.status_code, resp.text)
     try:
-        return resp.json()
+        door_info = resp.json()
     except Exception:
         raise WebRequestError("Failed parsing door info", resp.status_code, resp.text)
+    if not isinstance(door_info, dict):
+        raise WebRequestError("Failed parsing door info", resp.status_code, resp.text)
+    if "towncode" not in door_info:
+        raise LandNumberNotFound("Door info without towncode", resp.status_code, resp.text)
+    return door_info
+
+
+class EasymapClient:
+    """A pooled easymap session which keeps its JSESSIONID and token between lookups.
+
+    The handshake (index page and token) is only redone once the token is
+    `token_ttl` seconds old, or after a failed lookup, so most lookups take
+    two requests instead of four. The client can be shared between threads.
+
+    Every request gives up after `timeout` (connect, read) seconds. Lookups go
+    through a `CircuitBreaker` and an adaptive `TokenBucket`, and raise
+    `EasymapUnavailable` instead of calling easymap while the circuit is open
+    or no token frees up within `acquire_timeout` seconds.
+    """
+
+    def __init__(
+        self,
+        base_url=EASYMAP_URL,
+        token_ttl=600,
+        pool_maxsize=10,
+        timeout=(3.05, 10),
+        breaker=None,
+        bucket=None,
+        acquire_timeout=1,
+    ):
+        self.base_url = base_url
+        self.token_ttl = token_ttl
+        self.pool_maxsize = pool_maxsize
+        self.timeout = timeout
+        self.breaker = breaker or CircuitBreaker()
+        self.bucket = bucket or TokenBucket()
+        self.acquire_timeout = acquire_timeout
+
+        self._lock = threading.Lock()
+        self._sess = None
+        self._token = None
+        self._token_expires_at = 0
+
+    def _new_session(self):
+        sess = requests.Session()
+        adapter = HTTPAdapter(pool_maxsize=self.pool_maxsize)
+        sess.mount("http://", adapter)
+        sess.mount("https://", adapter)
+        return sess
+
+    def _get_credentials(self):
+        with self._lock:
+            if self._sess is None or time.monotonic() >= self._token_expires_at:
+                # in-flight lookups may still use the previous session, it is closed once unreferenced
+                sess = get_session(self._new_session(), base_url=self.base_url, timeout=self.timeout)
+                self._token = get_token(sess, base_url=self.base_url, timeout=self.timeout)
+                self._sess = sess
+                self._token_expires_at = time.monotonic() + self.token_ttl
+            return self._sess, self._token
+
+    def _expire_token(self, token):
+        with self._lock:
+            # don't expire the token another thread has just fetched
+            if self._token is token:
+                self._token_expires_at = 0
+
+    def _lookup(self, x, y):
+        # redo the handshake once if the lookup fails
+        for retry in (False, True):
+            token = None
+            try:
+                sess, token = self._get_credentials()
+                city = get_point_city(sess, x=x, y=y, base_url=self.base_url, timeout=self.timeout)
+                return get_door_info(
+                    sess, x=x, y=y, city=city, token=token, base_url=self.base_url, timeout=self.timeout
+                )
+            except LandNumberNotFound:
+                # neither the session nor the token are at fault, don't handshake again
+                raise
+            except (WebRequestError, requests.RequestException):
+                if token is not None:
+                    self._expire_token(token)
+                if retry:
+                    raise
+
+    def get_land_number(self, x, y):
+        """Get land number by WGS84 coordinates."""
+        self.breaker.before_call()
+        if not self.bucket.acquire(self.acquire_timeout):
+            self.breaker.record_skipped()
+            raise EasymapUnavailable("easymap rate limit exceeded")
+
+        try:
+            land_number = self._lookup(x, y)
+        except LandNumberNotFound:
+            # a point without parcel, easymap itself is fine
+            self.breaker.record_success()
+            self.bucket.on_success()
+            raise
+        except Exception:
+            # whatever the error, the trial call of a half open circuit has to be settled
+            self.breaker.record_failure()
+            self.bucket.on_failure()
+            raise
+        self.breaker.record_success()
+        self.bucket.on_success()
+
+        land_number["townname"] = towninfo.code2name.get(land_number["towncode"], "")
+        return land_number
+
+    def close(self):
+        with self._lock:
+            if self._sess is not None:
+                self._sess.close()
+            self._sess = None
+            self._token = None
+            self._token_expires_at = 0
+
+
+_default_client = None
+_default_client_lock = threading.Lock()
+
+
+def get_default_client():
+    global _default_client
+    with _default_client_lock:
+        if _default_client is None:
+            _default_client = EasymapClient()
+        return _default_client
 
 
 def get_land_number(x, y):
@@ -65,14 +303,10 @@ def get_land_number(x, y):
     Get land number by WGS84 coordinates.
 
     since the easymap API doesn't provide townname, we then insert a townname field by looking up in xml files in ./towncode downloaded from https://api.nlsc.gov.tw/other/ListTown1/{A-Z}
+
+    Lookups share the session and token of the default `EasymapClient`.
     """
-    sess = get_session()
-    city = get_point_city(sess, x=x, y=y)
-    token = get_token(sess)
-    land_number = get_door_info(sess, x=x, y=y, city=city, token=token)
-    sess.close()
-    land_number["townname"] = towninfo.code2name.get(land_number["towncode"], "")
-    return land_number
+    return get_default_client().get_land_number(x, y)
 
 
 if __name__ == "__main__":
@@ -203,6 +203,50 @@ TAIWAN_MIN_LONGITUDE = 120.035141
 
 MAX_FACTORY_PER_GET = int(os.environ.get("DISFACTORY_BACKEND_MAX_FACTORY_PER_GET", 50))
 
+# Answer nearby factory queries from an in-memory index in each worker instead of PostgreSQL
+FACTORY_SPATIAL_INDEX_ENABLED = (
+    os.environ.get("DISFACTORY_BACKEND_FACTORY_SPATIAL_INDEX_ENABLED", "false").lower() == "true"
+)
+FACTORY_SPATIAL_INDEX_REFRESH_SECONDS = int(
+    os.environ.get("DISFACTORY_BACKEND_FACTORY_SPATIAL_INDEX_REFRESH_SECONDS", 5)
+)
+FACTORY_SPATIAL_INDEX_REBUILD_SECONDS = int(
+    os.environ.get("DISFACTORY_BACKEND_FACTORY_SPATIAL_INDEX_REBUILD_SECONDS", 600)
+)
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "OPTIONS": {"MAX_ENTRIES": 10000},
+    },
+}
+
+# Nearby factory payloads are cached per map tile, set the timeout to 0 to disable it. Tiles
+# are invalidated in the cache of the writing process, and keyed by the factories watermark
+# so a write of another process is seen as well
+FACTORY_TILE_CACHE_ALIAS = "default"
+FACTORY_TILE_CACHE_TIMEOUT = int(os.environ.get("DISFACTORY_BACKEND_FACTORY_TILE_CACHE_TIMEOUT", 60))
+# /api/tiles returns individual factories from this zoom on, and clusters below it
+FACTORY_TILE_MARKER_MIN_ZOOM = int(os.environ.get("DISFACTORY_BACKEND_FACTORY_TILE_MARKER_MIN_ZOOM", 15))
+
+# Statistics payloads are cached per query until a factory, report record, image or
+# document is written, the factories watermark in their keys covers writes of other processes
+STATISTICS_CACHE_ALIAS = "default"
+STATISTICS_CACHE_TIMEOUT = int(os.environ.get("DISFACTORY_BACKEND_STATISTICS_CACHE_TIMEOUT", 60))
+
+# POSTs retried with the same Idempotency-Key header within this many seconds replay the first response
+IDEMPOTENCY_KEY_TIMEOUT = int(os.environ.get("DISFACTORY_BACKEND_IDEMPOTENCY_KEY_TIMEOUT", 86400))
+# a request still running after this many seconds is deemed abandoned, a retry takes its key over
+IDEMPOTENCY_KEY_LEASE = int(os.environ.get("DISFACTORY_BACKEND_IDEMPOTENCY_KEY_LEASE", 60))
+
+# easymap lookups are cached by coordinates rounded to this many decimal places, for this many seconds
+LAND_INFO_CACHE_PRECISION = int(os.environ.get("DISFACTORY_BACKEND_LAND_INFO_CACHE_PRECISION", 5))
+LAND_INFO_CACHE_TTL = int(os.environ.get("DISFACTORY_BACKEND_LAND_INFO_CACHE_TTL", 30 * 86400))
+
+# GeoJSON boundaries (WGS84) of towns and land sections, used to resolve them without easymap
+TOWN_BOUNDARY_PATH = os.environ.get("DISFACTORY_BACKEND_TOWN_BOUNDARY_PATH", "")
+SECTION_BOUNDARY_PATH = os.environ.get("DISFACTORY_BACKEND_SECTION_BOUNDARY_PATH", "")
+
 Q_CLUSTER = {
     "name": "disfactory",
     "workers": 4,
@@ -1,50 +1,35 @@
+"""Lookup tables between town codes and full town names.
+
+The tables are precompiled from the *.xml files into towncodes.json by
+`python -m towninfo.build`, and only loaded on first use of `code2name` or
+`name2code`.
+"""
+import json
 import pathlib
-import xml.etree.ElementTree as ET
+import threading
 
-city_name = {
-    'A': '臺北市',
-    'B': '臺中市',
-    'C': '臺灣省基隆市',
-    'D': '臺南市',
-    'E': '高雄市',
-    'F': '新北市',
-    'G': '臺灣省宜蘭縣',
-    'H': '桃園市',
-    'I': '臺灣省嘉義市',
-    'J': '臺灣省新竹縣',
-    'K': '臺灣省苗栗縣',
-    'M': '臺灣省南投縣',
-    'N': '臺灣省彰化縣',
-    'O': '臺灣省新竹市',
-    'P': '臺灣省雲林縣',
-    'Q': '臺灣省嘉義縣',
-    'T': '臺灣省屏東縣',
-    'U': '臺灣省花蓮縣',
-    'V': '臺灣省臺東縣',
-    'W': '福建省金門縣',
-    'X': '臺灣省澎湖縣',
-    'Z': '福建省連江縣',
-}
+TABLE_PATH = pathlib.Path(__file__).parent / "towncodes.json"
 
-HERE = pathlib.Path(__file__).parent
-code2name = {}
-name2code = {}
+_tables = None
+_tables_lock = threading.Lock()
 
-for xml_path in HERE.glob("*.xml"):
-    with xml_path.open("r") as f:
-        tree = ET.fromstring(f.read())
-        if tree is not None:
-            for child in tree.getchildren():
-                code = child.find("towncode").text
-                code01 = child.find("towncode01").text
-                name = city_name[code01[:1]] + child.find("townname").text
-                code2name[code] = name
-                name2code[name] = code
 
-                code01_node = child.find("towncode01")
-                if code01_node is not None:
-                    code01 = code01_node.text
+def _load_tables():
+    global _tables
+    with _tables_lock:
+        if _tables is None:
+            code2name = {}
+            name2code = {}
+            with TABLE_PATH.open("r", encoding="utf-8") as f:
+                for code, code01, name in json.load(f):
+                    code2name[code] = name
                     code2name[code01] = name
                     name2code[name] = code01
+            _tables = {"code2name": code2name, "name2code": name2code}
+        return _tables
+
 
-print(code2name)
+def __getattr__(name):
+    if name in ("code2name", "name2code"):
+        return _load_tables()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
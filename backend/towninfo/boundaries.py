@@ -0,0 +1,94 @@
+"""Offline point-in-polygon lookup over town and cadastral section boundaries.
+
+The boundaries are read from GeoJSON files in WGS84, e.g. the town
+boundaries (鄉鎮市區界線) and land sections (地段) published by NLSC. Every
+polygon is registered in the cells of a fixed lng/lat grid its bounding box
+overlaps, so a lookup only tests the few polygons of one cell.
+"""
+import json
+import math
+from array import array
+from collections import defaultdict
+
+
+def _in_ring(x, y, ring):
+    """Ray casting test of the point against a ring flattened as [x0, y0, x1, y1, ...]."""
+    inside = False
+    n = len(ring) // 2
+    x1, y1 = ring[-2], ring[-1]
+    for i in range(n):
+        x2, y2 = ring[2 * i], ring[2 * i + 1]
+        if (y1 > y) != (y2 > y) and x < (x2 - x1) * (y - y1) / (y2 - y1) + x1:
+            inside = not inside
+        x1, y1 = x2, y2
+    return inside
+
+
+def _in_polygon(x, y, rings):
+    # the first ring is the shell, the others are holes
+    return _in_ring(x, y, rings[0]) and not any(_in_ring(x, y, hole) for hole in rings[1:])
+
+
+class BoundaryIndex:
+    """Grid bucketed index of polygons, each carrying the properties of its feature."""
+
+    def __init__(self, cell_size=0.05):
+        self.cell_size = cell_size
+        self._features = []  # (properties, bounding box, polygons)
+        self._cells = defaultdict(list)
+
+    def __len__(self):
+        return len(self._features)
+
+    def _cell_of(self, lng, lat):
+        return (math.floor(lng / self.cell_size), math.floor(lat / self.cell_size))
+
+    def add(self, properties, polygons):
+        """Add a feature made of `polygons`, each a list of rings of (lng, lat) points."""
+        polygons = [
+            [array("d", (coordinate for point in ring for coordinate in point[:2])) for ring in polygon]
+            for polygon in polygons
+            if polygon
+        ]
+        if not polygons:
+            return
+
+        lngs = [lng for polygon in polygons for lng in polygon[0][0::2]]
+        lats = [lat for polygon in polygons for lat in polygon[0][1::2]]
+        bounding_box = (min(lngs), min(lats), max(lngs), max(lats))
+
+        idx = len(self._features)
+        self._features.append((properties, bounding_box, polygons))
+        min_x, min_y = self._cell_of(bounding_box[0], bounding_box[1])
+        max_x, max_y = self._cell_of(bounding_box[2], bounding_box[3])
+        for x in range(min_x, max_x + 1):
+            for y in range(min_y, max_y + 1):
+                self._cells[(x, y)].append(idx)
+
+    def lookup(self, lng, lat):
+        """Return the properties of the feature containing the point, or None."""
+        for idx in self._cells.get(self._cell_of(lng, lat), ()):
+            properties, (min_lng, min_lat, max_lng, max_lat), polygons = self._features[idx]
+            if not (min_lng <= lng <= max_lng and min_lat <= lat <= max_lat):
+                continue
+            if any(_in_polygon(lng, lat, polygon) for polygon in polygons):
+                return properties
+        return None
+
+
+def load_geojson(path, cell_size=0.05):
+    """Build a `BoundaryIndex` of the Polygon and MultiPolygon features of a GeoJSON file."""
+    with open(path, "r", encoding="utf-8") as f:
+        collection = json.load(f)
+
+    index = BoundaryIndex(cell_size=cell_size)
+    for feature in collection["features"]:
+        geometry = feature.get("geometry") or {}
+        if geometry.get("type") == "Polygon":
+            polygons = [geometry["coordinates"]]
+        elif geometry.get("type") == "MultiPolygon":
+            polygons = geometry["coordinates"]
+        else:
+            continue
+        index.add(feature.get("properties") or {}, polygons)
+    return index
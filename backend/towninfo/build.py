@@ -0,0 +1,63 @@
+"""Precompile the town code tables from the XML files.
+
+The *.xml files are downloaded from https://api.nlsc.gov.tw/other/ListTown1/{A-Z},
+run `python -m towninfo.build` after updating them to regenerate towncodes.json.
+"""
+import json
+import pathlib
+import xml.etree.ElementTree as ET
+
+HERE = pathlib.Path(__file__).parent
+TABLE_PATH = HERE / "towncodes.json"
+
+CITY_NAMES = {
+    'A': '臺北市',
+    'B': '臺中市',
+    'C': '臺灣省基隆市',
+    'D': '臺南市',
+    'E': '高雄市',
+    'F': '新北市',
+    'G': '臺灣省宜蘭縣',
+    'H': '桃園市',
+    'I': '臺灣省嘉義市',
+    'J': '臺灣省新竹縣',
+    'K': '臺灣省苗栗縣',
+    'M': '臺灣省南投縣',
+    'N': '臺灣省彰化縣',
+    'O': '臺灣省新竹市',
+    'P': '臺灣省雲林縣',
+    'Q': '臺灣省嘉義縣',
+    'T': '臺灣省屏東縣',
+    'U': '臺灣省花蓮縣',
+    'V': '臺灣省臺東縣',
+    'W': '福建省金門縣',
+    'X': '臺灣省澎湖縣',
+    'Z': '福建省連江縣',
+}
+
+
+def parse_xml_rows(directory=HERE):
+    """Return [towncode, towncode01, full townname] of every town in the XML files."""
+    rows = []
+    for xml_path in sorted(directory.glob("*.xml")):
+        with xml_path.open("r", encoding="utf-8") as f:
+            tree = ET.fromstring(f.read())
+        for child in tree:
+            code = child.find("towncode").text
+            code01 = child.find("towncode01").text
+            name = CITY_NAMES[code01[:1]] + child.find("townname").text
+            rows.append([code, code01, name])
+    return rows
+
+
+def main():
+    rows = parse_xml_rows()
+    with TABLE_PATH.open("w", encoding="utf-8") as f:
+        f.write("[\n")
+        f.write(",\n".join(json.dumps(row, ensure_ascii=False) for row in rows))
+        f.write("\n]\n")
+    print(f"Wrote {len(rows)} towns to {TABLE_PATH}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,20 @@
+import json
 from unittest import TestCase
 
-from . import code2name
+from . import TABLE_PATH, code2name, name2code
+from .build import parse_xml_rows
 
 
 class TownInfoTestCase(TestCase):
     def test_code2name(self):
-        self.assertEqual(code2name["64000006"], "高雄市兵役局")
-        self.assertEqual(code2name["10017006"], "臺灣省基隆市民政處")
+        self.assertEqual(code2name["64000010"], "高雄市鹽埕區")
         self.assertEqual(code2name["10017010"], "臺灣省基隆市中正區")
         self.assertEqual(code2name["C01"], "臺灣省基隆市中正區")
+
+    def test_name2code(self):
+        self.assertEqual(name2code["臺灣省基隆市中正區"], "C01")
+
+    def test_table_up_to_date_with_xml(self):
+        with TABLE_PATH.open("r", encoding="utf-8") as f:
+            rows = json.load(f)
+        self.assertEqual(rows, parse_xml_rows(), "run `python -m towninfo.build` to regenerate towncodes.json")
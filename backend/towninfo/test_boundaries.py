@@ -0,0 +1,54 @@
+import json
+from tempfile import NamedTemporaryFile
+from unittest import TestCase
+
+from .boundaries import BoundaryIndex, load_geojson
+
+SQUARE_WITH_HOLE = [
+    [[121.0, 24.0], [121.2, 24.0], [121.2, 24.2], [121.0, 24.2], [121.0, 24.0]],
+    [[121.05, 24.05], [121.1, 24.05], [121.1, 24.1], [121.05, 24.1], [121.05, 24.05]],
+]
+TRIANGLE = [[[121.2, 24.0], [121.4, 24.0], [121.2, 24.2], [121.2, 24.0]]]
+ISLAND = [[[121.5, 24.5], [121.51, 24.5], [121.51, 24.51], [121.5, 24.51], [121.5, 24.5]]]
+
+
+class BoundaryIndexTestCase(TestCase):
+    def setUp(self):
+        self.index = BoundaryIndex(cell_size=0.05)
+        self.index.add({"TOWNCODE": "A"}, [SQUARE_WITH_HOLE])
+        self.index.add({"TOWNCODE": "B"}, [TRIANGLE, ISLAND])
+
+    def test_lookup(self):
+        self.assertEqual(self.index.lookup(121.15, 24.15), {"TOWNCODE": "A"})
+        self.assertEqual(self.index.lookup(121.25, 24.05), {"TOWNCODE": "B"})
+        self.assertEqual(self.index.lookup(121.505, 24.505), {"TOWNCODE": "B"})
+
+    def test_lookup_outside(self):
+        self.assertIsNone(self.index.lookup(121.075, 24.075))  # in the hole
+        self.assertIsNone(self.index.lookup(121.35, 24.15))  # beside the triangle
+        self.assertIsNone(self.index.lookup(120.0, 23.0))
+
+    def test_load_geojson(self):
+        collection = {
+            "type": "FeatureCollection",
+            "features": [
+                {
+                    "type": "Feature",
+                    "properties": {"TOWNCODE": "A"},
+                    "geometry": {"type": "Polygon", "coordinates": SQUARE_WITH_HOLE},
+                },
+                {
+                    "type": "Feature",
+                    "properties": {"TOWNCODE": "B"},
+                    "geometry": {"type": "MultiPolygon", "coordinates": [TRIANGLE, ISLAND]},
+                },
+                {"type": "Feature", "properties": {}, "geometry": {"type": "Point", "coordinates": [121, 24]}},
+            ],
+        }
+        with NamedTemporaryFile("w", suffix=".geojson") as f:
+            json.dump(collection, f)
+            f.flush()
+            index = load_geojson(f.name)
+
+        self.assertEqual(len(index), 2)
+        self.assertEqual(index.lookup(121.505, 24.505), {"TOWNCODE": "B"})